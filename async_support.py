@@ -0,0 +1,142 @@
+# async_support.py
+import queue
+import threading
+import time
+import logging
+import config as cfg
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class LoopBridge:
+    """
+    Cầu nối giữa pipeline (thread hệ điều hành thật: đọc camera, detection, encode)
+    và server Socket.IO/HTTP:
+        - async_mode "threading": gọi thẳng, chờ bằng threading.Condition như cũ
+        - async_mode "gevent": viewer là greenlet trên 1 event loop, không được chặn loop
+          => thread pipeline đánh thức loop qua hub.loop.run_callback_threadsafe (async watcher của libev/libuv),
+             greenlet chờ trên gevent Event (không poll khi không có frame / emit mới),
+             việc tốn CPU (encode mức thấp) chạy trên threadpool
+        - async_mode "eventlet": không có watcher an toàn đa luồng => poll + sleep hợp tác (COOPERATIVE_POLL_INTERVAL)
+    """
+
+    def __init__(self, socketio, async_mode=None, poll_interval=None):
+        self.socketio = socketio
+        self.async_mode = async_mode or cfg.SOCKETIO_ASYNC_MODE
+        self.cooperative = self.async_mode != "threading"
+        self.poll_interval = poll_interval if poll_interval is not None else cfg.COOPERATIVE_POLL_INTERVAL
+        self._emit_queue = queue.Queue()
+        self._drain_started = False
+
+        # gevent: hub của event loop (lấy trong start()), Event của từng pipeline (chỉ dùng trên loop)
+        self._loop = None
+        self._emit_event = None
+        self._output_events = {}
+        self._watched = set()
+        self._watch_lock = threading.Lock()
+
+    def start(self):
+        """Khởi động greenlet chuyển emit từ các thread pipeline vào event loop (gọi trên thread của loop)"""
+        if self.cooperative and not self._drain_started:
+            self._drain_started = True
+            if self.async_mode == "gevent":
+                import gevent
+                from gevent.event import Event
+                self._emit_event = Event()
+                self._emit_event.set()  # Gửi các emit đã xếp hàng trước khi bridge khởi động
+                self._loop = gevent.get_hub().loop
+            self.socketio.start_background_task(self._drain_emits)
+            logger.info(f"✅ Event loop bridge ({self.async_mode}) đã khởi động")
+
+    @property
+    def _event_driven(self):
+        return self._loop is not None
+
+    def sleep(self, seconds):
+        """Sleep không chặn event loop"""
+        self.socketio.sleep(seconds)
+
+    def emit(self, event, data, sid):
+        """Emit an toàn từ bất kỳ thread nào"""
+        if not self.cooperative:
+            self.socketio.emit(event, data, to=sid)
+            return
+        self._emit_queue.put((event, data, sid))
+        if self._event_driven:
+            self._loop.run_callback_threadsafe(self._emit_event.set)
+
+    def _drain_emits(self):
+        while True:
+            if self._event_driven:
+                self._emit_event.wait()
+                self._emit_event.clear()
+            drained = False
+            while True:
+                try:
+                    event, data, sid = self._emit_queue.get_nowait()
+                except queue.Empty:
+                    break
+                drained = True
+                try:
+                    self.socketio.emit(event, data, to=sid)
+                except Exception as e:
+                    logger.error(f"Lỗi khi emit {event}: {e}")
+            if not drained and not self._event_driven:
+                self.socketio.sleep(self.poll_interval)
+
+    # --- OUTPUT CỦA PIPELINE ---
+
+    def _watch(self, pipeline):
+        """Đăng ký (1 lần) listener đánh thức event loop khi pipeline có output mới"""
+        with self._watch_lock:
+            if pipeline in self._watched:
+                return
+            self._watched.add(pipeline)
+        pipeline.add_output_listener(self._on_output)
+
+    def _on_output(self, pipeline):
+        # Encode thread => chỉ lên lịch callback, Event được set trên thread của loop
+        self._loop.run_callback_threadsafe(self._notify_output, pipeline)
+
+    def _notify_output(self, pipeline):
+        # Thay Event mới rồi set Event cũ: đánh thức mọi viewer đang chờ output cũ của pipeline này
+        event = self._output_events.pop(pipeline, None)
+        if event is not None:
+            event.set()
+
+    def _output_event(self, pipeline):
+        from gevent.event import Event
+        event = self._output_events.get(pipeline)
+        if event is None:
+            event = self._output_events[pipeline] = Event()
+        return event
+
+    def wait_for_output(self, pipeline, last_seq, timeout=1.0):
+        """Chờ packet mới hơn last_seq từ pipeline (không chặn event loop khi chạy gevent/eventlet)"""
+        if not self.cooperative:
+            return pipeline.wait_for_output(last_seq, timeout)
+        deadline = time.time() + timeout
+        if self._event_driven:
+            self._watch(pipeline)
+        while True:
+            # Lấy Event trước khi peek: output đến sau peek sẽ set đúng Event đang chờ
+            event = self._output_event(pipeline) if self._event_driven else None
+            packet = pipeline.peek_output(last_seq)
+            remaining = deadline - time.time()
+            if packet is not None or remaining <= 0:
+                return packet
+            if event is not None:
+                event.wait(remaining)
+            else:
+                self.socketio.sleep(self.poll_interval)
+
+    def run_cpu(self, fn, *args):
+        """Chạy việc tốn CPU trên thread thật (threadpool của gevent) thay vì trên event loop"""
+        if self.async_mode == "gevent":
+            import gevent
+            return gevent.get_hub().threadpool.apply(fn, args)
+        if self.async_mode == "eventlet":
+            from eventlet import tpool
+            return tpool.execute(fn, *args)
+        return fn(*args)
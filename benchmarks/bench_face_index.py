@@ -0,0 +1,66 @@
+# benchmarks/bench_face_index.py
+"""
+Đo tốc độ thêm / tìm kiếm top-k của FaceEmbeddingIndex với embedding ngẫu nhiên
+(không cần model, chỉ đo phần index memory-mapped + nhân ma trận).
+
+Chạy từ thư mục gốc project:
+    python benchmarks/bench_face_index.py --size 100000 --queries 64
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_index import FaceEmbeddingIndex  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100000, help="Số khuôn mặt trong index")
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=64, help="Số query trong 1 lô")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="face_index_")
+    try:
+        rng = np.random.default_rng(0)
+        index = FaceEmbeddingIndex(path=os.path.join(folder, "faces"), dim=args.dim)
+
+        # Thêm dần theo lô 1000 (mô phỏng đăng ký tăng dần, dung lượng tự nhân đôi)
+        started = time.perf_counter()
+        for offset in range(0, args.size, 1000):
+            n = min(1000, args.size - offset)
+            index.add(rng.standard_normal((n, args.dim)).astype(np.float32),
+                      [f"person_{offset + i}" for i in range(n)])
+        add_seconds = time.perf_counter() - started
+
+        queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+        single = []
+        batch = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            index.search(queries[0], top_k=args.top_k)
+            single.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            index.search(queries, top_k=args.top_k)
+            batch.append(time.perf_counter() - started)
+
+        print(f"Index: {index.stats()}")
+        print(f"Thêm {args.size} vector: {add_seconds:.2f}s ({args.size / add_seconds:.0f} vector/s)")
+        print(f"1 query:      p50 {np.percentile(single, 50) * 1000:.2f} ms")
+        print(f"{args.queries} query/lô: p50 {np.percentile(batch, 50) * 1000:.2f} ms "
+              f"({np.percentile(batch, 50) * 1000 / args.queries:.3f} ms/query)")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
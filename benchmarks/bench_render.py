@@ -0,0 +1,127 @@
+# benchmarks/bench_render.py
+"""
+So sánh bộ nhớ cấp phát mỗi frame của phần vẽ UI:
+    - legacy: cách vẽ cũ (frame.copy + 2 lần copy + 2 lần addWeighted toàn frame,
+              icon: đổi màu mỗi frame + trộn alpha float từng kênh)
+    - plan:   FaceProcessor.render (render plan biên dịch từ config)
+
+Chạy từ thư mục gốc project:
+    python benchmarks/bench_render.py --frames 300
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config as cfg  # noqa: E402
+from face_logic import FaceProcessor  # noqa: E402
+
+
+def legacy_draw_icon(processor, frame_drawn, color):
+    """Vẽ icon như code cũ: recolor_icon mỗi frame + trộn alpha float64 từng kênh"""
+    current_icon = processor.recolor_icon(processor.icon_resized, color)
+    if current_icon is None:
+        return
+    zone_center_x = cfg.ZONE_X + cfg.ZONE_WIDTH // 2
+    zone_center_y = cfg.ZONE_Y + cfg.ZONE_HEIGHT // 2
+    pos_x = zone_center_x - processor.icon_w // 2
+    pos_y = zone_center_y - processor.icon_h // 2
+
+    y1, y2 = max(0, pos_y), min(frame_drawn.shape[0], pos_y + processor.icon_h)
+    x1, x2 = max(0, pos_x), min(frame_drawn.shape[1], pos_x + processor.icon_w)
+    if y1 < y2 and x1 < x2:
+        icon_crop_y1 = y1 - pos_y
+        icon_crop_y2 = icon_crop_y1 + (y2 - y1)
+        icon_crop_x1 = x1 - pos_x
+        icon_crop_x2 = icon_crop_x1 + (x2 - x1)
+
+        icon_slice = current_icon[icon_crop_y1:icon_crop_y2, icon_crop_x1:icon_crop_x2]
+        bg_slice = frame_drawn[y1:y2, x1:x2]
+
+        if icon_slice.shape[2] == 4:
+            alpha_mask = icon_slice[:, :, 3] / 255.0
+            alpha_inv = 1.0 - alpha_mask
+            for c in range(0, 3):
+                bg_slice[:, :, c] = (alpha_mask * icon_slice[:, :, c] +
+                                     alpha_inv * bg_slice[:, :, c])
+
+
+def legacy_render(processor, frame, color):
+    """Cách vẽ cũ trong process_and_draw (trước khi có render plan)"""
+    frame_drawn = frame.copy()
+
+    overlay_bg = frame_drawn.copy()
+    cv2.rectangle(overlay_bg, (cfg.ZONE_X, cfg.ZONE_Y),
+                  (cfg.ZONE_X + cfg.ZONE_WIDTH, cfg.ZONE_Y + cfg.ZONE_HEIGHT),
+                  cfg.COLOR_WHITE, -1)
+    frame_drawn = cv2.addWeighted(overlay_bg, cfg.OVERLAY_ALPHA, frame_drawn, 1 - cfg.OVERLAY_ALPHA, 0)
+
+    if processor.icon_resized is not None:
+        legacy_draw_icon(processor, frame_drawn, color)
+
+    overlay_ellipse = frame_drawn.copy()
+    cv2.ellipse(overlay_ellipse,
+                (cfg.ZONE_X + cfg.ZONE_WIDTH // 2, cfg.ZONE_Y + cfg.ZONE_HEIGHT // 2),
+                (cfg.ZONE_WIDTH // 2 - cfg.ELLIPSE_OFFSET, cfg.ZONE_HEIGHT // 2 - cfg.ELLIPSE_OFFSET),
+                0, 0, 360, (255, 255, 255), cfg.THICKNESS_ELLIPSE)
+    alpha_ellipse = 0
+    frame_drawn = cv2.addWeighted(overlay_ellipse, alpha_ellipse, frame_drawn, 1 - alpha_ellipse, 0)
+    return frame_drawn
+
+
+def measure(render_fn, frames):
+    """
+    Returns: (đỉnh bộ nhớ cấp phát thêm mỗi frame (KB), số buffer cỡ 1 frame tương ứng, ms / frame)
+    """
+    color = cfg.COLOR_GREEN
+    frame_kb = frames[0].nbytes / 1024
+    render_fn(frames[0], color)  # warm-up
+
+    tracemalloc.start()
+    peak_total = 0
+    for frame in frames:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        frame_drawn = render_fn(frame, color)
+        peak_total += tracemalloc.get_traced_memory()[1] - baseline
+        del frame_drawn
+    tracemalloc.stop()
+
+    # Thời gian đo riêng (không bật tracemalloc)
+    started = time.perf_counter()
+    for frame in frames:
+        render_fn(frame, color)
+    elapsed = time.perf_counter() - started
+
+    count = len(frames)
+    peak_kb = peak_total / count / 1024
+    return peak_kb, peak_kb / frame_kb, elapsed / count * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=100, help="Số frame đo")
+    args = parser.parse_args()
+
+    processor = FaceProcessor(with_detector=False)
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (cfg.FRAME_HEIGHT, cfg.FRAME_WIDTH, 3), dtype=np.uint8)
+              for _ in range(min(args.frames, 16))]
+    frames = (frames * (args.frames // len(frames) + 1))[:args.frames]
+
+    print(f"Render plan: {[layer.__name__ for layer in processor.render_layers]}")
+    print(f"{'path':<8}{'peak KB/frame':>15}{'frame buffers':>15}{'ms/frame':>12}")
+    for name, fn in (("legacy", lambda f, c: legacy_render(processor, f, c)),
+                     ("plan", processor.render)):
+        peak_kb, buffers, ms = measure(fn, frames)
+        print(f"{name:<8}{peak_kb:>15.1f}{buffers:>15.2f}{ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
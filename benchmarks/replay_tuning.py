@@ -0,0 +1,119 @@
+# benchmarks/replay_tuning.py
+"""
+Phát lại các video sự cố đã ghi nhanh nhất có thể (không giới hạn theo thời gian thật, không rơi frame)
+để chỉnh REQUIRED_FRAMES và ngưỡng detection hàng loạt.
+
+Mỗi clip được detection 1 lần cho mỗi ngưỡng confidence, sau đó mô phỏng bộ đếm
+consecutive_success_frames với từng giá trị REQUIRED_FRAMES.
+
+Chạy từ thư mục gốc project:
+    python benchmarks/replay_tuning.py incidents/*.mp4 --required-frames 10,20,30 --confidence 0.5,0.7
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config as cfg  # noqa: E402
+from face_logic import FaceProcessor, create_face_detector, detect_faces  # noqa: E402
+from frame_sources import VideoFileReader  # noqa: E402
+
+
+def analyze_clip(path, processor, detector):
+    """
+    Returns: (fps của clip, danh sách (is_valid, status) cho từng frame)
+    """
+    reader = VideoFileReader(path, cfg.MIRROR_MODE == "ingest", loop=False, speed=0)
+    results = []
+    try:
+        while reader.isOpened():
+            frame = reader.read()
+            if frame is None:
+                continue
+            _, analysis = processor.analyze_and_draw(frame, detect_faces(detector, frame))
+            if analysis is None:
+                results.append((False, "error"))
+            else:
+                results.append((analysis[0], analysis[1]))
+    finally:
+        reader.close()
+    return reader.fps, results
+
+
+def simulate_captures(results, required_frames):
+    """Mô phỏng bộ đếm của 1 phiên chụp: trả về danh sách chỉ số frame chụp được"""
+    captures = []
+    consecutive = 0
+    for index, (is_valid, _) in enumerate(results):
+        if not is_valid:
+            consecutive = 0
+            continue
+        consecutive += 1
+        if consecutive >= required_frames:
+            captures.append(index)
+            consecutive = 0
+    return captures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clips", nargs="+", help="Các file video đã ghi")
+    parser.add_argument("--required-frames", default=str(cfg.REQUIRED_FRAMES),
+                        help="Danh sách REQUIRED_FRAMES cần thử, vd: 10,20,30")
+    parser.add_argument("--confidence", default=str(cfg.FACE_DETECTION_CONFIDENCE),
+                        help="Danh sách FACE_DETECTION_CONFIDENCE cần thử, vd: 0.5,0.7")
+    parser.add_argument("--output", help="Ghi kết quả JSON ra file (mặc định: stdout)")
+    args = parser.parse_args()
+
+    required_values = [int(v) for v in args.required_frames.split(",") if v.strip()]
+    confidence_values = [float(v) for v in args.confidence.split(",") if v.strip()]
+    processor = FaceProcessor(with_detector=False)
+
+    runs = []
+    for confidence in confidence_values:
+        cfg.FACE_DETECTION_CONFIDENCE = confidence
+        detector = create_face_detector()
+        try:
+            for path in args.clips:
+                started = time.perf_counter()
+                fps, results = analyze_clip(path, processor, detector)
+                elapsed = time.perf_counter() - started
+
+                statuses = {}
+                for _, status in results:
+                    statuses[status] = statuses.get(status, 0) + 1
+                captures = {}
+                for required in required_values:
+                    frames = simulate_captures(results, required)
+                    captures[str(required)] = {
+                        "count": len(frames),
+                        "first_at_s": round(frames[0] / fps, 2) if frames else None
+                    }
+
+                runs.append({
+                    "clip": path,
+                    "confidence": confidence,
+                    "frames": len(results),
+                    "clip_duration_s": round(len(results) / fps, 2) if fps else None,
+                    "replay_speedup": round(len(results) / fps / elapsed, 1) if fps and elapsed else None,
+                    "statuses": statuses,
+                    "captures": captures
+                })
+                print(f"{path} conf={confidence}: {len(results)} frame, "
+                      f"{ {k: v['count'] for k, v in captures.items()} }", file=sys.stderr)
+        finally:
+            detector.close()
+
+    output = json.dumps({"runs": runs}, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
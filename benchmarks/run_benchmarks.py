@@ -0,0 +1,366 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmark offline (không cần camera thật) cho toàn bộ đường đi của 1 frame:
+    1. stages:  nguồn frame -> FaceProcessor.process_and_draw -> JPEG stream -> compress_image_for_base64
+                chạy nhanh nhất có thể, đo p50/p95/p99 từng stage
+    2. mjpeg:   CameraHub + StreamPipeline thật với nguồn frame giả lập thay cho RTSP,
+                N viewer đồng thời như generate_frames, đo FPS nhận được / độ trễ / CPU / RSS
+
+Nguồn frame:
+    --clip video.mp4     Video đã ghi lại (lặp lại khi hết)
+    (mặc định)           Frame tổng hợp có 1 "khuôn mặt" vẽ sẵn di chuyển quanh vùng an toàn
+
+Detector:
+    mediapipe   MediaPipe thật (mặc định nếu import được)
+    oracle      Dùng bbox đã biết của frame tổng hợp (đo phần vẽ/encode khi không có MediaPipe)
+    none        Không có khuôn mặt
+
+Kết quả JSON (để so sánh giữa các bản release):
+    python benchmarks/run_benchmarks.py --frames 300 --viewers 1,4,16 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config as cfg  # noqa: E402
+from camera_hub import CameraHub  # noqa: E402
+from camera_registry import CameraRegistry  # noqa: E402
+from face_logic import FaceProcessor, detect_faces  # noqa: E402
+from face_tracker import TrackedDetection  # noqa: E402
+from pipeline import PipelineManager  # noqa: E402
+
+BENCH_CAMERA_ID = "bench"
+
+
+# --- NGUỒN FRAME (cùng interface với CameraStream) ---
+
+class SyntheticFaceSource:
+    """Frame tổng hợp: nền nhiễu + 1 khuôn mặt hình elip di chuyển chậm quanh tâm vùng an toàn"""
+
+    def __init__(self, fps=30.0, count=64, seed=0):
+        self.fps = fps
+        self.last_error = None
+        self._opened = False
+        self._next_at = 0
+        self._index = 0
+
+        rng = np.random.default_rng(seed)
+        background = rng.integers(40, 90, (cfg.FRAME_HEIGHT, cfg.FRAME_WIDTH, 3), dtype=np.uint8)
+        self.frames = []
+        self.boxes = []
+        face_w, face_h = int(cfg.ZONE_WIDTH * 0.7), int(cfg.ZONE_HEIGHT * 0.75)
+        for i in range(count):
+            angle = 2 * np.pi * i / count
+            cx = cfg.ZONE_X + cfg.ZONE_WIDTH // 2 + int(15 * np.cos(angle))
+            cy = cfg.ZONE_Y + cfg.ZONE_HEIGHT // 2 + int(10 * np.sin(angle))
+            frame = background.copy()
+            cv2.ellipse(frame, (cx, cy), (face_w // 2, face_h // 2), 0, 0, 360, (140, 170, 220), -1)
+            for dx in (-face_w // 5, face_w // 5):
+                cv2.circle(frame, (cx + dx, cy - face_h // 8), face_w // 14, (40, 40, 40), -1)
+            cv2.ellipse(frame, (cx, cy + face_h // 5), (face_w // 6, face_h // 16), 0, 0, 180, (60, 60, 150), 3)
+            self.frames.append(frame)
+            self.boxes.append((cx - face_w // 2, cy - face_h // 2, face_w, face_h))
+
+    def connect(self):
+        self._opened = True
+        self._next_at = time.time()
+        return True
+
+    def is_opened(self):
+        return self._opened
+
+    def next_frame(self):
+        """Frame kế tiếp không chờ (dùng cho phần đo stage)"""
+        index = self._index % len(self.frames)
+        self._index += 1
+        return self.frames[index], self.boxes[index]
+
+    def get_frame(self):
+        """Giống CameraStream.get_frame: không chặn, None nếu chưa tới lượt frame mới"""
+        if not self._opened or time.time() < self._next_at:
+            return None
+        self._next_at += 1.0 / self.fps
+        return self.next_frame()[0]
+
+    def release(self):
+        self._opened = False
+
+
+class ClipSource(SyntheticFaceSource):
+    """Video đã ghi: decode trước toàn bộ (tối đa max_frames) để phần đo không tính thời gian đọc đĩa"""
+
+    def __init__(self, path, fps=None, max_frames=300):
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise IOError(f"Không mở được video: {path}")
+        clip_fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.fps = fps or clip_fps
+        self.last_error = None
+        self._opened = False
+        self._next_at = 0
+        self._index = 0
+        self.frames = []
+        while len(self.frames) < max_frames:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            self.frames.append(cv2.resize(frame, (cfg.FRAME_WIDTH, cfg.FRAME_HEIGHT)))
+        capture.release()
+        if not self.frames:
+            raise IOError(f"Video không có frame: {path}")
+        self.boxes = [None] * len(self.frames)
+
+
+# --- DETECTOR ---
+
+def make_detector(kind, source):
+    """
+    Returns: (tên detector thực tế, hàm frame, box -> detections)
+    """
+    if kind in ("auto", "mediapipe"):
+        try:
+            from face_logic import create_face_detector
+            detector = create_face_detector()
+            lock = threading.Lock()
+
+            def detect(frame, box):
+                with lock:
+                    return detect_faces(detector, frame)
+            return "mediapipe", detect
+        except Exception as e:
+            if kind == "mediapipe":
+                raise
+            print(f"MediaPipe không khả dụng ({e}), dùng detector oracle", file=sys.stderr)
+            kind = "oracle"
+
+    if kind == "oracle" and not isinstance(source, ClipSource):
+        def detect(frame, box):
+            return [TrackedDetection(box, cfg.FRAME_WIDTH, cfg.FRAME_HEIGHT, 0.9)] if box else []
+        return "oracle", detect
+
+    return "none", lambda frame, box: []
+
+
+# --- ĐO ĐẠC ---
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return {"count": 0}
+    values = np.asarray(samples_ms)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(samples_ms),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3)
+    }
+
+
+class ResourceMeter:
+    """CPU (user+sys / wall, tính theo 1 core) và RSS của process trong 1 khoảng đo"""
+
+    def __enter__(self):
+        self._usage = resource.getrusage(resource.RUSAGE_SELF)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        self.wall = time.perf_counter() - self._started
+        cpu = (usage.ru_utime - self._usage.ru_utime) + (usage.ru_stime - self._usage.ru_stime)
+        self.cpu_percent = round(100.0 * cpu / self.wall, 1) if self.wall > 0 else 0.0
+        self.rss_mb = round(current_rss_mb(), 1)
+        # ru_maxrss: KB trên Linux, bytes trên macOS
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        self.max_rss_mb = round(usage.ru_maxrss / scale, 1)
+        return False
+
+    def to_dict(self):
+        return {"wall_s": round(self.wall, 3), "cpu_percent": self.cpu_percent,
+                "rss_mb": self.rss_mb, "max_rss_mb": self.max_rss_mb}
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return 0.0
+
+
+def bench_stages(source, detect, frames):
+    """Chạy từng stage tuần tự trên cùng 1 thread, đo độ trễ mỗi frame"""
+    from main import compress_image_for_base64
+
+    processor = FaceProcessor(with_detector=False)
+    samples = {"detect": [], "process_and_draw": [], "jpeg_encode": [], "compress_base64": [], "total": []}
+    jpeg_bytes = []
+
+    with ResourceMeter() as meter:
+        for _ in range(frames):
+            frame, box = source.next_frame()
+            started = time.perf_counter()
+
+            t0 = time.perf_counter()
+            detections = detect(frame, box)
+            t1 = time.perf_counter()
+            # process_and_draw dùng detector của processor -> cấp detection đã có qua analyze_and_draw
+            frame_drawn, analysis = processor.analyze_and_draw(frame, detections)
+            crop = None
+            if analysis is not None:
+                crop, _, _ = processor.update_capture_state(processor, analysis, frame)
+            t2 = time.perf_counter()
+            ret, buffer = cv2.imencode('.jpg', frame_drawn, [cv2.IMWRITE_JPEG_QUALITY, cfg.STREAM_JPEG_QUALITY])
+            t3 = time.perf_counter()
+            if crop is not None:
+                compress_image_for_base64(crop)
+                samples["compress_base64"].append((time.perf_counter() - t3) * 1000)
+
+            samples["detect"].append((t1 - t0) * 1000)
+            samples["process_and_draw"].append((t2 - t1) * 1000)
+            samples["jpeg_encode"].append((t3 - t2) * 1000)
+            samples["total"].append((time.perf_counter() - started) * 1000)
+            if ret:
+                jpeg_bytes.append(len(buffer))
+
+    return {
+        "frames": frames,
+        "fps": round(frames / meter.wall, 1),
+        "latency": {name: percentiles(values) for name, values in samples.items()},
+        "jpeg_bytes_mean": int(np.mean(jpeg_bytes)) if jpeg_bytes else 0,
+        "resources": meter.to_dict()
+    }
+
+
+def bench_mjpeg(source, detect, viewers, duration):
+    """
+    CameraHub + StreamPipeline thật, N viewer giống generate_frames (chờ chunk mới nhất, giới hạn 30 FPS)
+    """
+    processor = FaceProcessor(with_detector=False)
+    box_by_frame = {id(frame): box for frame, box in zip(source.frames, source.boxes)}
+
+    def process(packet):
+        detections = detect(packet.frame, box_by_frame.get(id(packet.frame)))
+        frame_drawn, analysis = processor.analyze_and_draw(packet.frame, detections)
+        packet.needs_mirror = False
+        return frame_drawn if analysis is not None else packet.frame
+
+    registry = CameraRegistry(cameras={BENCH_CAMERA_ID: {"rtsp_url": "bench://"}}, cameras_file="")
+    hub = CameraHub(registry, stream_factory=lambda **kwargs: source, idle_grace_period=0)
+    manager = PipelineManager(hub, process, jpeg_quality=cfg.STREAM_JPEG_QUALITY)
+
+    stop_event = threading.Event()
+    delivered = [0] * viewers
+    latencies = [[] for _ in range(viewers)]
+    bytes_sent = [0] * viewers
+
+    def viewer(index):
+        pipeline = manager.subscribe(BENCH_CAMERA_ID)
+        frame_interval = 1.0 / 30
+        try:
+            last_seq = 0
+            last_sent = 0
+            while not stop_event.is_set():
+                packet = pipeline.wait_for_output(last_seq, timeout=0.5)
+                if packet is None:
+                    continue
+                last_seq = packet.seq
+                latencies[index].append((time.time() - packet.captured_at) * 1000)
+                delivered[index] += 1
+                bytes_sent[index] += len(packet.chunk)
+                elapsed = time.time() - last_sent
+                if elapsed < frame_interval:
+                    time.sleep(frame_interval - elapsed)
+                last_sent = time.time()
+        finally:
+            pipeline.release()
+
+    threads = [threading.Thread(target=viewer, args=(i,), daemon=True) for i in range(viewers)]
+    with ResourceMeter() as meter:
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=2.0)
+    hub.shutdown()
+
+    stats = manager.stats()[0]
+    per_viewer_fps = [count / meter.wall for count in delivered]
+    return {
+        "viewers": viewers,
+        "source_fps": source.fps,
+        "fps_per_viewer_mean": round(float(np.mean(per_viewer_fps)), 1),
+        "fps_per_viewer_min": round(float(np.min(per_viewer_fps)), 1),
+        "mbps_total": round(sum(bytes_sent) * 8 / meter.wall / 1e6, 2),
+        "latency": percentiles([value for values in latencies for value in values]),
+        "encodes": stats["encoded_cache"]["encodes"],
+        "reader_dropped": stats["reader"].get("dropped", 0),
+        "resources": meter.to_dict()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clip", help="Video đã ghi (mặc định: frame tổng hợp)")
+    parser.add_argument("--detector", default="auto", choices=("auto", "mediapipe", "oracle", "none"))
+    parser.add_argument("--frames", type=int, default=300, help="Số frame cho phần đo stage")
+    parser.add_argument("--fps", type=float, default=30.0, help="FPS của nguồn trong phần đo MJPEG")
+    parser.add_argument("--viewers", default="1,2,4,8", help="Danh sách số viewer đồng thời, vd: 1,4,16")
+    parser.add_argument("--duration", type=float, default=5.0, help="Số giây đo cho mỗi mức viewer")
+    parser.add_argument("--output", help="Ghi kết quả JSON ra file (mặc định: stdout)")
+    args = parser.parse_args()
+
+    source = ClipSource(args.clip, fps=args.fps) if args.clip else SyntheticFaceSource(fps=args.fps)
+    detector_name, detect = make_detector(args.detector, source)
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "config": {
+            "source": args.clip or "synthetic",
+            "detector": detector_name,
+            "frame_size": [cfg.FRAME_WIDTH, cfg.FRAME_HEIGHT],
+            "stream_jpeg_quality": cfg.STREAM_JPEG_QUALITY,
+            "mirror_mode": cfg.MIRROR_MODE
+        },
+        "stages": bench_stages(source, detect, args.frames),
+        "mjpeg": []
+    }
+
+    for viewers in [int(v) for v in args.viewers.split(",") if v.strip()]:
+        result = bench_mjpeg(source, detect, viewers, args.duration)
+        results["mjpeg"].append(result)
+        print(f"viewers={viewers:<4} fps/viewer={result['fps_per_viewer_mean']:<6} "
+              f"p95={result['latency'].get('p95_ms')}ms cpu={result['resources']['cpu_percent']}%",
+              file=sys.stderr)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"Đã ghi kết quả vào {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
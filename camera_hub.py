@@ -0,0 +1,319 @@
+# camera_hub.py
+import threading
+import time
+import logging
+import cv2
+import numpy as np
+import config as cfg
+import metrics
+from camera_service import CameraStream, ReconnectBackoff
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Trạng thái kết nối của camera
+STATE_IDLE = "idle"                # Không có viewer, không kết nối
+STATE_CONNECTING = "connecting"    # Đang kết nối
+STATE_CONNECTED = "connected"      # Đang nhận frame
+STATE_BACKOFF = "backoff"          # Mất kết nối, đang chờ để thử lại
+
+_offline_frame = None
+
+
+def get_offline_frame():
+    """Frame placeholder 'camera offline' (tạo 1 lần, dùng chung, không được sửa)"""
+    global _offline_frame
+    if _offline_frame is None:
+        frame = np.full((cfg.FRAME_HEIGHT, cfg.FRAME_WIDTH, 3), 40, dtype=np.uint8)
+        for text, y, scale in (("CAMERA OFFLINE", cfg.FRAME_HEIGHT // 2 - 10, 1.2),
+                               ("Dang ket noi lai...", cfg.FRAME_HEIGHT // 2 + 35, 0.8)):
+            (w, _), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, 2)
+            cv2.putText(frame, text, ((cfg.FRAME_WIDTH - w) // 2, y),
+                        cv2.FONT_HERSHEY_SIMPLEX, scale, cfg.COLOR_WHITE, 2, cv2.LINE_AA)
+        frame.setflags(write=False)
+        _offline_frame = frame
+    return _offline_frame
+
+
+def is_offline_frame(frame):
+    return frame is not None and frame is _offline_frame
+
+
+class CameraWorker:
+    """
+    Một luồng đọc camera duy nhất (1 RTSP session, 1 decoder) cho mỗi camera.
+    Frame mới nhất được publish vào một slot chung để mọi viewer cùng đọc.
+    Luồng đọc đồng thời là supervisor: tự kết nối lại với exponential backoff + jitter,
+    trong lúc mất kết nối thì publish frame "camera offline" để viewer không bị treo.
+    """
+
+    def __init__(self, camera_id, stream_factory, idle_grace_period):
+        """
+        Args:
+            camera_id: ID của camera
+            stream_factory: Hàm tạo CameraStream (gọi trong luồng đọc, không tham số)
+            idle_grace_period: Thời gian chờ (giây) trước khi ngắt kết nối khi không còn viewer
+        """
+        self.camera_id = camera_id
+        self.stream_factory = stream_factory
+        self.idle_grace_period = idle_grace_period
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._frame_time = 0
+        self._frames_read = 0
+        self._fps = 0.0
+
+        self.state = STATE_IDLE
+        self.reconnect_attempts = 0
+        self.next_retry_at = 0
+        self.last_error = None
+
+        self._subscribers = 0
+        self._thread = None
+        self._stop_event = None
+        self._idle_timer = None
+
+    @property
+    def subscriber_count(self):
+        with self._cond:
+            return self._subscribers
+
+    def acquire(self):
+        """Đăng ký một viewer mới. Viewer đầu tiên sẽ khởi động luồng đọc camera."""
+        with self._cond:
+            self._subscribers += 1
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            if self._thread is None or not self._thread.is_alive():
+                self._start_locked()
+            logger.info(f"👀 Camera '{self.camera_id}': {self._subscribers} viewer")
+
+    def release(self):
+        """Huỷ đăng ký viewer. Khi không còn ai xem, ngắt kết nối sau grace period."""
+        with self._cond:
+            self._subscribers = max(0, self._subscribers - 1)
+            logger.info(f"👋 Camera '{self.camera_id}': còn {self._subscribers} viewer")
+            if self._subscribers == 0 and self._idle_timer is None:
+                self._idle_timer = threading.Timer(self.idle_grace_period, self._stop_if_idle)
+                self._idle_timer.daemon = True
+                self._idle_timer.start()
+
+    def wait_for_frame(self, last_seq, timeout=1.0):
+        """
+        Chờ frame mới hơn `last_seq`.
+
+        Returns:
+            (seq, frame) - frame là None nếu hết timeout mà chưa có frame mới.
+            Frame được chia sẻ giữa các viewer, KHÔNG được sửa trực tiếp.
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._seq == last_seq or self._frame is None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return last_seq, None
+                self._cond.wait(remaining)
+            return self._seq, self._frame
+
+    def last_frame_time(self):
+        with self._cond:
+            return self._frame_time
+
+    def stats(self):
+        """Thống kê luồng đọc camera"""
+        with self._cond:
+            return {
+                "subscribers": self._subscribers,
+                "frames_read": self._frames_read,
+                "fps": round(self._fps, 2),
+                "last_frame_time": self._frame_time,
+                "running": self._thread is not None,
+                "state": self.state,
+                "reconnect_attempts": self.reconnect_attempts,
+                "next_retry_in": round(max(0.0, self.next_retry_at - time.time()), 2)
+                if self.state == STATE_BACKOFF else None,
+                "last_error": self.last_error
+            }
+
+    def stop(self):
+        """Dừng luồng đọc ngay lập tức"""
+        with self._cond:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            self._stop_locked()
+
+    def _start_locked(self):
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(self._stop_event,),
+            name=f"camera-reader-{self.camera_id}",
+            daemon=True
+        )
+        self._thread.start()
+        logger.info(f"▶️ Đã khởi động luồng đọc camera '{self.camera_id}'")
+
+    def _stop_locked(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+        self.state = STATE_IDLE
+        # Bỏ frame cũ để viewer sau không nhận ảnh cũ khi kết nối lại
+        self._frame = None
+        self._thread = None
+        self._stop_event = None
+
+    def _stop_if_idle(self):
+        with self._cond:
+            self._idle_timer = None
+            if self._subscribers > 0:
+                return
+            logger.info(f"💤 Camera '{self.camera_id}' không còn viewer, đang ngắt kết nối...")
+            self._stop_locked()
+
+    def _publish(self, frame, stop_event, placeholder=False):
+        """Publish frame vào slot chung. Frame placeholder không tính vào FPS"""
+        with self._cond:
+            if stop_event.is_set():
+                return False
+            if not placeholder:
+                now = time.time()
+                if self._frame_time:
+                    interval = now - self._frame_time
+                    if interval > 0:
+                        self._fps += 0.1 * (1.0 / interval - self._fps)
+                self._frames_read += 1
+                self._frame_time = now
+            self._frame = frame
+            self._seq += 1
+            self._cond.notify_all()
+            return True
+
+    def _set_state(self, state):
+        if self.state != state:
+            logger.info(f"📷 Camera '{self.camera_id}': {self.state} -> {state}")
+            self.state = state
+
+    def _run(self, stop_event):
+        camera = None
+        backoff = ReconnectBackoff()
+        last_placeholder = 0
+        read_seconds = metrics.CAMERA_READ_SECONDS.labels(self.camera_id)
+        frames_total = metrics.CAMERA_FRAMES_TOTAL.labels(self.camera_id)
+        try:
+            camera = self.stream_factory()
+            while not stop_event.is_set():
+                # --- SUPERVISOR: kết nối lại khi mất kết nối ---
+                if not camera.is_opened():
+                    self._set_state(STATE_CONNECTING)
+                    # Viewer thấy ngay placeholder thay vì chờ kết nối
+                    self._publish(get_offline_frame(), stop_event, placeholder=True)
+                    last_placeholder = time.time()
+
+                    if not camera.connect():
+                        delay = backoff.next_delay()
+                        self.reconnect_attempts = backoff.attempts
+                        self.last_error = camera.last_error
+                        self.next_retry_at = time.time() + delay
+                        self._set_state(STATE_BACKOFF)
+                        logger.warning(f"🔄 Camera '{self.camera_id}': thử lại sau {delay:.1f}s "
+                                       f"(lần {backoff.attempts})")
+                        stop_event.wait(delay)
+                        continue
+
+                    backoff.reset()
+                    self.reconnect_attempts = 0
+                    self.last_error = None
+                    self._set_state(STATE_CONNECTED)
+
+                read_started = time.perf_counter()
+                frame = camera.get_frame()
+                if frame is None:
+                    # Chưa có frame mới: nếu đã lâu không có frame thì gửi placeholder định kỳ
+                    now = time.time()
+                    if (now - self.last_frame_time() > cfg.CAMERA_OFFLINE_FRAME_INTERVAL
+                            and now - last_placeholder > cfg.CAMERA_OFFLINE_FRAME_INTERVAL):
+                        self._publish(get_offline_frame(), stop_event, placeholder=True)
+                        last_placeholder = now
+                    time.sleep(0.01)
+                    continue
+
+                read_seconds.observe(time.perf_counter() - read_started)
+                frames_total.inc()
+
+                if not self._publish(frame, stop_event):
+                    break
+
+        except Exception as e:
+            logger.error(f"❌ Lỗi trong luồng đọc camera '{self.camera_id}': {e}", exc_info=True)
+        finally:
+            if camera is not None:
+                try:
+                    camera.release()
+                except Exception as e:
+                    logger.error(f"Lỗi khi release camera: {e}")
+            if stop_event.is_set():
+                self.state = STATE_IDLE
+            logger.info(f"⏹️ Đã dừng luồng đọc camera '{self.camera_id}'")
+
+class CameraHub:
+    """Quản lý tập trung các CameraWorker trong toàn bộ process"""
+
+    DEFAULT_CAMERA_ID = cfg.DEFAULT_CAMERA_ID
+
+    def __init__(self, registry, stream_factory=CameraStream, idle_grace_period=None):
+        """
+        Args:
+            registry: CameraRegistry chứa cấu hình các camera
+            stream_factory: Hàm tạo CameraStream, nhận rtsp_url, source, uri, options và connect
+            idle_grace_period: Thời gian giữ kết nối sau khi viewer cuối cùng thoát (giây)
+        """
+        self.registry = registry
+        self.stream_factory = stream_factory
+        if idle_grace_period is None:
+            idle_grace_period = cfg.CAMERA_IDLE_GRACE_PERIOD
+        self.idle_grace_period = idle_grace_period
+        self._workers = {}
+        self._lock = threading.Lock()
+
+    def get_worker(self, camera_id=DEFAULT_CAMERA_ID):
+        camera = self.registry.get(camera_id)
+        if camera is None:
+            raise KeyError(f"Camera không tồn tại: {camera_id}")
+
+        with self._lock:
+            worker = self._workers.get(camera_id)
+            if worker is None:
+                # Luồng đọc (supervisor) tự gọi connect(), không kết nối trong constructor
+                worker = CameraWorker(camera_id,
+                                      lambda: self.stream_factory(rtsp_url=camera.rtsp_url, source=camera.source,
+                                                                  uri=camera.uri, options=camera.options,
+                                                                  connect=False),
+                                      self.idle_grace_period)
+                self._workers[camera_id] = worker
+            return worker
+
+    def subscribe(self, camera_id=DEFAULT_CAMERA_ID):
+        """Đăng ký viewer cho camera, trả về CameraWorker (nhớ gọi release() khi xong)"""
+        worker = self.get_worker(camera_id)
+        worker.acquire()
+        return worker
+
+    def camera_states(self):
+        """Trạng thái kết nối của mọi camera (không mở RTSP session mới)"""
+        with self._lock:
+            workers = dict(self._workers)
+        states = {}
+        for camera in self.registry.list():
+            worker = workers.get(camera.camera_id)
+            states[camera.camera_id] = worker.stats() if worker is not None else {"state": STATE_IDLE}
+        return states
+
+    def shutdown(self):
+        with self._lock:
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker.stop()
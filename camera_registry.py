@@ -0,0 +1,100 @@
+# camera_registry.py
+import json
+import os
+import threading
+import logging
+import config as cfg
+from frame_sources import SOURCE_RTSP, SOURCE_TYPES, SOURCE_V4L2
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class CameraConfig:
+    """Cấu hình của 1 camera (1 cửa ra vào) hoặc 1 nguồn thay thế (file, thư mục ảnh, webcam)"""
+
+    def __init__(self, camera_id, rtsp_url=None, name=None, source=None, path=None, device=None,
+                 loop=True, speed=1.0, fps=None):
+        self.camera_id = camera_id
+        self.rtsp_url = rtsp_url
+        self.name = name or camera_id
+        self.source = source or SOURCE_RTSP
+        if self.source not in SOURCE_TYPES:
+            raise ValueError(f"Camera '{camera_id}': loại nguồn không hợp lệ: {self.source}")
+        if self.source == SOURCE_RTSP:
+            self.uri = rtsp_url
+        elif self.source == SOURCE_V4L2:
+            self.uri = device if device is not None else path
+        else:
+            self.uri = path
+        if self.uri is None:
+            raise ValueError(f"Camera '{camera_id}': thiếu rtsp_url/path/device cho nguồn {self.source}")
+        # Tuỳ chọn cho nguồn offline (file, thư mục ảnh)
+        self.options = {"loop": loop, "speed": speed, "fps": fps} if self.source in ("file", "images") else None
+
+    def to_dict(self):
+        # Không trả về rtsp_url vì có chứa tài khoản camera
+        return {"id": self.camera_id, "name": self.name, "source": self.source}
+
+
+class CameraRegistry:
+    """
+    Danh sách camera của server: lấy từ config.CAMERAS,
+    sau đó bổ sung/ghi đè bằng file JSON config.CAMERAS_FILE (nếu có)
+    """
+
+    def __init__(self, cameras=None, cameras_file=None):
+        self._cameras = {}
+        self._lock = threading.Lock()
+
+        if cameras is None:
+            cameras = cfg.CAMERAS
+        for camera_id, options in cameras.items():
+            self.add(camera_id, **options)
+
+        if cameras_file is None:
+            cameras_file = cfg.CAMERAS_FILE
+        if cameras_file:
+            self.load_file(cameras_file)
+
+    def load_file(self, path):
+        """
+        Đọc danh sách camera từ file JSON dạng:
+            {"door_1": {"rtsp_url": "rtsp://...", "name": "Cửa 1"}, ...}
+        """
+        if not os.path.exists(path):
+            return 0
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cameras = json.load(f)
+        except Exception as e:
+            logger.error(f"❌ Lỗi khi đọc file camera {path}: {e}", exc_info=True)
+            return 0
+
+        for camera_id, options in cameras.items():
+            try:
+                self.add(camera_id, **options)
+            except (TypeError, ValueError) as e:
+                logger.error(f"❌ Bỏ qua camera '{camera_id}' trong {path}: {e}")
+        logger.info(f"✅ Đã nạp {len(cameras)} camera từ {path}")
+        return len(cameras)
+
+    def add(self, camera_id, rtsp_url=None, name=None, **options):
+        camera = CameraConfig(camera_id, rtsp_url, name, **options)
+        with self._lock:
+            self._cameras[camera_id] = camera
+        return camera
+
+    def get(self, camera_id):
+        """Trả về CameraConfig hoặc None nếu không tồn tại"""
+        with self._lock:
+            return self._cameras.get(camera_id)
+
+    def __contains__(self, camera_id):
+        with self._lock:
+            return camera_id in self._cameras
+
+    def list(self):
+        with self._lock:
+            return list(self._cameras.values())
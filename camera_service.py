@@ -2,73 +2,110 @@
 import rtsp
 import cv2
 import numpy as np
+import random
 import time
 import logging
-from config import RTSP_URL, FRAME_WIDTH, FRAME_HEIGHT
+from config import (RTSP_URL, FRAME_WIDTH, FRAME_HEIGHT, CAMERA_BACKEND, MIRROR_MODE,
+                    CAMERA_MAX_FPS, CAMERA_READY_TIMEOUT, CAMERA_FRAME_TIMEOUT, CAMERA_RECONNECT_BASE_DELAY,
+                    CAMERA_RECONNECT_MAX_DELAY, CAMERA_RECONNECT_JITTER)
+from frame_sources import FramePacer, SOURCE_RTSP, create_reader
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
 
+class ReconnectBackoff:
+    """Exponential backoff + jitter cho việc kết nối lại camera (không giới hạn số lần thử)"""
+
+    def __init__(self, base_delay=None, max_delay=None, jitter=None):
+        self.base_delay = base_delay if base_delay is not None else CAMERA_RECONNECT_BASE_DELAY
+        self.max_delay = max_delay if max_delay is not None else CAMERA_RECONNECT_MAX_DELAY
+        self.jitter = jitter if jitter is not None else CAMERA_RECONNECT_JITTER
+        self.attempts = 0
+
+    def next_delay(self):
+        """Thời gian chờ (giây) trước lần thử tiếp theo: base * 2^n, tối đa max_delay, ± jitter"""
+        delay = min(self.max_delay, self.base_delay * (2 ** self.attempts))
+        self.attempts += 1
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def reset(self):
+        self.attempts = 0
+
+
 class CameraStream:
-    def __init__(self, max_reconnect_attempts=5, reconnect_delay=3):
+    def __init__(self, rtsp_url=None, backend=None, connect=True, source=None, uri=None, options=None):
         """
-        Khởi tạo CameraStream với RTSP connection
+        Khởi tạo CameraStream với RTSP connection (hoặc nguồn frame khác, xem frame_sources)
+        Việc kết nối lại do supervisor (CameraWorker) đảm nhận, get_frame() không bao giờ chờ reconnect
         
         Args:
-            max_reconnect_attempts: Số lần thử reconnect tối đa
-            reconnect_delay: Thời gian chờ giữa các lần reconnect (giây)
+            rtsp_url: URL RTSP của camera (mặc định: config.RTSP_URL)
+            backend: "rtsp" (thư viện rtsp, PIL), "opencv" hoặc "pyav" (mặc định: config.CAMERA_BACKEND)
+            connect: Kết nối ngay khi khởi tạo
+            source: Loại nguồn "rtsp", "file", "images", "v4l2" (mặc định: "rtsp")
+            uri: Đường dẫn file/thư mục hoặc device cho nguồn không phải RTSP
+            options: Tuỳ chọn của nguồn offline (loop, speed, fps)
         """
-        self.rtsp_url = RTSP_URL
-        self.max_reconnect_attempts = max_reconnect_attempts
-        self.reconnect_delay = reconnect_delay
+        self.rtsp_url = rtsp_url or RTSP_URL
+        self.source = source or SOURCE_RTSP
+        self.uri = uri or self.rtsp_url
+        self.options = options
+        self.backend = backend or CAMERA_BACKEND
+        # Lật gương ngay khi đọc, hoặc để renderer lật (MIRROR_MODE = "render")
+        self.mirror = MIRROR_MODE == "ingest"
+        # Backend "rtsp" đọc qua thư viện rtsp, các nguồn/backend khác qua reader của frame_sources
+        self.use_reader = self.source != SOURCE_RTSP or self.backend != "rtsp"
         self.client = None
-        self.reconnect_count = 0
+        # rtsp.Client.read() không chặn và luôn trả về ảnh mới nhất:
+        # giới hạn nhịp đọc + bỏ qua ảnh trùng (cùng object với lần đọc trước)
+        self._pacer = FramePacer(CAMERA_MAX_FPS)
+        self._last_image = None
         self.last_frame_time = 0
-        self.frame_timeout = 5.0  # Timeout nếu không nhận được frame trong 5s
+        self.frame_timeout = CAMERA_FRAME_TIMEOUT  # Timeout nếu không nhận được frame
+        self.last_error = None
         
-        self._connect()
+        if connect:
+            self.connect()
 
-    def _connect(self):
-        """Kết nối hoặc reconnect đến RTSP stream"""
-        logger.info(f"--- Đang kết nối Camera: {self.rtsp_url} ---")
+    def connect(self):
+        """Kết nối hoặc reconnect đến RTSP stream (1 lần thử, không sleep cố định)"""
+        logger.info(f"--- Đang kết nối Camera ({self.source}/{self.backend}) ---")
         try:
             # Đóng connection cũ nếu có
-            if self.client is not None:
-                try:
-                    self.client.close()
-                except Exception as e:
-                    logger.warning(f"Lỗi khi đóng connection cũ: {e}")
+            self.release()
             
             # Tạo connection mới
-            self.client = rtsp.Client(rtsp_server_uri=self.rtsp_url, verbose=False)
-            time.sleep(2)  # Chờ warm-up
+            self.client = self._create_client()
+
+            # Chờ tới khi stream mở được (thay cho warm-up cố định 2 giây)
+            deadline = time.time() + CAMERA_READY_TIMEOUT
+            while not self.client.isOpened() and time.time() < deadline:
+                time.sleep(0.05)
             
             # Kiểm tra connection
             if self.client.isOpened():
                 logger.info("✅ Kết nối Camera thành công!")
-                self.reconnect_count = 0
+                self.last_frame_time = time.time()
+                self.last_error = None
                 return True
             else:
                 logger.warning("⚠️ Camera connection không mở được")
-                self.client = None
+                self.last_error = "Không mở được stream"
+                self.release()
                 return False
                 
         except Exception as e:
             logger.error(f"❌ Lỗi khởi tạo Camera: {e}", exc_info=True)
-            self.client = None
+            self.last_error = str(e)
+            self.release()
             return False
 
-    def _try_reconnect(self):
-        """Thử reconnect nếu connection bị mất"""
-        if self.reconnect_count >= self.max_reconnect_attempts:
-            logger.error(f"❌ Đã thử reconnect {self.max_reconnect_attempts} lần nhưng thất bại")
-            return False
-        
-        self.reconnect_count += 1
-        logger.warning(f"🔄 Đang thử reconnect lần {self.reconnect_count}/{self.max_reconnect_attempts}...")
-        time.sleep(self.reconnect_delay)
-        return self._connect()
+    def _create_client(self):
+        """Tạo client đọc frame theo nguồn và backend đã chọn"""
+        if self.use_reader:
+            return create_reader(self.source, self.uri, self.mirror, self.backend, self.options)
+        return rtsp.Client(rtsp_server_uri=self.rtsp_url, verbose=False)
 
     def is_opened(self):
         """Kiểm tra camera có đang mở không"""
@@ -83,47 +120,55 @@ class CameraStream:
 
     def get_frame(self):
         """
-        Trả về frame định dạng OpenCV (BGR) đã resize
-        Tự động reconnect nếu connection bị mất
+        Trả về frame định dạng OpenCV (BGR) đã resize, None nếu chưa có frame mới
+        Không chờ reconnect: khi mất kết nối, connection bị đóng để supervisor kết nối lại
         """
         # Kiểm tra connection
         if not self.is_opened():
-            if not self._try_reconnect():
-                return None
+            return None
         
         try:
-            # Đọc frame từ RTSP
-            pil_image = self.client.read()
-            
-            if pil_image is None:
+            if not self.use_reader and not self._pacer.ready():
+                return None
+
+            # Đọc frame từ RTSP (client rtsp: mảng RGB gốc, không qua PIL)
+            image = self.client.read() if self.use_reader else self.client.read(raw=True)
+
+            if image is None or image is self._last_image:
                 # Kiểm tra timeout
                 current_time = time.time()
                 if current_time - self.last_frame_time > self.frame_timeout:
-                    logger.warning("⚠️ Không nhận được frame trong thời gian dài, thử reconnect...")
-                    if not self._try_reconnect():
-                        return None
+                    logger.warning("⚠️ Không nhận được frame trong thời gian dài, đóng kết nối để reconnect...")
+                    self.last_error = "Không nhận được frame"
+                    self.release()
                 return None
             
             # Cập nhật thời gian nhận frame thành công
             self.last_frame_time = time.time()
+            self._last_image = image
+
+            # Reader frame_sources: frame đã là BGR đúng kích thước, mảng riêng cho mỗi frame
+            if self.use_reader:
+                return image
             
-            # Convert PIL -> OpenCV
-            frame = np.array(pil_image)
-            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+            # Convert RGB -> OpenCV BGR
+            frame = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
 
             # Resize chuẩn
             frame = cv2.resize(frame, (FRAME_WIDTH, FRAME_HEIGHT))
 
             # Lật gương (Mirror) cho tự nhiên
-            frame = cv2.flip(frame, 1)
+            if self.mirror:
+                frame = cv2.flip(frame, 1)
 
             return frame
             
         except Exception as e:
             logger.error(f"❌ Lỗi khi đọc frame: {e}", exc_info=True)
-            # Thử reconnect nếu có lỗi
+            self.last_error = str(e)
+            # Đóng kết nối nếu stream đã hỏng, supervisor sẽ kết nối lại
             if not self.is_opened():
-                self._try_reconnect()
+                self.release()
             return None
 
     def release(self):
@@ -136,6 +181,7 @@ class CameraStream:
                 logger.error(f"❌ Lỗi khi đóng camera: {e}", exc_info=True)
             finally:
                 self.client = None
+                self._last_image = None
 
     def __del__(self):
         """Destructor - đảm bảo camera được đóng khi object bị xóa"""
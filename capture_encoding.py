@@ -0,0 +1,165 @@
+# capture_encoding.py
+import base64
+import logging
+import threading
+import cv2
+import numpy as np
+import config as cfg
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+# Định dạng ảnh chụp: tên -> (đuôi file cho imencode, tên tham số quality trong cv2, MIME type)
+FORMATS = {
+    "jpeg": (".jpg", "IMWRITE_JPEG_QUALITY", "image/jpeg"),
+    "webp": (".webp", "IMWRITE_WEBP_QUALITY", "image/webp"),
+    "avif": (".avif", "IMWRITE_AVIF_QUALITY", "image/avif"),
+}
+
+_supported = {}
+_supported_lock = threading.Lock()
+
+
+class EncodedImage:
+    """Ảnh đã encode: bytes + thông tin định dạng"""
+
+    __slots__ = ("data", "format", "mime", "quality", "passes")
+
+    def __init__(self, data, fmt, mime, quality, passes):
+        self.data = data
+        self.format = fmt
+        self.mime = mime
+        self.quality = quality
+        self.passes = passes
+
+    def __len__(self):
+        return len(self.data)
+
+
+def is_format_supported(fmt):
+    """Bản OpenCV hiện tại có encode được định dạng này không (kiểm tra 1 lần, có cache)"""
+    with _supported_lock:
+        if fmt in _supported:
+            return _supported[fmt]
+
+    supported = False
+    if fmt in FORMATS:
+        ext, param_name, _ = FORMATS[fmt]
+        param = getattr(cv2, param_name, None)
+        try:
+            if param is not None and cv2.haveImageWriter("probe" + ext):
+                ok, _ = cv2.imencode(ext, np.zeros((16, 16, 3), dtype=np.uint8), [param, 80])
+                supported = bool(ok)
+        except cv2.error:
+            supported = False
+
+    with _supported_lock:
+        _supported[fmt] = supported
+    if not supported:
+        logger.warning(f"⚠️ OpenCV không hỗ trợ encode {fmt}, dùng jpeg")
+    return supported
+
+
+def resolve_format(fmt):
+    """Định dạng thực tế sẽ dùng (quay về jpeg nếu không hỗ trợ)"""
+    fmt = (fmt or "jpeg").lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt != "jpeg" and not is_format_supported(fmt):
+        return "jpeg"
+    return fmt
+
+
+def _encode(image, fmt, quality):
+    ext, param_name, _ = FORMATS[fmt]
+    ok, buffer = cv2.imencode(ext, image, [getattr(cv2, param_name), int(quality)])
+    if not ok:
+        return None
+    return buffer
+
+
+def encode_to_budget(image, max_bytes, fmt=None, quality=None, min_quality=None, max_passes=None):
+    """
+    Encode ảnh với chất lượng cao nhất mà vẫn <= max_bytes
+
+    Lần đầu encode ở `quality`, nếu vượt ngân sách thì tìm nhị phân trong [min_quality, quality),
+    tối đa `max_passes` lần encode. Không đạt được thì trả về bản nhỏ nhất đã encode.
+
+    Returns:
+        EncodedImage hoặc None nếu lỗi
+    """
+    fmt = resolve_format(fmt or cfg.CAPTURE_FORMAT)
+    quality = int(quality if quality is not None else cfg.CAPTURE_QUALITY)
+    min_quality = int(min_quality if min_quality is not None else cfg.CAPTURE_MIN_QUALITY)
+    max_passes = max(1, max_passes if max_passes is not None else cfg.CAPTURE_ENCODE_MAX_PASSES)
+    mime = FORMATS[fmt][2]
+
+    buffer = _encode(image, fmt, quality)
+    if buffer is None:
+        return None
+    passes = 1
+    if max_bytes is None or len(buffer) <= max_bytes:
+        return EncodedImage(buffer.tobytes(), fmt, mime, quality, passes)
+
+    best = None          # (quality, buffer) lớn nhất còn nằm trong ngân sách
+    smallest = (quality, buffer)
+    low, high = min_quality, quality - 1
+    while low <= high and passes < max_passes:
+        # Lần thử đầu tiên: đoán theo tỷ lệ kích thước, các lần sau: chia đôi khoảng
+        if passes == 1:
+            guess = int(quality * max_bytes / len(buffer))
+            mid = min(high, max(low, guess))
+        else:
+            mid = (low + high + 1) // 2
+        candidate = _encode(image, fmt, mid)
+        passes += 1
+        if candidate is None:
+            break
+        if len(candidate) <= max_bytes:
+            best = (mid, candidate)
+            low = mid + 1
+        else:
+            high = mid - 1
+            if len(candidate) < len(smallest[1]):
+                smallest = (mid, candidate)
+
+    if best is None:
+        # Chưa thử mức thấp nhất và còn lượt => thử luôn để có bản nhỏ nhất có thể
+        if smallest[0] > min_quality and passes < max_passes:
+            candidate = _encode(image, fmt, min_quality)
+            passes += 1
+            if candidate is not None:
+                smallest = (min_quality, candidate)
+        logger.warning(f"⚠️ Không đạt ngân sách {max_bytes} bytes, dùng quality {smallest[0]} "
+                       f"({len(smallest[1])} bytes)")
+        best = smallest
+
+    return EncodedImage(best[1].tobytes(), fmt, mime, best[0], passes)
+
+
+def to_data_url(encoded):
+    """Base64 data URL (tương thích client cũ, lớn hơn ~33% so với binary)"""
+    return f"data:{encoded.mime};base64,{base64.b64encode(encoded.data).decode('ascii')}"
+
+
+def encode_capture(image, fmt=None, max_size_kb=None):
+    """Encode ảnh chụp theo cấu hình CAPTURE_* (định dạng, ngân sách KB, số lần encode tối đa)"""
+    if max_size_kb is None:
+        max_size_kb = cfg.CAPTURE_MAX_SIZE_KB
+    return encode_to_budget(image, int(max_size_kb * 1024), fmt=fmt)
+
+
+def build_capture_payload(encoded, transport=None, url=None):
+    """
+    Payload ảnh cho sự kiện capture_success
+        "url": {'url': URL ảnh đã lưu, 'mime': ..., 'size': ...} (không có url => như "base64")
+        "base64": {'url': data URL}
+        "binary": {'image': bytes (binary attachment của Socket.IO), 'mime': ..., 'size': ...}
+    """
+    transport = transport or cfg.CAPTURE_TRANSPORT
+    if transport == "url" and url:
+        return {'url': url, 'mime': encoded.mime, 'size': len(encoded.data)}
+    if transport == "binary":
+        return {'image': encoded.data, 'mime': encoded.mime, 'size': len(encoded.data)}
+    return {'url': to_data_url(encoded)}
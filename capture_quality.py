@@ -0,0 +1,95 @@
+# capture_quality.py
+import logging
+import cv2
+import numpy as np
+import config as cfg
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+def score_sharpness(gray):
+    """Độ nét: phương sai Laplacian, chuẩn hoá về 0..1 (ảnh mờ do chuyển động -> gần 0)"""
+    variance = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+    return variance / (variance + cfg.CAPTURE_SHARPNESS_REF)
+
+
+def score_exposure(gray):
+    """Độ sáng: 1 khi trung bình ~128, trừ điểm theo tỷ lệ điểm ảnh bị cháy sáng / quá tối"""
+    mean = float(gray.mean())
+    clipped = float(np.count_nonzero((gray < 8) | (gray > 247))) / gray.size
+    return max(0.0, 1.0 - abs(mean - 128.0) / 128.0 - clipped)
+
+
+def score_centring(bbox):
+    """Độ lệch tâm khuôn mặt so với tâm vùng an toàn (1 = đúng tâm, 0 = lệch >= CENTER_TOLERANCE)"""
+    face_x = (bbox.xmin + bbox.width / 2) * cfg.FRAME_WIDTH
+    face_y = (bbox.ymin + bbox.height / 2) * cfg.FRAME_HEIGHT
+    zone_x = cfg.ZONE_X + cfg.ZONE_WIDTH / 2
+    zone_y = cfg.ZONE_Y + cfg.ZONE_HEIGHT / 2
+    distance = float(np.hypot(face_x - zone_x, face_y - zone_y))
+    return max(0.0, 1.0 - distance / max(cfg.CENTER_TOLERANCE, 1))
+
+
+def score_candidate(crop, detection=None):
+    """
+    Điểm chất lượng của 1 ảnh crop vùng an toàn (càng cao càng tốt)
+
+    Args:
+        crop: Ảnh BGR vùng an toàn (chưa copy, chỉ đọc)
+        detection: Detection của khuôn mặt trong vùng (score + bbox), None nếu không có
+    Returns: (điểm tổng, dict điểm thành phần)
+    """
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    # Chấm điểm trên ảnh nhỏ một nửa: đủ để so sánh các frame với nhau, rẻ hơn ~4 lần
+    gray = cv2.resize(gray, (gray.shape[1] // 2, gray.shape[0] // 2), interpolation=cv2.INTER_AREA)
+
+    parts = {
+        "sharpness": score_sharpness(gray),
+        "exposure": score_exposure(gray),
+        "confidence": 0.0,
+        "centring": 0.0
+    }
+    if detection is not None:
+        parts["confidence"] = float(detection.score[0]) if len(detection.score) else 0.0
+        parts["centring"] = score_centring(detection.location_data.relative_bounding_box)
+
+    weights = cfg.CAPTURE_SCORE_WEIGHTS
+    total = sum(weights.get(name, 0.0) * value for name, value in parts.items())
+    return total, parts
+
+
+class CaptureCandidateBuffer:
+    """
+    Giữ `capacity` ảnh crop có điểm cao nhất trong cửa sổ ổn định (REQUIRED_FRAMES frame liên tiếp).
+    Chỉ copy crop khi nó lọt vào nhóm tốt nhất, frame bị loại không tốn cấp phát.
+    """
+
+    def __init__(self, capacity=None):
+        self.capacity = max(1, capacity if capacity is not None else cfg.CAPTURE_CANDIDATES)
+        self._items = []  # [(score, crop, parts)]
+
+    def __len__(self):
+        return len(self._items)
+
+    def offer(self, score, crop_fn, parts=None):
+        """
+        Đề xuất 1 ứng viên, crop_fn() chỉ được gọi (để copy ảnh) khi ứng viên được giữ lại
+        Returns: True nếu được giữ lại
+        """
+        if len(self._items) >= self.capacity:
+            worst = min(range(len(self._items)), key=lambda i: self._items[i][0])
+            if score <= self._items[worst][0]:
+                return False
+            self._items.pop(worst)
+        self._items.append((score, crop_fn(), parts))
+        return True
+
+    def best(self):
+        """Returns: (score, crop, parts) tốt nhất hoặc None"""
+        if not self._items:
+            return None
+        return max(self._items, key=lambda item: item[0])
+
+    def clear(self):
+        self._items = []
@@ -0,0 +1,64 @@
+# capture_session.py
+import threading
+import time
+import logging
+from capture_quality import CaptureCandidateBuffer
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class CaptureSession:
+    """Trạng thái chụp của 1 client Socket.IO (1 kiosk / 1 trạm đăng ký)"""
+
+    def __init__(self, sid, camera_id, base_url=None):
+        self.sid = sid
+        self.camera_id = camera_id
+        # Gốc URL client dùng để kết nối (vd: http://192.168.1.10:5000/), dùng để tạo URL ảnh chụp
+        self.base_url = base_url
+        self.started_at = time.time()
+        # Bộ đếm riêng cho từng phiên, không dùng chung giữa các client
+        self.consecutive_success_frames = 0
+        # Ảnh crop tốt nhất trong cửa sổ ổn định hiện tại
+        self.capture_candidates = CaptureCandidateBuffer()
+
+
+class CaptureSessionRegistry:
+    """Quản lý các phiên chụp theo Socket.IO sid (thread-safe)"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def start(self, sid, camera_id, base_url=None):
+        """Bắt đầu (hoặc bắt đầu lại) phiên chụp cho sid, bộ đếm luôn được reset"""
+        session = CaptureSession(sid, camera_id, base_url)
+        with self._lock:
+            self._sessions[sid] = session
+        logger.info(f"📸 Phiên chụp mới: sid={sid}, camera={camera_id}")
+        return session
+
+    def stop(self, sid):
+        """Kết thúc phiên chụp của sid, trả về session cũ (hoặc None)"""
+        with self._lock:
+            return self._sessions.pop(sid, None)
+
+    def finish(self, session):
+        """Kết thúc đúng phiên này (không xoá nếu client đã bắt đầu phiên mới)"""
+        with self._lock:
+            if self._sessions.get(session.sid) is session:
+                del self._sessions[session.sid]
+                return True
+            return False
+
+    def get(self, sid):
+        with self._lock:
+            return self._sessions.get(sid)
+
+    def sessions_for_camera(self, camera_id):
+        with self._lock:
+            return [s for s in self._sessions.values() if s.camera_id == camera_id]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,296 @@
+# capture_store.py
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+import logging
+import config as cfg
+from capture_encoding import FORMATS
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class CaptureStore:
+    """
+    Lưu ảnh chụp vào IMAGE_FOLDER trên 1 thread nền:
+        - save() chỉ đặt tên + đưa vào queue có giới hạn (không ghi đĩa trên detection worker)
+        - writer ghi file tạm rồi os.replace sang tên thật (không bao giờ có file ghi dở),
+          fsync theo lô: mỗi lượt fsync các file + 1 lần fsync thư mục
+        - on_done(tên file, ok) được gọi sau khi ghi xong (hoặc lỗi) => chỉ gửi URL khi file đã tồn tại
+        - dọn ảnh cũ theo số lượng / tuổi (CAPTURE_RETENTION_*) trên cùng thread
+    """
+
+    def __init__(self, folder=None, prefix=None, queue_size=None, batch_size=None,
+                 batch_window=None, fsync=None, max_files=None, max_age_days=None, retention_interval=None):
+        """
+        Args:
+            folder: Thư mục lưu ảnh
+            prefix: Tiền tố tên file
+            queue_size: Số ảnh chờ ghi tối đa (đầy => save() trả về None)
+            batch_size: Số file tối đa trong 1 lượt ghi
+            batch_window: Thời gian chờ thêm (giây) để gom ảnh vào cùng lượt
+            fsync: fsync file + thư mục trước khi coi là đã ghi xong
+            max_files: Số ảnh giữ lại tối đa (0 = không giới hạn)
+            max_age_days: Tuổi tối đa của ảnh (ngày, 0 = không giới hạn)
+            retention_interval: Chu kỳ dọn ảnh cũ (giây)
+        """
+        self.folder = os.path.abspath(folder or cfg.IMAGE_FOLDER)
+        self.prefix = prefix if prefix is not None else cfg.IMAGE_PREFIX
+        self.batch_size = max(1, batch_size if batch_size is not None else cfg.CAPTURE_STORE_BATCH_SIZE)
+        self.batch_window = batch_window if batch_window is not None else cfg.CAPTURE_STORE_BATCH_WINDOW
+        self.fsync = fsync if fsync is not None else cfg.CAPTURE_STORE_FSYNC
+        self.max_files = max_files if max_files is not None else cfg.CAPTURE_RETENTION_MAX_FILES
+        self.max_age_days = max_age_days if max_age_days is not None else cfg.CAPTURE_RETENTION_MAX_AGE_DAYS
+        self.retention_interval = (retention_interval if retention_interval is not None
+                                   else cfg.CAPTURE_RETENTION_INTERVAL)
+        self._name_pattern = re.compile(re.escape(self.prefix) + r"([0-9]+)_[0-9a-f]{8}\.[a-z]+")
+
+        self._queue = queue.Queue(maxsize=max(1, queue_size if queue_size is not None
+                                              else cfg.CAPTURE_STORE_QUEUE_SIZE))
+        self._pending = {}  # tên file -> (bytes, mime) chưa ghi xong
+        self._callbacks = {}  # tên file -> on_done(tên file, ok)
+        self._pruned_at = 0.0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.pruned = 0
+
+    # --- API ---
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            os.makedirs(self.folder, exist_ok=True)
+            self._remove_temp_files()
+            self._thread = threading.Thread(target=self._writer_loop, name="capture-store", daemon=True)
+            self._thread.start()
+        logger.info(f"✅ CaptureStore ghi ảnh vào {self.folder}")
+
+    def save(self, encoded, on_done=None):
+        """
+        Đưa ảnh đã encode vào queue ghi nền
+
+        Args:
+            encoded: EncodedImage
+            on_done: Hàm on_done(tên file, ok) gọi trên thread ghi sau khi ghi xong / lỗi
+        Returns:
+            Tên file (đọc được ngay qua get()), hoặc None nếu queue đầy (on_done không được gọi)
+        """
+        if self._thread is None:
+            self.start()
+        name = self._make_name(encoded.format)
+        with self._lock:
+            self._pending[name] = (encoded.data, encoded.mime)
+            if on_done is not None:
+                self._callbacks[name] = on_done
+        try:
+            self._queue.put_nowait(name)
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(name, None)
+                self._callbacks.pop(name, None)
+                self.dropped += 1
+            logger.warning("⚠️ Queue lưu ảnh đầy, bỏ qua lưu file")
+            return None
+        return name
+
+    def get(self, name):
+        """(bytes, mime) của ảnh chưa ghi xong xuống đĩa, None nếu không còn trong bộ nhớ"""
+        with self._lock:
+            return self._pending.get(name)
+
+    def is_valid_name(self, name):
+        """Chỉ chấp nhận tên do store tạo ra (chặn path traversal)"""
+        return bool(self._name_pattern.fullmatch(name))
+
+    def url_for(self, name, base_url=None):
+        """
+        URL của ảnh: SERVER_BASE_URL (nếu cấu hình) hoặc base_url (host client đã kết nối),
+        không có cả hai thì trả về đường dẫn tương đối
+        """
+        path = f"{cfg.CAPTURE_URL_PATH}/{name}"
+        base = cfg.SERVER_BASE_URL or base_url
+        return f"{base.rstrip('/')}{path}" if base else path
+
+    def shutdown(self, timeout=5.0):
+        """Ghi nốt ảnh còn trong queue rồi dừng writer"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "folder": self.folder,
+                "queued": self._queue.qsize(),
+                "pending": len(self._pending),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+                "pruned": self.pruned
+            }
+
+    # --- WRITER ---
+
+    def _make_name(self, fmt):
+        ext = cfg.IMAGE_EXTENSION if fmt == "jpeg" else FORMATS[fmt][0]
+        return f"{self.prefix}{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}{ext}"
+
+    def _remove_temp_files(self):
+        """Xoá file tạm còn sót lại nếu process trước bị dừng giữa chừng"""
+        for entry in os.listdir(self.folder):
+            if entry.startswith(".") and entry.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(self.folder, entry))
+                except OSError:
+                    pass
+
+    def _next_batch(self):
+        try:
+            names = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.time() + self.batch_window
+        while len(names) < self.batch_size:
+            remaining = deadline - time.time()
+            try:
+                names.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return names
+
+    def _writer_loop(self):
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            names = self._next_batch()
+            if names:
+                self._write_batch(names)
+            if time.time() - self._pruned_at >= self.retention_interval:
+                self.prune()
+
+    def prune(self, now=None):
+        """Xoá ảnh quá tuổi / vượt số lượng tối đa (cũ nhất trước, thời điểm lấy từ tên file)"""
+        now = now if now is not None else time.time()
+        self._pruned_at = now
+        if not self.max_files and not self.max_age_days:
+            return 0
+        try:
+            entries = os.listdir(self.folder)
+        except OSError as e:
+            logger.error(f"❌ Lỗi khi đọc thư mục ảnh: {e}")
+            return 0
+
+        files = []
+        for entry in entries:
+            match = self._name_pattern.fullmatch(entry)
+            if match:
+                files.append((int(match.group(1)) / 1000.0, entry))
+        files.sort()
+
+        expired = []
+        if self.max_age_days:
+            cutoff = now - self.max_age_days * 86400
+            while files and files[0][0] < cutoff:
+                expired.append(files.pop(0)[1])
+        if self.max_files and len(files) > self.max_files:
+            expired.extend(entry for _, entry in files[:len(files) - self.max_files])
+
+        removed = 0
+        for entry in expired:
+            try:
+                os.remove(os.path.join(self.folder, entry))
+                removed += 1
+            except OSError as e:
+                logger.error(f"❌ Lỗi khi xoá ảnh cũ {entry}: {e}")
+        if removed:
+            with self._lock:
+                self.pruned += removed
+            logger.info(f"🧹 Đã xoá {removed} ảnh cũ trong {self.folder}")
+        return removed
+
+    def _write_batch(self, names):
+        written = []
+        # 1. Ghi file tạm (chưa đóng), fsync cả lô sau khi ghi xong
+        opened = []
+        for name in names:
+            entry = self.get(name)
+            if entry is None:
+                continue
+            tmp_path = os.path.join(self.folder, f".{name}.tmp")
+            handle = None
+            try:
+                handle = open(tmp_path, "wb")
+                handle.write(entry[0])
+                opened.append((name, tmp_path, handle))
+            except OSError as e:
+                logger.error(f"❌ Lỗi khi ghi ảnh {name}: {e}", exc_info=True)
+                if handle is not None:
+                    handle.close()
+                self._discard(name, tmp_path)
+
+        for name, tmp_path, handle in opened:
+            try:
+                handle.flush()
+                if self.fsync:
+                    os.fsync(handle.fileno())
+                handle.close()
+                # 2. Đổi tên nguyên tử: file thật luôn đầy đủ hoặc chưa tồn tại
+                os.replace(tmp_path, os.path.join(self.folder, name))
+                written.append(name)
+            except OSError as e:
+                logger.error(f"❌ Lỗi khi ghi ảnh {name}: {e}", exc_info=True)
+                handle.close()
+                self._discard(name, tmp_path)
+
+        # 3. 1 lần fsync thư mục cho cả lô (lưu các lần đổi tên)
+        if written and self.fsync:
+            self._fsync_folder()
+
+        with self._lock:
+            for name in written:
+                self._pending.pop(name, None)
+            callbacks = [(name, self._callbacks.pop(name, None)) for name in written]
+            self.written += len(written)
+            self.batches += 1
+        for name, on_done in callbacks:
+            self._notify(on_done, name, True)
+
+    def _notify(self, on_done, name, ok):
+        if on_done is None:
+            return
+        try:
+            on_done(name, ok)
+        except Exception as e:
+            logger.error(f"❌ Lỗi trong callback lưu ảnh {name}: {e}", exc_info=True)
+
+    def _fsync_folder(self):
+        try:
+            fd = os.open(self.folder, os.O_RDONLY)
+        except OSError:
+            return  # Windows không mở được thư mục để fsync
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def _discard(self, name, tmp_path):
+        with self._lock:
+            self._pending.pop(name, None)
+            on_done = self._callbacks.pop(name, None)
+            self.failed += 1
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        self._notify(on_done, name, False)
@@ -0,0 +1,333 @@
+# face_index.py
+import json
+import os
+import queue
+import threading
+import logging
+from concurrent.futures import Future
+import cv2
+import numpy as np
+import config as cfg
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+# --- EMBEDDER ---
+
+class SFaceEmbedder:
+    """
+    Embedding 128 chiều bằng cv2.FaceRecognizerSF (opencv-contrib-python).
+    Mặt được căn chỉnh theo 5 điểm mốc của YuNet (cv2.FaceDetectorYN) nếu có model,
+    không có thì chỉ resize ảnh crop về 112x112.
+    Không thread-safe: chỉ dùng trên 1 thread (worker của FaceIdentifier).
+    """
+
+    dim = 128
+    input_size = (112, 112)
+
+    def __init__(self, model_path=None, align_model_path=None):
+        model_path = model_path or cfg.FACE_EMBEDDER_MODEL
+        align_model_path = align_model_path if align_model_path is not None else cfg.FACE_ALIGN_MODEL
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Không tìm thấy model embedding: {model_path}")
+        self.recognizer = cv2.FaceRecognizerSF.create(model_path, "")
+        self.aligner = None
+        if align_model_path and os.path.exists(align_model_path):
+            self.aligner = cv2.FaceDetectorYN.create(align_model_path, "", (320, 320))
+        elif align_model_path:
+            logger.warning(f"⚠️ Không tìm thấy model căn chỉnh: {align_model_path}, chỉ resize ảnh")
+
+    def _align(self, image):
+        if self.aligner is not None:
+            height, width = image.shape[:2]
+            self.aligner.setInputSize((width, height))
+            _, faces = self.aligner.detect(image)
+            if faces is not None and len(faces):
+                largest = faces[int(np.argmax(faces[:, 2] * faces[:, 3]))]
+                return self.recognizer.alignCrop(image, largest)
+        return cv2.resize(image, self.input_size, interpolation=cv2.INTER_AREA)
+
+    def embed(self, image):
+        """Returns: vector float32 (dim,)"""
+        return self.recognizer.feature(self._align(image)).reshape(-1).astype(np.float32)
+
+
+# Tên embedder -> class (thêm model khác: class có thuộc tính dim và hàm embed(image))
+EMBEDDERS = {
+    "sface": SFaceEmbedder,
+}
+
+
+def create_embedder(name=None):
+    name = name or cfg.FACE_EMBEDDER
+    if name not in EMBEDDERS:
+        raise ValueError(f"Embedder không hợp lệ: {name}")
+    return EMBEDDERS[name]()
+
+
+# --- INDEX ---
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class FaceEmbeddingIndex:
+    """
+    Index embedding cho tìm kiếm 1:N bằng cosine:
+        - <path>.f32: ma trận float32 liên tục (capacity x dim), memory-mapped, vector đã chuẩn hoá L2
+          => cosine = tích vô hướng, tìm kiếm = nhân ma trận theo lô + argpartition
+        - <path>.labels: 1 nhãn (JSON) mỗi dòng, số dòng hoàn chỉnh = số vector hợp lệ
+        - <path>.json: số chiều
+    Thêm vector không cần build lại: ghi vào dòng tiếp theo, hết chỗ thì nhân đôi file.
+    """
+
+    def __init__(self, path=None, dim=None, initial_capacity=None, search_chunk=None):
+        """
+        Args:
+            path: Đường dẫn gốc của các file index (không có đuôi)
+            dim: Số chiều embedding (bắt buộc khi tạo index mới)
+            initial_capacity: Số dòng cấp phát ban đầu
+            search_chunk: Số dòng nhân ma trận mỗi lượt khi tìm kiếm
+        """
+        self.path = path or cfg.FACE_INDEX_PATH
+        self.search_chunk = max(1, search_chunk if search_chunk is not None else cfg.FACE_INDEX_SEARCH_CHUNK)
+        initial_capacity = max(1, initial_capacity if initial_capacity is not None
+                               else cfg.FACE_INDEX_INITIAL_CAPACITY)
+        self._lock = threading.RLock()
+
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.dim = self._load_dim(dim)
+        self.labels = self._load_labels()
+        self.count = len(self.labels)
+
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self._matrix_path) if os.path.exists(self._matrix_path) else 0
+        capacity = max(initial_capacity, size // row_bytes, self.count)
+        if size != capacity * row_bytes:
+            with open(self._matrix_path, "ab") as handle:
+                handle.truncate(capacity * row_bytes)
+        self.capacity = capacity
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        logger.info(f"✅ Face index: {self.count} khuôn mặt, {self.dim} chiều ({self.path})")
+
+    @property
+    def _matrix_path(self):
+        return self.path + ".f32"
+
+    @property
+    def _labels_path(self):
+        return self.path + ".labels"
+
+    @property
+    def _meta_path(self):
+        return self.path + ".json"
+
+    def _load_dim(self, dim):
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as handle:
+                stored = int(json.load(handle)["dim"])
+            if dim is not None and dim != stored:
+                raise ValueError(f"Index có {stored} chiều, embedder có {dim} chiều")
+            return stored
+        if dim is None:
+            raise ValueError("Cần số chiều (dim) để tạo index mới")
+        with open(self._meta_path, "w", encoding="utf-8") as handle:
+            json.dump({"dim": int(dim)}, handle)
+        return int(dim)
+
+    def _load_labels(self):
+        if not os.path.exists(self._labels_path):
+            return []
+        with open(self._labels_path, "rb") as handle:
+            data = handle.read()
+        # Phần sau "\n" cuối cùng là bản ghi dở dang (process bị dừng giữa chừng)
+        # => cắt khỏi file, nếu không lần add() tiếp theo sẽ ghi nối vào dòng hỏng
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            logger.warning(f"⚠️ Bỏ nhãn ghi dở dang cuối file {self._labels_path}")
+            with open(self._labels_path, "r+b") as handle:
+                handle.truncate(complete)
+        return [json.loads(line) for line in data[:complete].decode("utf-8").split("\n")[:-1]]
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self, needed):
+        """Nhân đôi dung lượng file (giữ nguyên dữ liệu, chỉ map lại)"""
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        self._matrix.flush()
+        del self._matrix
+        with open(self._matrix_path, "r+b") as handle:
+            handle.truncate(capacity * self.dim * 4)
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.capacity = capacity
+        logger.info(f"📈 Face index tăng dung lượng lên {capacity} dòng")
+
+    def add(self, vectors, labels):
+        """
+        Thêm embedding (1 vector hoặc ma trận n x dim) kèm nhãn
+
+        Returns: Vị trí của vector đầu tiên vừa thêm
+        """
+        vectors = _normalize(np.atleast_2d(vectors))
+        if isinstance(labels, str):
+            labels = [labels]
+        if vectors.shape != (len(labels), self.dim):
+            raise ValueError(f"Kích thước embedding không hợp lệ: {vectors.shape}")
+
+        with self._lock:
+            start = self.count
+            if start + len(labels) > self.capacity:
+                self._grow(start + len(labels))
+            # Ghi vector trước, nhãn sau: nhãn là mốc xác nhận bản ghi đã hoàn chỉnh
+            self._matrix[start:start + len(labels)] = vectors
+            self._matrix.flush()
+            with open(self._labels_path, "a", encoding="utf-8") as handle:
+                handle.write("".join(json.dumps(label, ensure_ascii=False) + "\n" for label in labels))
+            self.labels.extend(labels)
+            self.count += len(labels)
+            return start
+
+    def search(self, queries, top_k=None):
+        """
+        Top-k theo cosine cho 1 hoặc nhiều embedding
+
+        Returns: Với mỗi query, danh sách [{'label', 'score', 'index'}] giảm dần theo score
+        """
+        top_k = top_k or cfg.FACE_MATCH_TOP_K
+        queries = _normalize(np.atleast_2d(queries))
+        with self._lock:
+            count = self.count
+            matrix = self._matrix
+        if count == 0:
+            return [[] for _ in range(len(queries))]
+        k = min(top_k, count)
+
+        # Mỗi lượt: (q x dim) @ (dim x chunk), giữ k ứng viên tốt nhất mỗi query rồi gộp
+        best_scores = []
+        best_indices = []
+        for start in range(0, count, self.search_chunk):
+            block = np.asarray(matrix[start:min(count, start + self.search_chunk)])
+            scores = queries @ block.T
+            if k < scores.shape[1]:
+                part = np.argpartition(scores, -k, axis=1)[:, -k:]
+                scores = np.take_along_axis(scores, part, axis=1)
+            else:
+                part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_scores.append(scores)
+            best_indices.append(part + start)
+        scores = np.concatenate(best_scores, axis=1)
+        indices = np.concatenate(best_indices, axis=1)
+
+        order = np.argsort(-scores, axis=1)[:, :k]
+        results = []
+        for row in range(len(queries)):
+            results.append([
+                {"label": self.labels[int(indices[row, column])],
+                 "score": round(float(scores[row, column]), 4),
+                 "index": int(indices[row, column])}
+                for column in order[row]
+            ])
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {"count": self.count, "capacity": self.capacity, "dim": self.dim, "path": self.path}
+
+
+# --- SERVICE ---
+
+class FaceIdentifier:
+    """
+    Chạy embedding + tìm kiếm trên 1 thread nền (không chặn detection worker):
+        - identify(image): sau khi chụp, Future -> top-k kết quả
+        - enroll(image, label): đăng ký người mới, Future -> vị trí trong index
+    Embedder và index được tạo trên thread nền ở lần dùng đầu tiên (nạp model mất thời gian).
+    """
+
+    def __init__(self, embedder_factory=create_embedder, index_factory=None, queue_size=None):
+        self.embedder_factory = embedder_factory
+        self.index_factory = index_factory or (lambda dim: FaceEmbeddingIndex(dim=dim))
+        self.embedder = None
+        self.index = None
+        self.error = None
+        self._queue = queue.Queue(maxsize=max(1, queue_size if queue_size is not None
+                                              else cfg.FACE_INDEX_QUEUE_SIZE))
+        self._thread = None
+        self._lock = threading.Lock()
+        self.identified = 0
+        self.enrolled = 0
+        self.dropped = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker_loop, name="face-index", daemon=True)
+                self._thread.start()
+
+    def _submit(self, image, label):
+        self.start()
+        future = Future()
+        try:
+            self._queue.put_nowait((image, label, future))
+        except queue.Full:
+            self.dropped += 1
+            future.set_exception(RuntimeError("Queue nhận diện đầy"))
+        return future
+
+    def identify(self, image):
+        return self._submit(image, None)
+
+    def enroll(self, image, label):
+        return self._submit(image, str(label))
+
+    def _load(self):
+        if self.index is None and self.error is None:
+            try:
+                self.embedder = self.embedder_factory()
+                self.index = self.index_factory(self.embedder.dim)
+            except Exception as e:
+                logger.error(f"❌ Không khởi tạo được face index: {e}", exc_info=True)
+                self.error = str(e)
+
+    def _worker_loop(self):
+        while True:
+            image, label, future = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._load()
+            if self.index is None:
+                future.set_exception(RuntimeError(f"Face index không khả dụng: {self.error}"))
+                continue
+            try:
+                embedding = self.embedder.embed(image)
+                if label is None:
+                    matches = self.index.search(embedding)[0]
+                    for match in matches:
+                        match["matched"] = match["score"] >= cfg.FACE_MATCH_THRESHOLD
+                    self.identified += 1
+                    future.set_result(matches)
+                else:
+                    position = self.index.add(embedding, label)
+                    self.enrolled += 1
+                    future.set_result(position)
+            except Exception as e:
+                logger.error(f"❌ Lỗi nhận diện khuôn mặt: {e}", exc_info=True)
+                future.set_exception(e)
+
+    def stats(self):
+        return {
+            "index": self.index.stats() if self.index is not None else None,
+            "error": self.error,
+            "queued": self._queue.qsize(),
+            "identified": self.identified,
+            "enrolled": self.enrolled,
+            "dropped": self.dropped
+        }
@@ -1,25 +1,143 @@
 import cv2
-import mediapipe as mp
 import numpy as np
 import logging
+import threading
 import config as cfg
+from capture_quality import CaptureCandidateBuffer, score_candidate
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
 
+def create_face_detector():
+    """Tạo 1 instance MediaPipe FaceDetection (mỗi instance chỉ dùng trên 1 thread tại 1 thời điểm)"""
+    # Import khi cần: MediaPipe nạp mất vài giây, không để nó chặn lúc import module / bind port
+    import mediapipe as mp
+    return mp.solutions.face_detection.FaceDetection(
+        min_detection_confidence=cfg.FACE_DETECTION_CONFIDENCE,
+        model_selection=cfg.FACE_DETECTION_MODEL)
+
+
+def get_detection_roi(frame_width, frame_height, margin=None):
+    """
+    Vùng chạy detection ở chế độ "zone": safe zone + margin, cắt theo biên frame
+    Returns: (x1, y1, x2, y2)
+    """
+    if margin is None:
+        margin = cfg.DETECTION_ZONE_MARGIN
+    x1 = max(0, cfg.ZONE_X - margin)
+    y1 = max(0, cfg.ZONE_Y - margin)
+    x2 = min(frame_width, cfg.ZONE_X + cfg.ZONE_WIDTH + margin)
+    y2 = min(frame_height, cfg.ZONE_Y + cfg.ZONE_HEIGHT + margin)
+    return x1, y1, x2, y2
+
+
+def remap_detection(detection, roi, frame_width, frame_height):
+    """Đổi toạ độ tương đối (theo vùng crop) của detection sang toạ độ tương đối theo cả frame"""
+    x1, y1, x2, y2 = roi
+    roi_w = x2 - x1
+    roi_h = y2 - y1
+    location = detection.location_data
+
+    bbox = location.relative_bounding_box
+    bbox.xmin = (x1 + bbox.xmin * roi_w) / frame_width
+    bbox.ymin = (y1 + bbox.ymin * roi_h) / frame_height
+    bbox.width = bbox.width * roi_w / frame_width
+    bbox.height = bbox.height * roi_h / frame_height
+
+    for keypoint in location.relative_keypoints:
+        keypoint.x = (x1 + keypoint.x * roi_w) / frame_width
+        keypoint.y = (y1 + keypoint.y * roi_h) / frame_height
+    return detection
+
+
+def detect_faces(face_detection, frame, mode=None):
+    """
+    Chạy MediaPipe trên frame BGR
+
+    Args:
+        mode: "full" - detection trên cả frame
+              "zone" - chỉ detection trên safe zone (+ margin), toạ độ được đổi lại theo cả frame
+              None - dùng config.DETECTION_MODE
+    Returns: Danh sách detection (rỗng nếu không có mặt)
+    """
+    if mode is None:
+        mode = cfg.DETECTION_MODE
+
+    roi = None
+    if mode == "zone":
+        frame_height, frame_width = frame.shape[:2]
+        roi = get_detection_roi(frame_width, frame_height)
+        x1, y1, x2, y2 = roi
+        # Crop trước khi đổi màu: chỉ convert + inference trên vùng nhỏ
+        frame = frame[y1:y2, x1:x2]
+
+    # Chuyển đổi BGR -> RGB cho MediaPipe
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    results = face_detection.process(rgb_frame)
+    if not results.detections:
+        return []
+
+    detections = list(results.detections)
+    if roi is not None:
+        for detection in detections:
+            remap_detection(detection, roi, frame_width, frame_height)
+    return detections
+
+
+class IconOverlay:
+    """
+    Icon đã đổi màu, đã cắt theo vị trí vẽ và nhân trước alpha (premultiplied) cho 1 màu.
+    Trộn bằng số nguyên uint16: out = (bg * (255 - a) + color * a) / 255
+    """
+
+    __slots__ = ("y1", "y2", "x1", "x2", "inv_alpha", "premult", "_scratch")
+
+    def __init__(self, y1, y2, x1, x2, inv_alpha, premult):
+        self.y1 = y1
+        self.y2 = y2
+        self.x1 = x1
+        self.x2 = x2
+        self.inv_alpha = inv_alpha
+        self.premult = premult
+        # Buffer tạm uint16 dùng lại cho mỗi thread (không cấp phát mỗi frame)
+        self._scratch = threading.local()
+
+    def blend(self, frame):
+        """Trộn icon trực tiếp vào frame (in-place)"""
+        scratch = self._scratch
+        if getattr(scratch, "acc", None) is None:
+            scratch.acc = np.empty(self.premult.shape, dtype=np.uint16)
+            scratch.tmp = np.empty(self.premult.shape, dtype=np.uint16)
+        acc, tmp = scratch.acc, scratch.tmp
+
+        bg_slice = frame[self.y1:self.y2, self.x1:self.x2]
+        np.multiply(bg_slice, self.inv_alpha, out=acc)
+        acc += self.premult
+        # Chia 255 có làm tròn: premult đã cộng sẵn 128, (t + (t >> 8)) >> 8
+        np.right_shift(acc, 8, out=tmp)
+        acc += tmp
+        acc >>= 8
+        np.copyto(bg_slice, acc, casting="unsafe")
+
+
 class FaceProcessor:
-    def __init__(self):
+    def __init__(self, with_detector=True):
+        """
+        Args:
+            with_detector: Tạo MediaPipe riêng cho processor. Đặt False khi detection
+                được chạy bởi InferenceService và processor chỉ dùng để kiểm tra điều kiện + vẽ
+        """
         try:
-            # Khởi tạo MediaPipe
-            logger.info("🔄 Đang khởi tạo MediaPipe Face Detection...")
-            self.mp_face_detection = mp.solutions.face_detection
-            self.face_detection = self.mp_face_detection.FaceDetection(
-                min_detection_confidence=cfg.FACE_DETECTION_CONFIDENCE,
-                model_selection=cfg.FACE_DETECTION_MODEL)
-            logger.info("✅ MediaPipe Face Detection đã sẵn sàng")
+            self.face_detection = None
+            if with_detector:
+                # Khởi tạo MediaPipe
+                logger.info("🔄 Đang khởi tạo MediaPipe Face Detection...")
+                self.face_detection = create_face_detector()
+                logger.info("✅ MediaPipe Face Detection đã sẵn sàng")
 
             self.consecutive_success_frames = 0
+            self.capture_candidates = CaptureCandidateBuffer()
 
             # --- KHỞI TẠO ICON ---
             # Load ảnh gốc (Ví dụ ảnh gốc màu trắng hoặc đen đều được)
@@ -48,6 +166,15 @@ class FaceProcessor:
                 except Exception as e:
                     logger.error(f"❌ Lỗi khi resize icon: {e}", exc_info=True)
                     self.icon_resized = None
+
+            # Tính sẵn icon cho từng màu trạng thái (icon, vị trí và màu đều cố định)
+            self._icon_overlays = {}
+            if self.icon_resized is not None:
+                for color in (cfg.COLOR_RED, cfg.COLOR_GREEN, cfg.COLOR_YELLOW):
+                    self.get_icon_overlay(color, (cfg.FRAME_HEIGHT, cfg.FRAME_WIDTH))
+
+            # --- RENDER PLAN ---
+            self.render_layers = self._compile_render_plan()
                     
         except Exception as e:
             logger.error(f"❌ Lỗi nghiêm trọng khi khởi tạo FaceProcessor: {e}", exc_info=True)
@@ -87,6 +214,119 @@ class FaceProcessor:
             logger.error(f"❌ Lỗi khi đổi màu icon: {e}", exc_info=True)
             return None
 
+    def get_icon_overlay(self, color, frame_shape):
+        """
+        Lấy IconOverlay đã tính sẵn cho màu + kích thước frame (tính 1 lần rồi cache)
+        Returns: IconOverlay hoặc None nếu icon không vẽ được
+        """
+        key = (tuple(color), frame_shape[0], frame_shape[1])
+        if key in self._icon_overlays:
+            return self._icon_overlays[key]
+
+        overlay = None
+        current_icon = self.recolor_icon(self.icon_resized, color)
+        if current_icon is not None:
+            zone_center_x = cfg.ZONE_X + cfg.ZONE_WIDTH // 2
+            zone_center_y = cfg.ZONE_Y + cfg.ZONE_HEIGHT // 2
+            pos_x = zone_center_x - self.icon_w // 2
+            pos_y = zone_center_y - self.icon_h // 2
+
+            y1, y2 = max(0, pos_y), min(frame_shape[0], pos_y + self.icon_h)
+            x1, x2 = max(0, pos_x), min(frame_shape[1], pos_x + self.icon_w)
+
+            if y1 < y2 and x1 < x2:
+                icon_slice = current_icon[y1 - pos_y:y2 - pos_y, x1 - pos_x:x2 - pos_x]
+
+                # Bỏ phần viền trong suốt hoàn toàn, chỉ trộn vùng có hình
+                ys, xs = np.nonzero(icon_slice[:, :, 3])
+                if len(ys) > 0:
+                    top, bottom = int(ys.min()), int(ys.max()) + 1
+                    left, right = int(xs.min()), int(xs.max()) + 1
+                    icon_slice = icon_slice[top:bottom, left:right]
+
+                    alpha = icon_slice[:, :, 3:4].astype(np.uint16)
+                    premult = icon_slice[:, :, :3].astype(np.uint16) * alpha + 128
+                    overlay = IconOverlay(y1 + top, y1 + bottom, x1 + left, x1 + right,
+                                          np.ascontiguousarray(255 - alpha),
+                                          np.ascontiguousarray(premult))
+
+        self._icon_overlays[key] = overlay
+        return overlay
+
+    def _compile_render_plan(self):
+        """
+        Chọn các lớp vẽ theo config (1 lần lúc khởi tạo).
+        Lớp bị tắt (alpha = 0, độ dày = 0, không có icon) bị bỏ qua hoàn toàn,
+        lớp bật thì chỉ trộn trong vùng zone, vẽ trực tiếp lên 1 buffer duy nhất.
+        """
+        layers = []
+        zone_x1, zone_y1 = max(0, cfg.ZONE_X), max(0, cfg.ZONE_Y)
+        zone_x2 = min(cfg.FRAME_WIDTH, cfg.ZONE_X + cfg.ZONE_WIDTH)
+        zone_y2 = min(cfg.FRAME_HEIGHT, cfg.ZONE_Y + cfg.ZONE_HEIGHT)
+
+        # 1. Nền mờ
+        if cfg.OVERLAY_ALPHA > 0 and zone_x1 < zone_x2 and zone_y1 < zone_y2:
+            self._zone_roi = (zone_y1, zone_y2, zone_x1, zone_x2)
+            self._zone_fill = np.full((zone_y2 - zone_y1, zone_x2 - zone_x1, 3), cfg.COLOR_WHITE, dtype=np.uint8)
+            layers.append(self._draw_zone_background)
+
+        # 2. Icon
+        if self.icon_resized is not None:
+            layers.append(self._draw_icon)
+
+        # 3. Ellipse
+        if cfg.ELLIPSE_ALPHA > 0 and cfg.THICKNESS_ELLIPSE != 0:
+            pad = abs(cfg.THICKNESS_ELLIPSE) + 2
+            x1, y1 = max(0, cfg.ZONE_X - pad), max(0, cfg.ZONE_Y - pad)
+            x2 = min(cfg.FRAME_WIDTH, cfg.ZONE_X + cfg.ZONE_WIDTH + pad)
+            y2 = min(cfg.FRAME_HEIGHT, cfg.ZONE_Y + cfg.ZONE_HEIGHT + pad)
+            self._ellipse_roi = (y1, y2, x1, x2)
+            layers.append(self._draw_ellipse)
+
+        logger.info(f"✅ Render plan: {[layer.__name__ for layer in layers]}")
+        return layers
+
+    def render(self, frame, color):
+        """Vẽ UI overlay theo render plan, trả về frame mới (frame gốc không bị sửa)"""
+        if cfg.MIRROR_MODE == "render":
+            # Lật gương luôn vào buffer output (thay cho bước copy)
+            frame_drawn = cv2.flip(frame, 1)
+        else:
+            frame_drawn = frame.copy()
+        for layer in self.render_layers:
+            try:
+                layer(frame_drawn, color)
+            except Exception as e:
+                logger.error(f"❌ Lỗi khi vẽ {layer.__name__}: {e}", exc_info=True)
+        return frame_drawn
+
+    def _draw_zone_background(self, frame_drawn, color):
+        """Nền mờ: chỉ trộn trong vùng zone"""
+        y1, y2, x1, x2 = self._zone_roi
+        roi = frame_drawn[y1:y2, x1:x2]
+        cv2.addWeighted(self._zone_fill, cfg.OVERLAY_ALPHA, roi, 1 - cfg.OVERLAY_ALPHA, 0, dst=roi)
+
+    def _draw_icon(self, frame_drawn, color):
+        """Icon đã tính sẵn theo màu, trộn số nguyên"""
+        icon_overlay = self.get_icon_overlay(color, frame_drawn.shape)
+        if icon_overlay is not None:
+            icon_overlay.blend(frame_drawn)
+
+    def _draw_ellipse(self, frame_drawn, color):
+        """Ellipse quanh zone: chỉ trộn trong vùng bao quanh ellipse"""
+        y1, y2, x1, x2 = self._ellipse_roi
+        roi = frame_drawn[y1:y2, x1:x2]
+        center = (cfg.ZONE_X + cfg.ZONE_WIDTH // 2 - x1, cfg.ZONE_Y + cfg.ZONE_HEIGHT // 2 - y1)
+        axes = (cfg.ZONE_WIDTH // 2 - cfg.ELLIPSE_OFFSET, cfg.ZONE_HEIGHT // 2 - cfg.ELLIPSE_OFFSET)
+
+        if cfg.ELLIPSE_ALPHA >= 1:
+            cv2.ellipse(roi, center, axes, 0, 0, 360, cfg.COLOR_WHITE, cfg.THICKNESS_ELLIPSE)
+            return
+
+        overlay_ellipse = roi.copy()
+        cv2.ellipse(overlay_ellipse, center, axes, 0, 0, 360, cfg.COLOR_WHITE, cfg.THICKNESS_ELLIPSE)
+        cv2.addWeighted(overlay_ellipse, cfg.ELLIPSE_ALPHA, roi, 1 - cfg.ELLIPSE_ALPHA, 0, dst=roi)
+
     # ... (Giữ nguyên các hàm is_face_in_zone và check_quality_rules cũ) ...
     def is_face_in_zone(self, bbox):
         real_x = int(bbox.xmin * cfg.FRAME_WIDTH)
@@ -229,30 +469,96 @@ class FaceProcessor:
     #                 (ellipse_axes_x, ellipse_axes_y), 0, 0, 360, color, cfg.THICKNESS_ELLIPSE)
     #
     #     return frame_drawn, cropped_image, status, message
-    def process_and_draw(self, frame):
+    def process_and_draw(self, frame, state=None):
         """
         Xử lý frame và vẽ UI overlay
+        state: Đối tượng giữ bộ đếm consecutive_success_frames (mặc định dùng chính processor)
         Returns: (frame_drawn, cropped_image, status, message)
         """
+        if state is None:
+            state = self
+
+        frame_drawn, analysis = self.analyze_and_draw(frame)
+        if analysis is None:
+            return frame_drawn, None, "error", "Lỗi xử lý" if frame is not None else "Lỗi đọc frame"
+
+        cropped_image, status, message = self.update_capture_state(state, analysis, frame)
+        return frame_drawn, cropped_image, status, message
+
+    def update_capture_state(self, state, analysis, frame):
+        """
+        Cập nhật bộ đếm frame ổn định của 1 phiên chụp từ kết quả phân tích
+        Trong cửa sổ REQUIRED_FRAMES frame, giữ vài ảnh crop có điểm chất lượng cao nhất
+        (độ nét, độ sáng, độ tin cậy, độ căn giữa) và trả về ảnh tốt nhất thay vì frame cuối cùng
+
+        Args:
+            state: Đối tượng có thuộc tính consecutive_success_frames (vd: CaptureSession)
+            analysis: (is_valid, status, message, color, target_face) từ analyze_and_draw
+            frame: Frame gốc (dùng để cắt ảnh vùng an toàn)
+        Returns: (cropped_image, status, message)
+        """
+        is_valid, status, message, _, target_face = analysis
+        cropped_image = None
+
+        candidates = getattr(state, "capture_candidates", None)
+        if candidates is None:
+            candidates = CaptureCandidateBuffer()
+            state.capture_candidates = candidates
+
+        if not is_valid:
+            state.consecutive_success_frames = 0
+            candidates.clear()
+            return None, status, message
+
+        y1 = max(0, cfg.ZONE_Y)
+        y2 = cfg.ZONE_Y + cfg.ZONE_HEIGHT
+        x1 = max(0, cfg.ZONE_X)
+        x2 = cfg.ZONE_X + cfg.ZONE_WIDTH
+        zone = frame[y1:y2, x1:x2]
+
+        # Copy (khi được giữ lại) vì frame gốc được dùng chung với encoder / các phiên khác
+        score, parts = score_candidate(zone, target_face)
+        if cfg.MIRROR_MODE == "render":
+            candidates.offer(score, lambda: cv2.flip(zone, 1), parts)
+        else:
+            candidates.offer(score, zone.copy, parts)
+
+        state.consecutive_success_frames += 1
+        if state.consecutive_success_frames >= cfg.REQUIRED_FRAMES:
+            message = "Đã chụp xong!"
+            status = "capturing"
+            best_score, cropped_image, best_parts = candidates.best()
+            logger.info(f"🏆 Chọn ảnh tốt nhất: điểm {best_score:.3f} "
+                        f"({', '.join(f'{k}={v:.2f}' for k, v in best_parts.items())})")
+            state.consecutive_success_frames = 0
+            candidates.clear()
+        return cropped_image, status, message
+
+    def analyze_and_draw(self, frame, detections=None):
+        """
+        Phát hiện khuôn mặt, kiểm tra điều kiện và vẽ UI overlay (không đụng tới bộ đếm)
+        Kết quả dùng chung được cho nhiều phiên chụp trên cùng 1 camera
+        detections: Kết quả detection có sẵn (vd: từ InferenceService), None để tự chạy MediaPipe
+        Returns: (frame_drawn, (is_valid, status, message, color, target_face)) - analysis là None nếu lỗi
+            target_face: detection của khuôn mặt duy nhất trong vùng an toàn (None nếu không có)
+        """
         if frame is None:
             logger.warning("⚠️ Frame là None trong process_and_draw")
-            return None, None, "error", "Lỗi đọc frame"
+            return None, None
 
         try:
-            frame_drawn = frame.copy()
-            cropped_image = None
-
-            # Chuyển đổi BGR -> RGB cho MediaPipe
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.face_detection.process(rgb_frame)
+            if detections is None:
+                detections = detect_faces(self.face_detection, frame)
 
+            is_valid = False
+            target_face = None
             message = "Vui lòng di chuyển vào khung hình"
             status = "waiting"
             color = cfg.COLOR_RED
 
-            if results.detections:
+            if detections:
                 faces_inside_zone = []
-                for detection in results.detections:
+                for detection in detections:
                     bbox = detection.location_data.relative_bounding_box
                     if self.is_face_in_zone(bbox):
                         faces_inside_zone.append(detection)
@@ -260,13 +566,11 @@ class FaceProcessor:
                 if len(faces_inside_zone) == 0:
                     message = "Vui lòng di chuyển vào khung hình"
                     status = "waiting"
-                    self.consecutive_success_frames = 0
                     color = cfg.COLOR_RED
 
                 elif len(faces_inside_zone) > 1:
                     message = "Vui lòng thực hiện lần lượt"
                     status = "error"
-                    self.consecutive_success_frames = 0
                     color = cfg.COLOR_RED
 
                 else:
@@ -275,98 +579,15 @@ class FaceProcessor:
                     is_valid, msg = self.check_quality_rules(bbox)
                     message = msg
                     status = "adjusting" if not is_valid else "ready"
-
-                    if is_valid:
-                        color = cfg.COLOR_GREEN
-                        self.consecutive_success_frames += 1
-                        if self.consecutive_success_frames >= cfg.REQUIRED_FRAMES:
-                            message = "Đã chụp xong!"
-                            status = "capturing"
-                            y1 = max(0, cfg.ZONE_Y)
-                            y2 = cfg.ZONE_Y + cfg.ZONE_HEIGHT
-                            x1 = max(0, cfg.ZONE_X)
-                            x2 = cfg.ZONE_X + cfg.ZONE_WIDTH
-                            cropped_image = frame[y1:y2, x1:x2]
-                            self.consecutive_success_frames = 0
-                    else:
-                        color = cfg.COLOR_YELLOW
-                        self.consecutive_success_frames = 0
-            else:
-                status = "waiting"
-                color = cfg.COLOR_RED
-                self.consecutive_success_frames = 0
+                    color = cfg.COLOR_GREEN if is_valid else cfg.COLOR_YELLOW
 
             # --- VẼ GIAO DIỆN ---
+            frame_drawn = self.render(frame, color)
 
-            # 1. Nền mờ (Giữ nguyên)
-            try:
-                overlay_bg = frame_drawn.copy()
-                cv2.rectangle(overlay_bg, (cfg.ZONE_X, cfg.ZONE_Y),
-                              (cfg.ZONE_X + cfg.ZONE_WIDTH, cfg.ZONE_Y + cfg.ZONE_HEIGHT),
-                              cfg.COLOR_WHITE, -1)
-                frame_drawn = cv2.addWeighted(overlay_bg, cfg.OVERLAY_ALPHA, frame_drawn, 1 - cfg.OVERLAY_ALPHA, 0)
-            except Exception as e:
-                logger.error(f"❌ Lỗi khi vẽ nền mờ: {e}")
-
-            # 2. Vẽ Icon (Giữ nguyên)
-            if self.icon_resized is not None:
-                try:
-                    current_icon = self.recolor_icon(self.icon_resized, color)
-                    if current_icon is not None:
-                        zone_center_x = cfg.ZONE_X + cfg.ZONE_WIDTH // 2
-                        zone_center_y = cfg.ZONE_Y + cfg.ZONE_HEIGHT // 2
-                        pos_x = zone_center_x - self.icon_w // 2
-                        pos_y = zone_center_y - self.icon_h // 2
-
-                        y1, y2 = max(0, pos_y), min(frame_drawn.shape[0], pos_y + self.icon_h)
-                        x1, x2 = max(0, pos_x), min(frame_drawn.shape[1], pos_x + self.icon_w)
-
-                        if y1 < y2 and x1 < x2:
-                            icon_crop_y1 = y1 - pos_y
-                            icon_crop_y2 = icon_crop_y1 + (y2 - y1)
-                            icon_crop_x1 = x1 - pos_x
-                            icon_crop_x2 = icon_crop_x1 + (x2 - x1)
-
-                            icon_slice = current_icon[icon_crop_y1:icon_crop_y2, icon_crop_x1:icon_crop_x2]
-                            bg_slice = frame_drawn[y1:y2, x1:x2]
-
-                            if icon_slice.shape[2] == 4:
-                                alpha_mask = icon_slice[:, :, 3] / 255.0
-                                alpha_inv = 1.0 - alpha_mask
-                                for c in range(0, 3):
-                                    bg_slice[:, :, c] = (alpha_mask * icon_slice[:, :, c] +
-                                                         alpha_inv * bg_slice[:, :, c])
-                except Exception as e:
-                    logger.error(f"❌ Lỗi khi vẽ icon: {e}", exc_info=True)
-
-            # 3. Vẽ Ellipse (LOGIC VẪN CÒN NHƯNG ẨN ĐI)
-            try:
-                overlay_ellipse = frame_drawn.copy()
-
-                ellipse_center_x = cfg.ZONE_X + cfg.ZONE_WIDTH // 2
-                ellipse_center_y = cfg.ZONE_Y + cfg.ZONE_HEIGHT // 2
-                ellipse_axes_x = cfg.ZONE_WIDTH // 2 - cfg.ELLIPSE_OFFSET
-                ellipse_axes_y = cfg.ZONE_HEIGHT // 2 - cfg.ELLIPSE_OFFSET
-
-                # Vẫn thực hiện lệnh vẽ vào lớp overlay
-                cv2.ellipse(overlay_ellipse,
-                            (ellipse_center_x, ellipse_center_y),
-                            (ellipse_axes_x, ellipse_axes_y),
-                            0, 0, 360,
-                            (255, 255, 255),
-                            cfg.THICKNESS_ELLIPSE)
-
-                # Đặt alpha = 0 để nó hoàn toàn trong suốt (tàng hình)
-                alpha_ellipse = 0
-
-                # Hàm trộn ảnh sẽ lấy: 0% lớp Ellipse + 100% Lớp ảnh gốc => Kết quả là không thấy Ellipse
-                frame_drawn = cv2.addWeighted(overlay_ellipse, alpha_ellipse, frame_drawn, 1 - alpha_ellipse, 0)
-            except Exception as e:
-                logger.error(f"❌ Lỗi khi vẽ ellipse: {e}")
-
-            return frame_drawn, cropped_image, status, message
+            return frame_drawn, (is_valid, status, message, color, target_face)
             
         except Exception as e:
             logger.error(f"❌ Lỗi nghiêm trọng trong process_and_draw: {e}", exc_info=True)
             # Trả về frame gốc nếu có lỗi
-            return frame, None, "error", "Lỗi xử lý"
\ No newline at end of file
+            return frame, None
+
@@ -0,0 +1,232 @@
+# face_tracker.py
+import time
+import logging
+import cv2
+import numpy as np
+import config as cfg
+import metrics
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class _RelativeBox:
+    __slots__ = ("xmin", "ymin", "width", "height")
+
+    def __init__(self, xmin, ymin, width, height):
+        self.xmin = xmin
+        self.ymin = ymin
+        self.width = width
+        self.height = height
+
+
+class _LocationData:
+    __slots__ = ("relative_bounding_box", "relative_keypoints")
+
+    def __init__(self, bbox):
+        self.relative_bounding_box = bbox
+        self.relative_keypoints = []
+
+
+class TrackedDetection:
+    """Detection suy ra từ tracker, cùng cấu trúc với detection của MediaPipe (location_data, score)"""
+
+    def __init__(self, box_px, frame_width, frame_height, score):
+        x, y, w, h = box_px
+        self.location_data = _LocationData(_RelativeBox(
+            x / frame_width, y / frame_height, w / frame_width, h / frame_height))
+        self.score = [score]
+
+
+def detection_to_box(detection, frame_width, frame_height):
+    """Relative bounding box của detection -> (x, y, w, h) pixel"""
+    bbox = detection.location_data.relative_bounding_box
+    return (bbox.xmin * frame_width, bbox.ymin * frame_height,
+            bbox.width * frame_width, bbox.height * frame_height)
+
+
+class OpticalFlowTracker:
+    """Theo dõi bbox khuôn mặt giữa 2 lần detection bằng optical flow Lucas-Kanade"""
+
+    def __init__(self, max_points=40, min_points=8):
+        self.max_points = max_points
+        self.min_points = min_points
+        self._prev_gray = None
+        self._points = None
+        self.box = None
+        self.motion = 0.0  # Độ dịch chuyển trung vị (pixel/frame) ở lần update gần nhất
+
+    def init(self, gray, box):
+        """Khởi tạo tracker với bbox (x, y, w, h) trên ảnh xám"""
+        x, y, w, h = [int(round(v)) for v in box]
+        height, width = gray.shape[:2]
+        x1, y1 = max(0, x), max(0, y)
+        x2, y2 = min(width, x + w), min(height, y + h)
+        self.reset()
+        if x2 - x1 < 8 or y2 - y1 < 8:
+            return False
+
+        mask = np.zeros_like(gray)
+        mask[y1:y2, x1:x2] = 255
+        points = cv2.goodFeaturesToTrack(gray, maxCorners=self.max_points, qualityLevel=0.01,
+                                         minDistance=5, mask=mask)
+        if points is None or len(points) < self.min_points:
+            return False
+
+        self._prev_gray = gray
+        self._points = points
+        self.box = (float(x), float(y), float(w), float(h))
+        return True
+
+    def update(self, gray):
+        """
+        Cập nhật bbox theo frame mới
+        Returns: bbox (x, y, w, h) hoặc None nếu mất dấu
+        """
+        if self._points is None:
+            return None
+
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(
+            self._prev_gray, gray, self._points, None, winSize=(15, 15), maxLevel=2)
+        if new_points is None:
+            self.reset()
+            return None
+
+        good = status.reshape(-1) == 1
+        if int(good.sum()) < self.min_points:
+            self.reset()
+            return None
+
+        old = self._points.reshape(-1, 2)[good]
+        new = new_points.reshape(-1, 2)[good]
+        shift = np.median(new - old, axis=0)
+        self.motion = float(np.hypot(shift[0], shift[1]))
+
+        x, y, w, h = self.box
+        self.box = (x + float(shift[0]), y + float(shift[1]), w, h)
+        self._prev_gray = gray
+        self._points = new.reshape(-1, 1, 2)
+        return self.box
+
+    def reset(self):
+        self._prev_gray = None
+        self._points = None
+        self.box = None
+        self.motion = 0.0
+
+
+class AdaptiveDetectionScheduler:
+    """
+    Chạy detector mỗi N frame, giữa các lần đó dùng tracker để suy ra bbox.
+    N tự điều chỉnh: mặt di chuyển nhiều -> detect dày hơn, detector chậm -> detect thưa hơn.
+    Mỗi scheduler chỉ dùng cho 1 camera (1 detection worker).
+    """
+
+    def __init__(self, min_interval=None, max_interval=None, motion_threshold=None, camera_id=None):
+        self.min_interval = max(1, min_interval if min_interval is not None else cfg.DETECTION_INTERVAL_MIN)
+        self.max_interval = max(self.min_interval,
+                                max_interval if max_interval is not None else cfg.DETECTION_INTERVAL_MAX)
+        self.motion_threshold = motion_threshold if motion_threshold is not None else cfg.TRACKER_MOTION_THRESHOLD
+
+        self.tracker = OpticalFlowTracker()
+        self.interval = self.min_interval
+        self._frames_since_detect = 0
+        self._last_score = 0.0
+        self._detector_latency = 0.0
+        self._last_frame_time = 0.0
+        self._frame_interval = 1.0 / 30
+
+        self.detections_run = 0
+        self.frames_tracked = 0
+
+        # Metric theo camera: tỉ lệ detect / track + chu kỳ hiện tại (để chỉnh DETECTION_INTERVAL_*)
+        label = camera_id if camera_id is not None else "default"
+        self._detect_counter = metrics.DETECTION_FRAMES_TOTAL.labels(label, "detect")
+        self._track_counter = metrics.DETECTION_FRAMES_TOTAL.labels(label, "track")
+        self._interval_gauge = metrics.DETECTION_INTERVAL_FRAMES.labels(label)
+        self._interval_gauge.set(self.interval)
+
+    def reset(self):
+        self.tracker.reset()
+        self.interval = self.min_interval
+        self._frames_since_detect = 0
+        self._interval_gauge.set(self.interval)
+
+    def step(self, frame, detect_fn, force_detect=False):
+        """
+        Lấy danh sách detection cho frame hiện tại
+
+        Args:
+            frame: Frame BGR
+            detect_fn: Hàm detection thật (frame -> list detection)
+            force_detect: Bắt buộc chạy detector ở frame này (vd: frame sắp được chụp)
+        Returns: Danh sách detection (MediaPipe hoặc TrackedDetection)
+        """
+        now = time.time()
+        if self._last_frame_time:
+            self._frame_interval += 0.1 * ((now - self._last_frame_time) - self._frame_interval)
+        self._last_frame_time = now
+
+        frame_height, frame_width = frame.shape[:2]
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        need_detect = (force_detect or self.tracker.box is None
+                       or self._frames_since_detect >= self.interval)
+
+        if not need_detect:
+            box = self.tracker.update(gray)
+            if box is not None and self.tracker.motion <= self.motion_threshold * 2:
+                self._frames_since_detect += 1
+                self.frames_tracked += 1
+                self._track_counter.inc()
+                if self.tracker.motion > self.motion_threshold:
+                    # Đang di chuyển -> rút ngắn chu kỳ detect
+                    self.interval = self._interval_floor()
+                    self._interval_gauge.set(self.interval)
+                return [TrackedDetection(box, frame_width, frame_height, self._last_score)]
+            # Mất dấu hoặc chuyển động quá nhanh -> detect lại ngay
+
+        # Độ dịch chuyển đo được trước khi tracker bị khởi tạo lại
+        motion = self.tracker.motion
+        started = time.perf_counter()
+        detections = detect_fn(frame)
+        self._detector_latency += 0.2 * ((time.perf_counter() - started) - self._detector_latency)
+        self.detections_run += 1
+        self._detect_counter.inc()
+        self._frames_since_detect = 0
+
+        # Chỉ track khi có đúng 1 khuôn mặt, nhiều mặt thì detect mỗi frame
+        if len(detections) == 1:
+            detection = detections[0]
+            self._last_score = float(detection.score[0]) if len(detection.score) else 0.0
+            self.tracker.init(gray, detection_to_box(detection, frame_width, frame_height))
+        else:
+            self.tracker.reset()
+            self.interval = self.min_interval
+
+        self._adapt_interval(motion)
+        self._interval_gauge.set(self.interval)
+        return detections
+
+    def _interval_floor(self):
+        # Detector chậm hơn khoảng cách giữa 2 frame => không thể detect mỗi frame
+        latency_frames = int(self._detector_latency / max(self._frame_interval, 1e-3))
+        return min(self.max_interval, max(self.min_interval, latency_frames))
+
+    def _adapt_interval(self, motion):
+        """Sau mỗi lần detect: mặt đứng yên thì giãn chu kỳ, di chuyển thì thu hẹp"""
+        floor = self._interval_floor()
+        if motion > self.motion_threshold:
+            self.interval = floor
+        elif self.tracker.box is not None:
+            self.interval = min(self.max_interval, self.interval + 1)
+        self.interval = max(floor, self.interval)
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "detections_run": self.detections_run,
+            "frames_tracked": self.frames_tracked,
+            "motion": round(self.tracker.motion, 2),
+            "detector_latency_ms": round(self._detector_latency * 1000.0, 2)
+        }
@@ -0,0 +1,211 @@
+# frame_pusher.py
+import threading
+import time
+import logging
+import config as cfg
+from pipeline import MJPEG_PART_HEADER, MJPEG_PART_FOOTER
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class VideoSubscriber:
+    """1 client Socket.IO nhận video dạng binary, có cửa sổ flow control theo ack"""
+
+    def __init__(self, sid, window, tier_name=None):
+        self.sid = sid
+        self.window = max(1, window)
+        self.tier_name = tier_name
+        self.in_flight = set()  # seq đã gửi, chưa được ack
+        self.last_ack_time = time.time()
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+    def can_send(self, now, ack_timeout):
+        if len(self.in_flight) < self.window:
+            return True
+        # Mất ack (vd: client reload) => không để client bị treo mãi
+        if now - self.last_ack_time > ack_timeout:
+            self.in_flight.clear()
+            self.last_ack_time = now
+            return True
+        return False
+
+    def ack(self, seq):
+        self.last_ack_time = time.time()
+        # Ack theo kiểu tích luỹ: mọi frame <= seq coi như đã nhận
+        self.in_flight = {s for s in self.in_flight if s > seq}
+
+    def stats(self):
+        return {
+            "sid": self.sid,
+            "in_flight": len(self.in_flight),
+            "window": self.window,
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped
+        }
+
+
+class FramePusher:
+    """
+    1 thread cho mỗi camera: lấy packet mới nhất từ pipeline và emit sự kiện 'video_frame'
+    (header + JPEG binary) tới mọi subscriber còn chỗ trong cửa sổ ack.
+    Subscriber chậm chỉ bị bỏ qua frame, không chặn subscriber khác.
+    """
+
+    def __init__(self, camera_id, pipeline_manager, emit_fn, window=None, ack_timeout=None, max_fps=None):
+        self.camera_id = camera_id
+        self.pipeline_manager = pipeline_manager
+        self.emit_fn = emit_fn
+        self.window = window if window is not None else cfg.VIDEO_WS_WINDOW
+        self.ack_timeout = ack_timeout if ack_timeout is not None else cfg.VIDEO_WS_ACK_TIMEOUT
+        self.max_fps = max_fps if max_fps is not None else cfg.VIDEO_WS_MAX_FPS
+
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._thread = None
+        self._stop_event = None
+
+    def add(self, sid, window=None, tier_name=None):
+        with self._lock:
+            self._subscribers[sid] = VideoSubscriber(sid, window or self.window, tier_name)
+            if self._thread is None:
+                self._stop_event = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(self._stop_event,),
+                                                name=f"pusher-{self.camera_id}", daemon=True)
+                self._thread.start()
+
+    def remove(self, sid):
+        with self._lock:
+            removed = self._subscribers.pop(sid, None) is not None
+            if not self._subscribers and self._thread is not None:
+                self._stop_event.set()
+                self._thread = None
+                self._stop_event = None
+            return removed
+
+    def ack(self, sid, seq):
+        with self._lock:
+            subscriber = self._subscribers.get(sid)
+            if subscriber is not None:
+                subscriber.ack(seq)
+
+    def has(self, sid):
+        with self._lock:
+            return sid in self._subscribers
+
+    def _run(self, stop_event):
+        pipeline = self.pipeline_manager.subscribe(self.camera_id)
+        frame_interval = 1.0 / self.max_fps if self.max_fps > 0 else 0.0
+        logger.info(f"▶️ Video push camera '{self.camera_id}' đã khởi động")
+        try:
+            last_seq = 0
+            while not stop_event.is_set():
+                packet = pipeline.wait_for_output(last_seq, timeout=0.5)
+                if packet is None:
+                    continue
+                last_seq = packet.seq
+                started = time.time()
+                self._push(pipeline, packet, started)
+
+                elapsed = time.time() - started
+                if elapsed < frame_interval:
+                    stop_event.wait(frame_interval - elapsed)
+        except Exception as e:
+            logger.error(f"❌ Lỗi trong video push camera '{self.camera_id}': {e}", exc_info=True)
+        finally:
+            pipeline.release()
+            logger.info(f"⏹️ Video push camera '{self.camera_id}' đã dừng")
+
+    def _push(self, pipeline, packet, now):
+        header = {
+            "camera_id": self.camera_id,
+            "seq": packet.seq,
+            "captured_at": packet.captured_at,
+            "status": packet.status,
+            "message": packet.message,
+            "bbox": packet.bbox
+        }
+        tiers = {tier.name: tier for tier in pipeline.tiers}
+
+        with self._lock:
+            targets = []
+            for subscriber in self._subscribers.values():
+                if subscriber.can_send(now, self.ack_timeout):
+                    subscriber.in_flight.add(packet.seq)
+                    subscriber.frames_sent += 1
+                    targets.append(subscriber)
+                else:
+                    subscriber.frames_skipped += 1
+
+        jpegs = {}
+        for subscriber in targets:
+            tier = tiers.get(subscriber.tier_name, pipeline.tiers[0])
+            jpeg = jpegs.get(tier.name)
+            if jpeg is None:
+                jpeg = packet.jpeg if tier is pipeline.tiers[0] else self._jpeg_for_tier(pipeline, packet, tier)
+                jpegs[tier.name] = jpeg
+            if jpeg is not None:
+                # Socket.IO gửi bytes dưới dạng binary attachment (không base64)
+                self.emit_fn('video_frame', dict(header, jpeg=jpeg), subscriber.sid)
+
+    @staticmethod
+    def _jpeg_for_tier(pipeline, packet, tier):
+        chunk = pipeline.get_chunk(packet, tier)
+        if chunk is None:
+            return None
+        return chunk[len(MJPEG_PART_HEADER):len(chunk) - len(MJPEG_PART_FOOTER)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "camera_id": self.camera_id,
+                "running": self._thread is not None,
+                "subscribers": [subscriber.stats() for subscriber in self._subscribers.values()]
+            }
+
+
+class FramePushManager:
+    """Quản lý FramePusher theo camera_id, mỗi sid chỉ xem 1 camera qua kênh binary tại 1 thời điểm"""
+
+    def __init__(self, pipeline_manager, emit_fn):
+        self.pipeline_manager = pipeline_manager
+        self.emit_fn = emit_fn
+        self._pushers = {}
+        self._camera_by_sid = {}
+        self._lock = threading.Lock()
+
+    def _get(self, camera_id):
+        pusher = self._pushers.get(camera_id)
+        if pusher is None:
+            pusher = FramePusher(camera_id, self.pipeline_manager, self.emit_fn)
+            self._pushers[camera_id] = pusher
+        return pusher
+
+    def subscribe(self, sid, camera_id, window=None, tier_name=None):
+        self.unsubscribe(sid)
+        with self._lock:
+            pusher = self._get(camera_id)
+            self._camera_by_sid[sid] = camera_id
+        pusher.add(sid, window, tier_name)
+        logger.info(f"📺 Video binary: sid={sid}, camera={camera_id}")
+
+    def unsubscribe(self, sid):
+        with self._lock:
+            camera_id = self._camera_by_sid.pop(sid, None)
+            pusher = self._pushers.get(camera_id) if camera_id is not None else None
+        if pusher is not None:
+            return pusher.remove(sid)
+        return False
+
+    def ack(self, sid, seq):
+        with self._lock:
+            camera_id = self._camera_by_sid.get(sid)
+            pusher = self._pushers.get(camera_id) if camera_id is not None else None
+        if pusher is not None:
+            pusher.ack(sid, seq)
+
+    def stats(self):
+        with self._lock:
+            pushers = list(self._pushers.values())
+        return [pusher.stats() for pusher in pushers]
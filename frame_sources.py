@@ -0,0 +1,266 @@
+# frame_sources.py
+import os
+import time
+import logging
+import cv2
+import numpy as np
+from config import FRAME_WIDTH, FRAME_HEIGHT, SOURCE_DEFAULT_FPS, SOURCE_IMAGE_EXTENSIONS
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Loại nguồn frame (chọn theo từng camera, xem config.CAMERAS)
+SOURCE_RTSP = "rtsp"      # Camera IP (decoder theo config.CAMERA_BACKEND)
+SOURCE_FILE = "file"      # File video đã ghi (mp4, avi, ...)
+SOURCE_IMAGES = "images"  # Thư mục ảnh (sắp xếp theo tên)
+SOURCE_V4L2 = "v4l2"      # Webcam / capture card trên Linux (/dev/videoN)
+SOURCE_TYPES = (SOURCE_RTSP, SOURCE_FILE, SOURCE_IMAGES, SOURCE_V4L2)
+
+# Interface chung của các reader (giống rtsp.Client):
+#   isOpened() -> bool
+#   read()     -> frame BGR FRAME_WIDTH x FRAME_HEIGHT hoặc None nếu chưa có frame mới (không chặn lâu)
+#                 Mỗi frame là 1 mảng riêng (không dùng lại buffer) => pipeline giữ bao lâu cũng được, không cần copy
+#   close()
+
+
+class FramePacer:
+    """
+    Phát frame theo nhịp thời gian thật (hoặc nhanh hơn theo `speed`) cho nguồn offline.
+    speed <= 0: không giới hạn tốc độ (nhanh nhất có thể)
+    """
+
+    def __init__(self, fps, speed=1.0):
+        self.interval = 1.0 / (fps * speed) if fps > 0 and speed > 0 else 0.0
+        self._next_at = 0.0
+
+    def ready(self):
+        """True nếu đã tới lượt frame tiếp theo (và chuyển sang lượt kế)"""
+        if self.interval <= 0:
+            return True
+        now = time.time()
+        if now < self._next_at:
+            return False
+        if now - self._next_at > 1.0:
+            # Lần đầu hoặc bị trễ quá 1 giây (vd: máy bận): bắt nhịp lại, không phát dồn
+            self._next_at = now + self.interval
+        else:
+            self._next_at += self.interval
+        return True
+
+
+def fit_frame(image, mirror, scratch=None, owned=False):
+    """
+    Resize (+ lật gương) frame BGR vào 1 mảng mới FRAME_WIDTH x FRAME_HEIGHT
+    (1 lần cấp phát, ghi thẳng kết quả vào đó, không copy thêm)
+
+    Args:
+        scratch: Buffer trung gian dùng lại khi vừa resize vừa lật gương
+        owned: image là mảng mới của riêng reader (vd: cv2.imread) => dùng luôn nếu đã đúng kích thước
+    """
+    if image.shape[:2] == (FRAME_HEIGHT, FRAME_WIDTH):
+        if owned:
+            if mirror:
+                cv2.flip(image, 1, dst=image)
+            return image
+        return cv2.flip(image, 1) if mirror else image.copy()
+    if mirror:
+        scaled = scratch if scratch is not None else np.empty((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+        cv2.resize(image, (FRAME_WIDTH, FRAME_HEIGHT), dst=scaled)
+        return cv2.flip(scaled, 1)
+    return cv2.resize(image, (FRAME_WIDTH, FRAME_HEIGHT))
+
+
+class OpenCVReader:
+    """
+    Đọc RTSP bằng cv2.VideoCapture (FFmpeg): decode thẳng ra BGR,
+    resize (+ lật gương) ghi thẳng vào frame mới, buffer decode được dùng lại.
+    """
+
+    api_preference = cv2.CAP_FFMPEG
+
+    def __init__(self, rtsp_url, mirror):
+        self.mirror = mirror
+        self._decoded = None
+        self._scaled = np.empty((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8) if mirror else None
+        self.capture = cv2.VideoCapture(rtsp_url, self.api_preference)
+        # Chỉ giữ frame mới nhất trong buffer của decoder
+        self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self):
+        ok, decoded = self.capture.read(self._decoded)
+        if not ok or decoded is None:
+            return None
+        self._decoded = decoded
+        return fit_frame(decoded, self.mirror, self._scaled)
+
+    def close(self):
+        self.capture.release()
+
+
+class V4L2Reader(OpenCVReader):
+    """Webcam / capture card qua Video4Linux2, device là số (0) hoặc đường dẫn (/dev/video0)"""
+
+    api_preference = cv2.CAP_V4L2
+
+    def __init__(self, device, mirror):
+        if isinstance(device, str) and device.isdigit():
+            device = int(device)
+        super().__init__(device, mirror)
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+
+
+class PyAVReader:
+    """
+    Đọc RTSP bằng PyAV (cần `pip install av`): FFmpeg scale + chuyển màu sang BGR
+    ở kích thước FRAME_WIDTH x FRAME_HEIGHT trong 1 bước (sws_scale).
+    sws_scale luôn ghi vào 1 frame FFmpeg mới cấp phát cho mỗi lần đọc,
+    to_ndarray() chỉ là view lên frame đó => trả thẳng mảng này (1 lần cấp phát/frame, không copy thêm).
+    """
+
+    def __init__(self, rtsp_url, mirror):
+        import av  # Thư viện tuỳ chọn, chỉ cần khi CAMERA_BACKEND = "pyav"
+
+        self.mirror = mirror
+        self.container = av.open(rtsp_url, options={
+            "rtsp_transport": "tcp",
+            "fflags": "nobuffer",
+            "flags": "low_delay"
+        }, timeout=5.0)
+        stream = self.container.streams.video[0]
+        stream.thread_type = "AUTO"
+        self._frames = self.container.decode(stream)
+        self._opened = True
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        try:
+            frame = next(self._frames)
+        except StopIteration:
+            self._opened = False
+            return None
+
+        image = frame.to_ndarray(width=FRAME_WIDTH, height=FRAME_HEIGHT, format="bgr24")
+        if self.mirror:
+            cv2.flip(image, 1, dst=image)
+        return image
+
+    def close(self):
+        self._opened = False
+        self.container.close()
+
+
+class VideoFileReader:
+    """
+    Phát lại file video như 1 camera: theo nhịp FPS của file (x speed), tự lặp lại khi hết.
+    speed = 4.0 để phát lại sự cố đã ghi nhanh gấp 4 lần, speed = 0 để đọc nhanh nhất có thể.
+    """
+
+    def __init__(self, path, mirror, loop=True, speed=1.0, fps=None):
+        self.path = path
+        self.mirror = mirror
+        self.loop = loop
+        self._decoded = None
+        self._scaled = np.empty((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8) if mirror else None
+        self.capture = cv2.VideoCapture(path)
+        self.fps = fps or self.capture.get(cv2.CAP_PROP_FPS) or SOURCE_DEFAULT_FPS
+        self.pacer = FramePacer(self.fps, speed)
+        self.frames_read = 0
+        self.loops = 0
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self):
+        if not self.pacer.ready():
+            return None
+        ok, decoded = self.capture.read(self._decoded)
+        if not ok or decoded is None:
+            if not self.loop:
+                # Hết file: đóng lại, supervisor sẽ coi như mất kết nối
+                self.capture.release()
+                return None
+            self.loops += 1
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, decoded = self.capture.read(self._decoded)
+            if not ok or decoded is None:
+                return None
+        self._decoded = decoded
+        self.frames_read += 1
+        return fit_frame(decoded, self.mirror, self._scaled)
+
+    def close(self):
+        self.capture.release()
+
+
+class ImageDirectoryReader:
+    """Phát lần lượt các ảnh trong thư mục (theo tên file) như 1 camera với `fps` khung hình/giây"""
+
+    def __init__(self, path, mirror, loop=True, speed=1.0, fps=None):
+        self.path = path
+        self.mirror = mirror
+        self.loop = loop
+        self._scaled = np.empty((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8) if mirror else None
+        self.files = []
+        if os.path.isdir(path):
+            self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.lower().endswith(SOURCE_IMAGE_EXTENSIONS))
+        self.fps = fps or SOURCE_DEFAULT_FPS
+        self.pacer = FramePacer(self.fps, speed)
+        self._index = 0
+        self._opened = bool(self.files)
+        if not self.files:
+            logger.warning(f"⚠️ Thư mục ảnh rỗng hoặc không tồn tại: {path}")
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        if not self._opened or not self.pacer.ready():
+            return None
+        if self._index >= len(self.files):
+            if not self.loop:
+                self._opened = False
+                return None
+            self._index = 0
+
+        path = self.files[self._index]
+        self._index += 1
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            logger.warning(f"⚠️ Không đọc được ảnh: {path}")
+            return None
+        return fit_frame(image, self.mirror, self._scaled, owned=True)
+
+    def close(self):
+        self._opened = False
+
+
+def create_reader(source, uri, mirror, backend="opencv", options=None):
+    """
+    Tạo reader cho 1 nguồn frame
+
+    Args:
+        source: Loại nguồn (SOURCE_RTSP, SOURCE_FILE, SOURCE_IMAGES, SOURCE_V4L2)
+        uri: URL RTSP, đường dẫn file/thư mục, hoặc device V4L2
+        mirror: Lật gương khi đọc
+        backend: Decoder cho RTSP ("opencv" hoặc "pyav")
+        options: Tuỳ chọn cho nguồn offline: loop, speed, fps
+    """
+    options = options or {}
+    if source == SOURCE_FILE:
+        return VideoFileReader(uri, mirror, **options)
+    if source == SOURCE_IMAGES:
+        return ImageDirectoryReader(uri, mirror, **options)
+    if source == SOURCE_V4L2:
+        return V4L2Reader(uri, mirror)
+    if source == SOURCE_RTSP:
+        if backend == "pyav":
+            return PyAVReader(uri, mirror)
+        return OpenCVReader(uri, mirror)
+    raise ValueError(f"Loại nguồn frame không hợp lệ: {source}")
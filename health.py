@@ -0,0 +1,142 @@
+# health.py
+import time
+import logging
+import config as cfg
+from camera_hub import STATE_CONNECTED
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """
+    Tính liveness (/health) và readiness (/ready) từ trạng thái pipeline đang có sẵn:
+    thời điểm frame cuối của từng camera, FPS luồng đọc, trạng thái detector, backlog.
+    Không mở kết nối RTSP, không chạy detection => trả lời gần như tức thì.
+    """
+
+    def __init__(self, camera_hub, pipeline_manager, get_inference_service, get_face_processor,
+                 stale_after=None, min_reader_fps=None, max_inference_backlog=None, warmup=None):
+        """
+        Args:
+            camera_hub: CameraHub dùng chung
+            pipeline_manager: PipelineManager dùng chung
+            get_inference_service: Hàm trả về InferenceService (hoặc None nếu chưa khởi tạo)
+            get_face_processor: Hàm trả về FaceProcessor (hoặc None nếu chưa khởi tạo)
+            stale_after: Số giây không có frame mới thì camera bị coi là stale
+            min_reader_fps: FPS tối thiểu của luồng đọc đang chạy
+            max_inference_backlog: Backlog detection tối đa
+            warmup: WarmupManager (None = không có warm-up nền)
+        """
+        self.camera_hub = camera_hub
+        self.pipeline_manager = pipeline_manager
+        self.get_inference_service = get_inference_service
+        self.get_face_processor = get_face_processor
+        self.stale_after = stale_after if stale_after is not None else cfg.HEALTH_FRAME_STALE_SECONDS
+        self.min_reader_fps = min_reader_fps if min_reader_fps is not None else cfg.HEALTH_MIN_READER_FPS
+        self.max_inference_backlog = (max_inference_backlog if max_inference_backlog is not None
+                                      else cfg.HEALTH_MAX_INFERENCE_BACKLOG)
+        self.warmup = warmup
+        self.started_at = time.time()
+
+    def _camera_report(self, now):
+        """Trạng thái từng camera + lý do chưa sẵn sàng (chỉ xét camera đang có viewer)"""
+        cameras = {}
+        problems = []
+        for camera_id, stats in self.camera_hub.camera_states().items():
+            running = stats.get("running", False)
+            last_frame_time = stats.get("last_frame_time") or 0
+            age = round(now - last_frame_time, 2) if last_frame_time else None
+            report = {
+                "state": stats.get("state"),
+                "running": running,
+                "subscribers": stats.get("subscribers", 0),
+                "last_frame_age": age,
+                "fps": stats.get("fps", 0.0),
+                "reconnect_attempts": stats.get("reconnect_attempts", 0)
+            }
+
+            # Camera không có viewer thì không kết nối => không tính là lỗi
+            if running:
+                if stats.get("state") != STATE_CONNECTED:
+                    problems.append(f"camera {camera_id}: {stats.get('state')}")
+                elif age is None or age > self.stale_after:
+                    problems.append(f"camera {camera_id}: stale ({age}s)")
+                elif self.min_reader_fps and report["fps"] < self.min_reader_fps:
+                    problems.append(f"camera {camera_id}: fps {report['fps']}")
+            cameras[camera_id] = report
+        return cameras, problems
+
+    def _detector_report(self):
+        problems = []
+        if self.warmup is not None and not self.warmup.is_ready:
+            # Đang nạp MediaPipe / detector trên thread nền: báo tiến độ thay vì not_initialized
+            warmup = self.warmup.stats()
+            if warmup["state"] == "failed":
+                problems.append(f"warmup: failed ({warmup['error']})")
+            else:
+                problems.append(f"warmup: {warmup['step'] or warmup['state']} ({int(warmup['progress'] * 100)}%)")
+            return {"status": "warming_up"}, problems
+
+        processor = self.get_face_processor()
+        service = self.get_inference_service()
+        if processor is None:
+            problems.append("face_processor: not_initialized")
+        if service is None:
+            problems.append("inference: not_initialized")
+            return {"status": "not_initialized"}, problems
+
+        stats = service.stats()
+        if stats["alive_workers"] == 0:
+            problems.append("inference: no alive workers")
+        if stats["backlog"] > self.max_inference_backlog:
+            problems.append(f"inference: backlog {stats['backlog']}")
+        report = dict(stats, status="ready" if not problems else "degraded")
+        return report, problems
+
+    def _queue_report(self):
+        """Backlog của các stage trong pipeline"""
+        queues = {}
+        for stats in self.pipeline_manager.stats():
+            queues[stats["camera_id"]] = {
+                "subscribers": stats["subscribers"],
+                "encode_queue": stats["encode_queue"]["depth"],
+                "reader_dropped": stats["reader"].get("dropped", 0),
+                "detect_avg_ms": stats["detect"]["avg_ms"]
+            }
+        return queues
+
+    def liveness(self):
+        """Process còn sống và trả lời được request (không phụ thuộc camera)"""
+        now = time.time()
+        cameras, _ = self._camera_report(now)
+        return {
+            "status": "ok",
+            "uptime": round(now - self.started_at, 1),
+            "cameras": cameras
+        }
+
+    def readiness(self):
+        """
+        Server sẵn sàng nhận traffic hay chưa
+
+        Returns:
+            (ready, report)
+        """
+        now = time.time()
+        cameras, problems = self._camera_report(now)
+        detector, detector_problems = self._detector_report()
+        problems.extend(detector_problems)
+        return not problems, {
+            "status": "ready" if not problems else "not_ready",
+            "problems": problems,
+            "cameras": cameras,
+            "detector": detector,
+            "pipelines": self._queue_report(),
+            "warmup": self.warmup.stats() if self.warmup is not None else None,
+            "thresholds": {
+                "stale_after": self.stale_after,
+                "min_reader_fps": self.min_reader_fps,
+                "max_inference_backlog": self.max_inference_backlog
+            }
+        }
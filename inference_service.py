@@ -0,0 +1,169 @@
+# inference_service.py
+import threading
+import queue
+import time
+import logging
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import numpy as np
+import config as cfg
+import metrics
+from face_logic import create_face_detector, detect_faces
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class InferenceTimeout(Exception):
+    """Request detection quá hạn (deadline) trước khi được xử lý"""
+
+
+class InferenceRequest:
+    __slots__ = ("frame", "deadline", "future", "submitted_at")
+
+    def __init__(self, frame, deadline):
+        self.frame = frame
+        self.deadline = deadline
+        self.future = Future()
+        self.submitted_at = time.time()
+
+
+class InferenceService:
+    """
+    Service detection dùng chung cho mọi camera.
+    Gom frame đang chờ từ tất cả stream vào 1 queue, mỗi worker thread có 1 MediaPipe
+    FaceDetection riêng và mỗi lượt chỉ lấy 1 request (worker rảnh nhận ngay request kế tiếp),
+    request đã huỷ / quá hạn bị bỏ trước khi tốn CPU. MediaPipe nhả GIL khi chạy graph C++
+    nên các worker chạy song song được trên nhiều core.
+    """
+
+    def __init__(self, num_workers=None, detector_factory=create_face_detector):
+        """
+        Args:
+            num_workers: Số worker (mỗi worker 1 FaceDetection)
+            detector_factory: Hàm tạo detector (chạy trên worker thread)
+        """
+        self.num_workers = max(1, num_workers if num_workers is not None else cfg.INFERENCE_WORKERS)
+        self.detector_factory = detector_factory
+
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self.processed = 0
+        self.expired = 0
+        self.failed = 0
+        # Số worker đã tạo detector + chạy xong 1 lần detect giả / số worker khởi tạo lỗi
+        self._ready_cond = threading.Condition()
+        self.ready_workers = 0
+        self.failed_workers = 0
+
+        for index in range(self.num_workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"inference-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"✅ InferenceService sẵn sàng với {self.num_workers} worker")
+
+    def submit(self, frame, timeout=None):
+        """
+        Gửi frame BGR để detection (bất đồng bộ)
+
+        Args:
+            frame: Frame BGR (không được sửa cho tới khi có kết quả)
+            timeout: Deadline (giây) tính từ lúc submit, quá hạn sẽ bị bỏ qua
+        Returns:
+            Future -> danh sách detection, hoặc InferenceTimeout nếu quá hạn
+        """
+        if timeout is None:
+            timeout = cfg.INFERENCE_DEADLINE_MS / 1000.0
+        request = InferenceRequest(frame, time.time() + timeout)
+        self._queue.put(request)
+        return request.future
+
+    def detect(self, frame, timeout=None):
+        """
+        Detection đồng bộ với deadline
+
+        Raises:
+            InferenceTimeout nếu không có kết quả trước deadline
+        """
+        if timeout is None:
+            timeout = cfg.INFERENCE_DEADLINE_MS / 1000.0
+        future = self.submit(frame, timeout)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise InferenceTimeout("Detection quá hạn")
+
+    def wait_ready(self, timeout=None):
+        """
+        Chờ mọi worker tạo detector và chạy xong lần detect đầu tiên (lần chậm nhất: nạp graph, cấp phát)
+
+        Returns: (số worker sẵn sàng, số worker khởi tạo lỗi), dừng chờ khi mọi worker đã xong hoặc hết timeout
+        """
+        with self._ready_cond:
+            self._ready_cond.wait_for(lambda: self.ready_workers + self.failed_workers >= self.num_workers,
+                                      timeout)
+            return self.ready_workers, self.failed_workers
+
+    def _worker_loop(self):
+        try:
+            detector = self.detector_factory()
+            # Detect giả ngay trên worker này: frame thật đầu tiên không phải chịu lần chạy graph chậm
+            detect_faces(detector, np.zeros((cfg.FRAME_HEIGHT, cfg.FRAME_WIDTH, 3), dtype=np.uint8))
+        except Exception as e:
+            logger.error(f"❌ Không khởi tạo được detector cho {threading.current_thread().name}: {e}",
+                         exc_info=True)
+            with self._ready_cond:
+                self.failed_workers += 1
+                self._ready_cond.notify_all()
+            return
+        with self._ready_cond:
+            self.ready_workers += 1
+            self._ready_cond.notify_all()
+
+        while not self._stop_event.is_set():
+            try:
+                request = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            # Client đã huỷ hoặc request quá hạn => bỏ qua, không tốn CPU
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            if time.time() > request.deadline:
+                request.future.set_exception(InferenceTimeout("Detection quá hạn"))
+                with self._stats_lock:
+                    self.expired += 1
+                continue
+
+            try:
+                with metrics.INFERENCE_SECONDS.time():
+                    detections = detect_faces(detector, request.frame)
+                request.future.set_result(detections)
+                with self._stats_lock:
+                    self.processed += 1
+            except Exception as e:
+                request.future.set_exception(e)
+                with self._stats_lock:
+                    self.failed += 1
+
+        try:
+            detector.close()
+        except Exception:
+            pass
+
+    def shutdown(self):
+        self._stop_event.set()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "workers": self.num_workers,
+                "alive_workers": sum(1 for t in self._threads if t.is_alive()),
+                "ready_workers": self.ready_workers,
+                "backlog": self._queue.qsize(),
+                "processed": self.processed,
+                "expired": self.expired,
+                "failed": self.failed
+            }
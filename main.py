@@ -1,15 +1,35 @@
-import base64
+import os
 import time
+
+# Mốc bắt đầu import (đo thời gian cold start)
+_IMPORT_STARTED = time.perf_counter()
+
+import importlib
 import threading
 import cv2
+import numpy as np
 import logging
-from flask import Flask, Response
+from flask import Flask, Response, request, send_from_directory
 from flask_socketio import SocketIO
 from flask_cors import CORS
 
 # --- IMPORT MODULE CÁ NHÂN ---
-from camera_service import CameraStream
+from camera_hub import CameraHub
+from camera_registry import CameraRegistry
+from pipeline import PipelineManager, AdaptiveStreamController
 from face_logic import FaceProcessor
+from inference_service import InferenceService, InferenceTimeout
+from capture_session import CaptureSessionRegistry
+from face_tracker import AdaptiveDetectionScheduler
+from health import HealthMonitor
+from frame_pusher import FramePushManager
+from status_publisher import StatusPublisher
+from async_support import LoopBridge
+from warmup import WarmupManager, warmup_inference
+from capture_encoding import encode_capture, encode_to_budget, to_data_url, build_capture_payload
+from capture_store import CaptureStore
+from face_index import FaceIdentifier
+import metrics
 import config as cfg
 
 # --- SETUP LOGGING ---
@@ -34,15 +54,17 @@ CORS(app, resources={r"/*": {
 socketio = SocketIO(
     app,
     cors_allowed_origins=cfg.FRONTEND_ORIGINS,
-    async_mode='threading',
+    async_mode=cfg.SOCKETIO_ASYNC_MODE,
     allow_upgrades=True,
     ping_timeout=cfg.SOCKET_PING_TIMEOUT,
     ping_interval=cfg.SOCKET_PING_INTERVAL
 )
 
-# --- SINGLETON FACE PROCESSOR ---
-# Tạo 1 instance duy nhất để tái sử dụng, tránh load model nhiều lần
+# --- SINGLETON FACE PROCESSOR & INFERENCE SERVICE ---
+# FaceProcessor chỉ kiểm tra điều kiện + vẽ UI, detection chạy trên InferenceService
+# dùng chung cho tất cả camera (mỗi worker 1 MediaPipe riêng)
 _face_processor = None
+_inference_service = None
 _processor_lock = threading.Lock()
 
 def get_face_processor():
@@ -52,66 +74,174 @@ def get_face_processor():
         with _processor_lock:
             if _face_processor is None:
                 logger.info("🔄 Khởi tạo FaceProcessor (lần đầu)...")
-                _face_processor = FaceProcessor()
+                _face_processor = FaceProcessor(with_detector=False)
                 logger.info("✅ FaceProcessor đã sẵn sàng")
     return _face_processor
 
-# --- TRẠNG THÁI TOÀN CỤC VỚI THREAD SAFETY ---
-app_state = {
-    "is_capturing": False
-}
-app_state_lock = threading.Lock()  # Lock để đảm bảo thread safety
+def get_inference_service():
+    """Lấy singleton instance của InferenceService"""
+    global _inference_service
+    if _inference_service is None:
+        with _processor_lock:
+            if _inference_service is None:
+                logger.info("🔄 Khởi tạo InferenceService (lần đầu)...")
+                _inference_service = InferenceService()
+    return _inference_service
+
+# --- WARM-UP NỀN ---
+# Server bind port và stream video ngay, MediaPipe / icon / detector được nạp trên thread nền.
+# Trong lúc warm-up, frame được stream nguyên bản (không phân tích), tiến độ xem ở /ready
+warmup = WarmupManager([
+    ("import_mediapipe", lambda: importlib.import_module("mediapipe")),
+    ("face_processor", get_face_processor),
+    ("inference_service", get_inference_service),
+    ("inference_warmup", lambda: warmup_inference(get_inference_service())),
+])
+
+# --- CAMERA REGISTRY & HUB ---
+# Danh sách camera (config.CAMERAS + config.CAMERAS_FILE)
+camera_registry = CameraRegistry()
+# 1 luồng đọc RTSP cho mỗi camera, mọi viewer /video_feed dùng chung frame
+camera_hub = CameraHub(camera_registry)
+
+# --- PHIÊN CHỤP THEO TỪNG CLIENT (Socket.IO sid) ---
+# Mỗi kiosk có bộ đếm riêng, detection chỉ chạy cho camera có phiên đang hoạt động
+capture_sessions = CaptureSessionRegistry()
+
+# --- NHỊP DETECTION THEO CAMERA ---
+# Mỗi camera 1 scheduler (chỉ dùng trên detection worker của camera đó)
+_detection_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def get_detection_scheduler(camera_id):
+    """Lấy AdaptiveDetectionScheduler của camera (None nếu DETECTION_CADENCE = 'every_frame')"""
+    if cfg.DETECTION_CADENCE != "adaptive":
+        return None
+    with _schedulers_lock:
+        scheduler = _detection_schedulers.get(camera_id)
+        if scheduler is None:
+            scheduler = AdaptiveDetectionScheduler(camera_id=camera_id)
+            _detection_schedulers[camera_id] = scheduler
+        return scheduler
+
+def detection_scheduler_stats():
+    """Số frame detect / track và chu kỳ detect hiện tại của từng camera"""
+    with _schedulers_lock:
+        schedulers = dict(_detection_schedulers)
+    return {camera_id: scheduler.stats() for camera_id, scheduler in schedulers.items()}
+
+
+# Pipeline chạy trên thread thật, server có thể chạy trên event loop (serve.py) => emit/chờ frame qua bridge
+loop_bridge = LoopBridge(socketio)
+
+
+def emit_to_session(event, data, sid):
+    """Emit sự kiện chỉ tới room của 1 client (gọi được từ mọi thread)"""
+    try:
+        loop_bridge.emit(event, data, sid)
+        metrics.SOCKETIO_EMITS_TOTAL.labels(event).inc()
+    except Exception as e:
+        logger.error(f"Lỗi khi emit {event}: {e}")
+
 
-def set_capturing(value):
-    """Thread-safe setter cho is_capturing"""
-    with app_state_lock:
-        app_state["is_capturing"] = value
+# Ảnh chụp được ghi xuống IMAGE_FOLDER trên thread nền, client nhận URL ngắn
+capture_store = CaptureStore() if cfg.CAPTURE_STORE_ENABLED else None
+
+
+# Nhận diện 1:N sau khi chụp (tuỳ chọn), chạy trên thread nền, kết quả qua sự kiện 'face_match'
+face_identifier = FaceIdentifier() if cfg.FACE_INDEX_ENABLED else None
+
+
+# face_status chỉ gửi khi trạng thái đổi (giới hạn tần suất), tiến độ gửi với tần suất thấp
+status_publisher = StatusPublisher(emit_to_session)
 
-def get_capturing():
-    """Thread-safe getter cho is_capturing"""
-    with app_state_lock:
-        return app_state["is_capturing"]
 
 # --- CÁC SỰ KIỆN SOCKET ---
 
+def get_camera_id(data):
+    """Lấy camera_id từ payload socket (mặc định: camera 'default')"""
+    if isinstance(data, dict) and data.get('camera_id'):
+        return str(data['camera_id'])
+    return cfg.DEFAULT_CAMERA_ID
+
+
 @socketio.on('start_capture')
-def handle_start_capture():
-    """Client bấm nút 'Bắt đầu'"""
-    logger.info("📢 Socket: BẮT ĐẦU CHỤP!")
-    set_capturing(True)
-    
-    # Reset counter khi bắt đầu capture
-    processor = get_face_processor()
-    with _processor_lock:
-        processor.consecutive_success_frames = 0
+def handle_start_capture(data=None):
+    """Client bấm nút 'Bắt đầu' - payload: {'camera_id': '...'} (tuỳ chọn)"""
+    camera_id = get_camera_id(data)
+    logger.info(f"📢 Socket: BẮT ĐẦU CHỤP! (sid={request.sid}, camera={camera_id})")
+
+    if camera_id not in camera_registry:
+        emit_to_session('face_status', {
+            'status': 'error',
+            'message': 'Camera không tồn tại',
+            'camera_id': camera_id
+        }, request.sid)
+        return
+
+    # Phiên mới luôn bắt đầu với bộ đếm = 0
+    status_publisher.reset(request.sid)
+    # Host mà client dùng để kết nối: URL ảnh chụp phải mở được từ chính máy client
+    capture_sessions.start(request.sid, camera_id, base_url=request.host_url)
 
 
 @socketio.on('stop_capture')
-def handle_stop_capture():
+def handle_stop_capture(data=None):
     """Client bấm nút 'Hủy' hoặc đóng modal"""
-    logger.info("📢 Socket: HỦY CHỤP!")
-    set_capturing(False)
-    
-    # Reset counter khi stop capture
-    processor = get_face_processor()
-    with _processor_lock:
-        processor.consecutive_success_frames = 0
+    logger.info(f"📢 Socket: HỦY CHỤP! (sid={request.sid})")
+    session = capture_sessions.stop(request.sid)
+    camera_id = session.camera_id if session is not None else get_camera_id(data)
     
     # Gửi thông báo về trạng thái idle
-    try:
-        socketio.emit('face_status', {
-            'status': 'idle',
-            'message': 'Đã hủy chụp'
-        })
-    except Exception as e:
-        logger.error(f"Lỗi khi emit face_status: {e}")
+    status_publisher.publish(request.sid, camera_id, 'idle', 'Đã hủy chụp', force=True)
+
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    """Client ngắt kết nối -> huỷ phiên chụp và kênh video binary (nếu có)"""
+    if capture_sessions.stop(request.sid) is not None:
+        logger.info(f"🔌 Client {request.sid} ngắt kết nối, đã huỷ phiên chụp")
+    status_publisher.reset(request.sid)
+    frame_push.unsubscribe(request.sid)
+
+
+@socketio.on('subscribe_video')
+def handle_subscribe_video(data=None):
+    """
+    Nhận video qua Socket.IO thay cho /video_feed
+    payload: {'camera_id': '...', 'window': 2, 'tier': 'full' | 'medium' | 'low'} (tuỳ chọn)
+    Server emit 'video_frame' {camera_id, seq, captured_at, status, message, bbox, jpeg (binary)},
+    client phải emit 'video_ack' {'seq': ...} sau khi hiển thị xong
+    """
+    camera_id = get_camera_id(data)
+    if camera_id not in camera_registry:
+        emit_to_session('face_status', {
+            'status': 'error',
+            'message': 'Camera không tồn tại',
+            'camera_id': camera_id
+        }, request.sid)
+        return
+    data = data if isinstance(data, dict) else {}
+    frame_push.subscribe(request.sid, camera_id, window=data.get('window'), tier_name=data.get('tier'))
+
+
+@socketio.on('unsubscribe_video')
+def handle_unsubscribe_video(data=None):
+    frame_push.unsubscribe(request.sid)
+
+
+@socketio.on('video_ack')
+def handle_video_ack(data=None):
+    """Client đã nhận xong frame `seq` (ack tích luỹ)"""
+    if isinstance(data, dict) and data.get('seq') is not None:
+        frame_push.ack(request.sid, int(data['seq']))
 
 
 # --- HÀM XỬ LÝ VIDEO STREAM ---
 
 def compress_image_for_base64(image, max_size_kb=200, quality=85):
     """
-    Nén ảnh để giảm kích thước Base64
+    Nén ảnh để giảm kích thước Base64 (giữ lại cho tương thích, xem capture_encoding)
     
     Args:
         image: OpenCV image (numpy array)
@@ -122,30 +252,12 @@ def compress_image_for_base64(image, max_size_kb=200, quality=85):
         Base64 string hoặc None nếu lỗi
     """
     try:
-        # Thử với quality ban đầu
-        encode_params = [cv2.IMWRITE_JPEG_QUALITY, quality]
-        retval, buffer = cv2.imencode('.jpg', image, encode_params)
-        
-        if not retval:
+        encoded = encode_to_budget(image, int(max_size_kb * 1024), fmt="jpeg", quality=quality)
+        if encoded is None:
             logger.error("Lỗi khi encode ảnh")
             return None
-        
-        # Kiểm tra kích thước
-        size_kb = len(buffer) / 1024
-        
-        # Nếu quá lớn, giảm quality
-        if size_kb > max_size_kb:
-            quality = int(quality * (max_size_kb / size_kb))
-            quality = max(30, quality)  # Không giảm quá thấp
-            encode_params = [cv2.IMWRITE_JPEG_QUALITY, quality]
-            retval, buffer = cv2.imencode('.jpg', image, encode_params)
-            if not retval:
-                return None
-        
-        # Encode Base64
-        jpg_as_text = base64.b64encode(buffer).decode('utf-8')
-        base64_string = f"data:image/jpeg;base64,{jpg_as_text}"
-        
+
+        base64_string = to_data_url(encoded)
         logger.info(f"📦 Ảnh đã nén: {len(base64_string) / 1024:.2f} KB")
         return base64_string
         
@@ -154,120 +266,237 @@ def compress_image_for_base64(image, max_size_kb=200, quality=85):
         return None
 
 
-def generate_frames():
+def get_primary_bbox(detections, mirrored=False):
+    """
+    Bbox tương đối [xmin, ymin, width, height] của khuôn mặt lớn nhất (None nếu không có)
+    mirrored: Frame gửi cho client đã được lật gương sau detection (MIRROR_MODE = "render")
+    """
+    best = None
+    for detection in detections or []:
+        bbox = detection.location_data.relative_bounding_box
+        if best is None or bbox.width * bbox.height > best.width * best.height:
+            best = bbox
+    if best is None:
+        return None
+    xmin = 1.0 - best.xmin - best.width if mirrored else best.xmin
+    return [round(xmin, 4), round(best.ymin, 4), round(best.width, 4), round(best.height, 4)]
+
+
+def process_frame(packet):
+    """
+    Stage detection: chạy trên detection worker của pipeline (không chạy trên request thread)
+    Trả về frame để encoder stream về trình duyệt
+    """
+    frame = packet.frame
+
+    # --- LOGIC XỬ LÝ ---
+    sessions = capture_sessions.sessions_for_camera(packet.camera_id)
+    scheduler = get_detection_scheduler(packet.camera_id)
+    if not sessions:
+        # === TRẠNG THÁI: IDLE (CHỜ) ===
+        # Không gọi MediaPipe để frame sạch, tiết kiệm CPU
+        if scheduler is not None:
+            scheduler.reset()
+        return frame
+
+    if not warmup.is_ready:
+        # === TRẠNG THÁI: ĐANG KHỞI ĐỘNG ===
+        # Detector chưa sẵn sàng: stream frame nguyên bản, không chặn worker chờ MediaPipe
+        status, message = (('error', 'Không khởi tạo được bộ nhận diện khuôn mặt') if warmup.failed
+                           else ('warming_up', 'Hệ thống đang khởi động, vui lòng chờ...'))
+        for session in sessions:
+            status_publisher.publish(session.sid, session.camera_id, status, message)
+        return frame
+
+    # === TRẠNG THÁI: ĐANG QUÉT ===
+    processor = get_face_processor()  # Sử dụng singleton
+    try:
+        # Detection trên inference service dùng chung, quá deadline thì bỏ frame này
+        try:
+            if scheduler is None:
+                detections = get_inference_service().detect(frame)
+            else:
+                # Frame sắp đủ REQUIRED_FRAMES luôn được detect thật, không dùng bbox từ tracker
+                force_detect = any(s.consecutive_success_frames >= cfg.REQUIRED_FRAMES - 1 for s in sessions)
+                detections = scheduler.step(frame, get_inference_service().detect, force_detect)
+        except InferenceTimeout:
+            return frame
+
+        # Kiểm tra điều kiện, vẽ khung (1 lần cho mọi phiên trên cùng camera)
+        with metrics.OVERLAY_SECONDS.labels(packet.camera_id).time():
+            frame_drawn, analysis = processor.analyze_and_draw(frame, detections)
+        if analysis is None:
+            return frame_drawn
+
+        _, packet.status, packet.message, _, _ = analysis
+        # Detection chạy trên frame chưa lật, JPEG gửi đi đã lật => lật bbox theo
+        packet.bbox = get_primary_bbox(detections, mirrored=packet.needs_mirror)
+        packet.needs_mirror = False  # frame_drawn đã được lật gương khi vẽ (nếu cần)
+
+        for session in sessions:
+            face_image, status, message = processor.update_capture_state(session, analysis, frame)
+
+            # Gửi status về đúng Client, chỉ khi đổi trạng thái (tiến độ gửi với tần suất thấp)
+            # Kể cả client nhận video binary: header 'video_frame' chỉ có status chung của camera,
+            # tiến độ là riêng từng phiên
+            progress = 1.0 if face_image is not None else session.consecutive_success_frames / cfg.REQUIRED_FRAMES
+            status_publisher.publish(session.sid, session.camera_id, status, message,
+                                     progress=progress, force=face_image is not None)
+
+            # KHI CHỤP ĐƯỢC ẢNH
+            if face_image is not None:
+                handle_capture(session, face_image)
+
+        return frame_drawn
+
+    except Exception as e:
+        logger.error(f"Lỗi trong quá trình xử lý face: {e}", exc_info=True)
+        # Tiếp tục stream ngay cả khi có lỗi
+        return frame
+
+
+def handle_capture(session, face_image):
+    """Gửi ảnh đã chụp về client của phiên và đóng phiên chụp"""
+    logger.info(f"-> ✅ Đã chụp được khuôn mặt hợp lệ! (sid={session.sid})")
+
+    # Reset trạng thái về Idle ngay lập tức (chỉ phiên này)
+    if not capture_sessions.finish(session):
+        # Client đã huỷ/bắt đầu lại trong lúc xử lý
+        return
+    metrics.CAPTURES_TOTAL.labels(session.camera_id).inc()
+
+    # Nén và encode ảnh (đạt ngân sách CAPTURE_MAX_SIZE_KB với số lần encode giới hạn)
+    try:
+        encoded = encode_capture(face_image)
+    except Exception as e:
+        logger.error(f"Lỗi khi nén ảnh: {e}", exc_info=True)
+        encoded = None
+    
+    if encoded is not None:
+        filename = None
+        if capture_store is not None and cfg.CAPTURE_TRANSPORT == "url":
+            # Ghi file trên thread nền, capture_success (URL) chỉ gửi khi file đã ghi xong
+            # Ghi lỗi => gửi base64, queue đầy => gửi base64 ngay
+            def on_saved(name, ok):
+                if ok:
+                    send_capture(session, encoded, capture_store.url_for(name, session.base_url), name)
+                else:
+                    send_capture(session, encoded)
+
+            filename = capture_store.save(encoded, on_saved)
+        if filename is None:
+            send_capture(session, encoded)
+
+        if face_identifier is not None:
+            request_identify(session, face_image, filename)
+    else:
+        publish_capture_idle(session)
+
+
+def publish_capture_idle(session):
+    """Gửi thông báo về trạng thái chờ (luôn sau capture_success)"""
+    status_publisher.publish(session.sid, session.camera_id, 'idle', 'Vui lòng thử lại...', force=True)
+    logger.info("-> 🛑 Đã tự động đóng chế độ chụp.")
+
+
+def send_capture(session, encoded, url=None, filename=None):
+    """Gửi ảnh về Client (URL, data URL hoặc binary attachment theo CAPTURE_TRANSPORT)"""
+    payload = build_capture_payload(encoded, url=url)
+    payload['camera_id'] = session.camera_id
+    if filename:
+        payload['filename'] = filename
+    emit_to_session('capture_success', payload, session.sid)
+    logger.info(f"-> 📡 Đã gửi ảnh {encoded.format} ({len(encoded) / 1024:.1f} KB, "
+                f"q={encoded.quality}, {encoded.passes} lần encode) về Client")
+    publish_capture_idle(session)
+
+
+def request_identify(session, face_image, filename=None):
+    """Tìm người đã đăng ký giống ảnh vừa chụp, gửi 'face_match' khi có kết quả (không chờ)"""
+    def on_done(future):
+        payload = {'camera_id': session.camera_id, 'filename': filename}
+        try:
+            payload['matches'] = future.result()
+        except Exception as e:
+            payload['matches'] = []
+            payload['error'] = str(e)
+        emit_to_session('face_match', payload, session.sid)
+
+    face_identifier.identify(face_image).add_done_callback(on_done)
+
+
+# --- PIPELINE: reader -> detection worker -> encoder ---
+pipeline_manager = PipelineManager(camera_hub, process_frame, jpeg_quality=cfg.STREAM_JPEG_QUALITY)
+
+# --- VIDEO BINARY QUA SOCKET.IO: 1 thread đẩy frame cho mỗi camera (không phải mỗi viewer) ---
+frame_push = FramePushManager(pipeline_manager, emit_to_session)
+
+# --- HEALTH CHECK: chỉ đọc trạng thái sẵn có, không mở RTSP / không tạo detector ---
+health_monitor = HealthMonitor(camera_hub, pipeline_manager,
+                               get_inference_service=lambda: _inference_service,
+                               get_face_processor=lambda: _face_processor,
+                               warmup=warmup)
+
+
+def generate_frames(camera_id=cfg.DEFAULT_CAMERA_ID):
     """
     Generator function để stream video frames
-    Tự động quản lý camera và resource cleanup
+    Chỉ lấy JPEG đã encode sẵn từ pipeline, không xử lý trên request thread
+    FPS / độ phân giải / chất lượng JPEG tự điều chỉnh theo tốc độ nhận của client này
     """
-    camera = None
-    processor = None
+    pipeline = None
+    controller = AdaptiveStreamController()
+    clients = metrics.VIDEO_FEED_CLIENTS.labels(camera_id)
+    clients.inc()
     
     try:
-        # Khởi tạo camera
-        camera = CameraStream()
-        processor = get_face_processor()  # Sử dụng singleton
+        # Đăng ký viewer với pipeline (dùng chung 1 kết nối RTSP, 1 detection worker)
+        pipeline = pipeline_manager.subscribe(camera_id)
+        pipeline.add_viewer(controller)
 
-        # Kiểm tra kết nối camera
-        if not camera.is_opened():
+        # Chờ frame đầu tiên từ pipeline
+        packet = loop_bridge.wait_for_output(pipeline, 0, timeout=cfg.CAMERA_FIRST_FRAME_TIMEOUT)
+        if packet is None:
             error_msg = b'--frame\r\nContent-Type: text/plain\r\n\r\nError Connect Camera\r\n'
             yield error_msg
             return
+        warmup.record("time_to_first_frame", time.perf_counter() - _IMPORT_STARTED)
 
         logger.info("=> Server Ready. Waiting for 'start_capture' event...")
         
-        # Frame rate control
-        target_fps = 30  # Giới hạn 30 FPS
-        frame_interval = 1.0 / target_fps
+        # Frame rate control (theo mức chất lượng hiện tại của client)
         last_frame_time = 0
 
         while True:
+            # --- STREAM HÌNH ẢNH VỀ TRÌNH DUYỆT ---
+            # Chunk đã encode 1 lần cho mỗi mức, mọi viewer cùng mức dùng chung cùng 1 bytes
+            tier = controller.tier
+            if tier is pipeline.tiers[0]:
+                chunk = packet.chunk
+            else:
+                # Encode mức thấp (nếu chưa có trong cache) trên thread thật, không chặn event loop
+                chunk = loop_bridge.run_cpu(pipeline.get_chunk, packet, tier)
+            if chunk is not None:
+                # yield bị chặn khi socket của client đầy => đo được tốc độ nhận của client
+                send_started = time.perf_counter()
+                yield chunk
+                controller.record_send(len(chunk), time.perf_counter() - send_started)
+
             current_time = time.time()
             
             # Kiểm tra frame rate
+            frame_interval = controller.tier.frame_interval
             elapsed = current_time - last_frame_time
             if elapsed < frame_interval:
-                time.sleep(frame_interval - elapsed)
+                loop_bridge.sleep(frame_interval - elapsed)
             
             last_frame_time = time.time()
             
-            # Đọc frame từ camera
-            frame = camera.get_frame()
-            if frame is None:
-                time.sleep(0.01)
-                continue
-
-            # --- LOGIC XỬ LÝ ---
-            is_capturing = get_capturing()
-
-            if is_capturing:
-                # === TRẠNG THÁI: ĐANG QUÉT ===
-                try:
-                    # Xử lý AI, vẽ khung
-                    frame, face_image, status, message = processor.process_and_draw(frame)
-
-                    # Gửi status realtime về Client
-                    try:
-                        socketio.emit('face_status', {
-                            'status': status,
-                            'message': message
-                        })
-                    except Exception as e:
-                        logger.error(f"Lỗi khi emit face_status: {e}")
-
-                    # KHI CHỤP ĐƯỢC ẢNH
-                    if face_image is not None:
-                        logger.info("-> ✅ Đã chụp được khuôn mặt hợp lệ!")
-
-                        # Nén và encode ảnh
-                        base64_string = compress_image_for_base64(face_image)
-                        
-                        if base64_string:
-                            # Gửi ảnh về Client
-                            try:
-                                socketio.emit('capture_success', {'url': base64_string})
-                                logger.info(f"-> 📡 Đã gửi ảnh Base64 về Client")
-                            except Exception as e:
-                                logger.error(f"Lỗi khi emit capture_success: {e}")
-
-                        # Reset trạng thái về Idle ngay lập tức
-                        set_capturing(False)
-                        
-                        # Reset bộ đếm AI
-                        with _processor_lock:
-                            processor.consecutive_success_frames = 0
-
-                        # Gửi thông báo về trạng thái chờ
-                        try:
-                            socketio.emit('face_status', {
-                                'status': 'idle',
-                                'message': 'Vui lòng thử lại...'
-                            })
-                        except Exception as e:
-                            logger.error(f"Lỗi khi emit face_status: {e}")
-                        
-                        logger.info("-> 🛑 Đã tự động đóng chế độ chụp.")
-
-                except Exception as e:
-                    logger.error(f"Lỗi trong quá trình xử lý face: {e}", exc_info=True)
-                    # Tiếp tục stream ngay cả khi có lỗi
-
-            else:
-                # === TRẠNG THÁI: IDLE (CHỜ) ===
-                # Reset bộ đếm để lần sau quét lại từ đầu
-                with _processor_lock:
-                    if processor.consecutive_success_frames > 0:
-                        processor.consecutive_success_frames = 0
-
-                # Không gọi process_and_draw để frame sạch, tiết kiệm CPU
-
-            # --- STREAM HÌNH ẢNH VỀ TRÌNH DUYỆT ---
-            try:
-                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                if ret:
-                    frame_bytes = buffer.tobytes()
-                    yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            except Exception as e:
-                logger.error(f"Lỗi khi encode frame: {e}")
+            # Chờ frame mới nhất đã encode (frame cũ bị bỏ qua nếu client chậm)
+            last_seq = packet.seq
+            packet = None
+            while packet is None:
+                packet = loop_bridge.wait_for_output(pipeline, last_seq)
 
     except GeneratorExit:
         # Client đã disconnect
@@ -275,21 +504,115 @@ def generate_frames():
     except Exception as e:
         logger.error(f"Lỗi nghiêm trọng trong generate_frames: {e}", exc_info=True)
     finally:
-        # Cleanup resources
-        if camera is not None:
+        clients.dec()
+        # Huỷ đăng ký viewer, hub sẽ tự ngắt camera khi không còn ai xem
+        if pipeline is not None:
             try:
-                camera.release()
-                logger.info("✅ Đã release camera")
+                pipeline.remove_viewer(controller)
+                pipeline.release()
             except Exception as e:
-                logger.error(f"Lỗi khi release camera: {e}")
+                logger.error(f"Lỗi khi huỷ đăng ký pipeline: {e}")
 
 
 # --- ROUTES HTTP ---
 
 @app.route('/video_feed')
-def video_feed():
-    """Endpoint để stream video"""
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+@app.route('/video_feed/<camera_id>')
+def video_feed(camera_id=cfg.DEFAULT_CAMERA_ID):
+    """Endpoint để stream video của 1 camera"""
+    if camera_id not in camera_registry:
+        return {"status": "error", "message": f"Camera không tồn tại: {camera_id}"}, 404
+    return Response(generate_frames(camera_id), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+@app.route('/cameras')
+def cameras():
+    """Danh sách camera đã cấu hình"""
+    return {"cameras": [camera.to_dict() for camera in camera_registry.list()]}
+
+
+@app.route('/stats')
+def stats():
+    """Thống kê pipeline: độ sâu queue, số frame bị rơi, thời gian xử lý từng stage"""
+    return {
+        "pipelines": pipeline_manager.stats(),
+        "video_push": frame_push.stats(),
+        "face_status": status_publisher.stats(),
+        "warmup": warmup.stats(),
+        "capture_store": capture_store.stats() if capture_store is not None else None,
+        "face_index": face_identifier.stats() if face_identifier is not None else None,
+        "inference": _inference_service.stats() if _inference_service is not None else None,
+        "detection": detection_scheduler_stats()
+    }
+
+
+@app.route(f"{cfg.CAPTURE_URL_PATH}/<filename>")
+def captured_image(filename):
+    """Ảnh đã chụp (tên file là duy nhất, không bị ghi đè => cache lâu dài)"""
+    if capture_store is None or not capture_store.is_valid_name(filename):
+        return {"status": "error", "message": "Không tìm thấy ảnh"}, 404
+
+    # Ảnh chưa ghi xong xuống đĩa: trả thẳng từ bộ nhớ
+    pending = capture_store.get(filename)
+    if pending is not None:
+        response = Response(pending[0], mimetype=pending[1])
+        response.cache_control.public = True
+        response.cache_control.max_age = cfg.CAPTURE_CACHE_MAX_AGE
+    else:
+        response = send_from_directory(capture_store.folder, filename, max_age=cfg.CAPTURE_CACHE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+
+def load_enroll_image():
+    """Ảnh đăng ký: file upload 'image' hoặc 'filename' của ảnh đã chụp (CaptureStore)"""
+    upload = request.files.get('image')
+    if upload is not None:
+        data = upload.read()
+    else:
+        filename = (request.get_json(silent=True) or request.form).get('filename')
+        if not filename or capture_store is None or not capture_store.is_valid_name(filename):
+            return None
+        pending = capture_store.get(filename)
+        if pending is not None:
+            data = pending[0]
+        else:
+            path = os.path.join(capture_store.folder, filename)
+            if not os.path.exists(path):
+                return None
+            with open(path, "rb") as handle:
+                data = handle.read()
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+@app.route('/faces', methods=['POST'])
+def enroll_face():
+    """
+    Đăng ký khuôn mặt vào index 1:N
+    Body: JSON/form {'label': ..., 'filename': ảnh đã chụp} hoặc multipart {'label', 'image': file}
+    """
+    if face_identifier is None:
+        return {"status": "error", "message": "Nhận diện khuôn mặt chưa được bật"}, 404
+    label = (request.get_json(silent=True) or request.form).get('label')
+    if not label:
+        return {"status": "error", "message": "Thiếu label"}, 400
+    image = load_enroll_image()
+    if image is None:
+        return {"status": "error", "message": "Không đọc được ảnh"}, 400
+
+    try:
+        # Chờ trên thread thật, không chặn event loop khi chạy gevent
+        position = loop_bridge.run_cpu(face_identifier.enroll(image, label).result, cfg.FACE_INDEX_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Lỗi khi đăng ký khuôn mặt: {e}", exc_info=True)
+        return {"status": "error", "message": str(e)}, 500
+    return {"status": "ok", "label": label, "index": position}
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Metric dạng text Prometheus (histogram độ trễ từng stage, counter, gauge)"""
+    return Response(metrics.registry.render(), mimetype=metrics.MetricsRegistry.CONTENT_TYPE)
 
 
 @app.route('/test')
@@ -300,18 +623,9 @@ def test():
 
 @app.route('/health')
 def health():
-    """Health check endpoint với camera status"""
+    """Liveness: process còn trả lời được (luôn 200 nếu server chạy)"""
     try:
-        # Test camera connection
-        test_camera = CameraStream()
-        camera_ok = test_camera.is_opened()
-        test_camera.release()
-        
-        return {
-            "status": "ok",
-            "camera": "connected" if camera_ok else "disconnected",
-            "face_processor": "ready" if _face_processor is not None else "not_initialized"
-        }
+        return health_monitor.liveness()
     except Exception as e:
         logger.error(f"Lỗi trong health check: {e}")
         return {
@@ -320,12 +634,42 @@ def health():
         }, 500
 
 
+@app.route('/ready')
+def ready():
+    """Readiness: camera đang xem có frame mới, detector sẵn sàng, backlog trong ngưỡng (503 nếu chưa)"""
+    try:
+        is_ready, report = health_monitor.readiness()
+        return report, 200 if is_ready else 503
+    except Exception as e:
+        logger.error(f"Lỗi trong readiness check: {e}")
+        return {
+            "status": "error",
+            "message": str(e)
+        }, 500
+
+
+def start_warmup():
+    """Nạp MediaPipe + FaceProcessor + InferenceService (nền hoặc đồng bộ theo WARMUP_IN_BACKGROUND)"""
+    warmup.start()
+    if not cfg.WARMUP_IN_BACKGROUND:
+        logger.info("🔄 Pre-initializing FaceProcessor...")
+        warmup.wait()
+
+
+# Thời gian import module này (không gồm MediaPipe, được nạp lúc warm-up)
+warmup.record("import_main", time.perf_counter() - _IMPORT_STARTED)
+
+
 # --- MAIN ---
 if __name__ == '__main__':
     logger.info(f"🚀 Starting server on http://{cfg.SERVER_HOST}:{cfg.SERVER_PORT}")
     
-    # Pre-initialize FaceProcessor để tránh delay lần đầu
-    logger.info("🔄 Pre-initializing FaceProcessor...")
-    get_face_processor()
+    start_warmup()
+    loop_bridge.start()
+    if capture_store is not None:
+        capture_store.start()
     
-    socketio.run(app, host=cfg.SERVER_HOST, port=cfg.SERVER_PORT, debug=True, allow_unsafe_werkzeug=True)
+    # Chỉ dùng khi dev, production chạy: python serve.py
+    # Không dùng reloader: reloader chạy 2 process và nạp MediaPipe 2 lần
+    socketio.run(app, host=cfg.SERVER_HOST, port=cfg.SERVER_PORT, debug=cfg.SERVER_DEBUG,
+                 use_reloader=False, allow_unsafe_werkzeug=True)
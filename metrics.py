@@ -0,0 +1,257 @@
+# metrics.py
+import abc
+import bisect
+import threading
+import time
+import logging
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+# Bucket mặc định (giây) cho các stage xử lý frame: 1ms -> 1s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0)
+# Bucket kích thước JPEG (bytes): 8KB -> 512KB
+SIZE_BUCKETS = (8192, 16384, 32768, 65536, 98304, 131072, 196608, 262144, 524288)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                    for name, value in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric(abc.ABC):
+    """Metric có nhãn: mỗi tổ hợp nhãn là 1 child riêng, khoá chỉ giữ trong vài phép cộng"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """Tạo child cho 1 tổ hợp nhãn mới (mỗi loại metric tự cung cấp)"""
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts = list(self.counts)
+            total_sum = self.sum
+            total_count = self.count
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(labelnames, key, ("le", _format_value(float(bound))))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_format_value(total_sum)}")
+        lines.append(f"{name}_count{labels} {total_count}")
+        return lines
+
+
+class _Timer:
+    """Context manager đo thời gian rồi observe vào histogram"""
+
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._child.observe(time.perf_counter() - self._started)
+        return False
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class MetricsRegistry:
+    """Tập hợp metric của process, xuất theo định dạng text của Prometheus"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+# --- METRIC DÙNG CHUNG TOÀN PROCESS ---
+registry = MetricsRegistry()
+
+CAMERA_READ_SECONDS = registry.histogram(
+    "camera_read_seconds", "Thời gian đọc + decode 1 frame từ camera", ("camera",))
+CAMERA_FRAMES_TOTAL = registry.counter(
+    "camera_frames_total", "Số frame nhận được từ camera", ("camera",))
+DETECTION_FRAMES_TOTAL = registry.counter(
+    "detection_frames_total", "Số frame lấy bbox bằng detector thật (detect) hoặc tracker (track)",
+    ("camera", "mode"))
+DETECTION_INTERVAL_FRAMES = registry.gauge(
+    "detection_interval_frames", "Chu kỳ detect hiện tại của scheduler (số frame giữa 2 lần detect)", ("camera",))
+INFERENCE_SECONDS = registry.histogram(
+    "inference_seconds", "Thời gian MediaPipe face detection cho 1 frame")
+OVERLAY_SECONDS = registry.histogram(
+    "overlay_draw_seconds", "Thời gian kiểm tra điều kiện + vẽ overlay", ("camera",))
+JPEG_ENCODE_SECONDS = registry.histogram(
+    "jpeg_encode_seconds", "Thời gian encode JPEG cho stream", ("camera",))
+JPEG_BYTES = registry.histogram(
+    "jpeg_bytes", "Kích thước JPEG của stream (bytes)", ("camera",), buckets=SIZE_BUCKETS)
+SOCKETIO_EMITS_TOTAL = registry.counter(
+    "socketio_emits_total", "Số sự kiện Socket.IO đã emit", ("event",))
+VIDEO_FEED_CLIENTS = registry.gauge(
+    "video_feed_clients", "Số client /video_feed đang kết nối", ("camera",))
+CAPTURES_TOTAL = registry.counter(
+    "captures_total", "Số ảnh khuôn mặt đã chụp thành công", ("camera",))
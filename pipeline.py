@@ -0,0 +1,560 @@
+# pipeline.py
+import threading
+import time
+import logging
+from collections import OrderedDict
+import cv2
+import config as cfg
+import metrics
+from camera_hub import is_offline_frame
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+MJPEG_PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+MJPEG_PART_FOOTER = b'\r\n'
+
+
+def build_mjpeg_chunk(jpeg_bytes):
+    """Ghép 1 part multipart/x-mixed-replace từ JPEG bytes"""
+    return b''.join((MJPEG_PART_HEADER, jpeg_bytes, MJPEG_PART_FOOTER))
+
+
+class FramePacket:
+    """Một frame đi qua pipeline kèm metadata"""
+
+    __slots__ = ("camera_id", "seq", "captured_at", "frame", "status", "message", "bbox", "jpeg", "chunk",
+                 "needs_mirror")
+
+    def __init__(self, camera_id, seq, captured_at, frame):
+        self.camera_id = camera_id
+        self.seq = seq
+        self.captured_at = captured_at
+        self.frame = frame
+        self.status = None
+        self.message = None
+        self.bbox = None  # Bbox tương đối [xmin, ymin, width, height] của khuôn mặt chính (nếu có)
+        self.jpeg = None
+        self.chunk = None
+        # MIRROR_MODE = "render": frame chưa lật gương cho tới khi được vẽ hoặc encode
+        self.needs_mirror = cfg.MIRROR_MODE == "render"
+
+
+class LatestFrameBuffer:
+    """
+    Buffer kích thước 1 kiểu "drop-oldest": frame mới ghi đè frame chưa được lấy.
+    Stage phía sau chậm chỉ làm rơi frame, không tích luỹ độ trễ.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._cond = threading.Condition()
+        self._item = None
+        self.put_count = 0
+        self.drop_count = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.drop_count += 1
+            self._item = item
+            self.put_count += 1
+            self._cond.notify()
+
+    def get(self, timeout=1.0):
+        """Lấy item mới nhất (và xoá khỏi buffer), None nếu hết timeout"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._item is None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            item = self._item
+            self._item = None
+            return item
+
+    def clear(self):
+        with self._cond:
+            self._item = None
+
+    @property
+    def depth(self):
+        with self._cond:
+            return 0 if self._item is None else 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                "depth": 0 if self._item is None else 1,
+                "put": self.put_count,
+                "dropped": self.drop_count
+            }
+
+
+class EncodedFrameCache:
+    """
+    Cache multipart chunk đã encode theo key (seq): mỗi frame chỉ encode và ghép 1 lần,
+    mọi viewer nhận cùng 1 object bytes.
+    """
+
+    def __init__(self, max_entries=4):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.wait_failures = 0
+
+    def get_or_build(self, key, build_fn):
+        """
+        Lấy chunk theo key, nếu chưa có thì gọi build_fn() (chỉ 1 lần kể cả khi nhiều thread cùng gọi)
+
+        Returns:
+            bytes hoặc None nếu build lỗi
+        """
+        with self._lock:
+            chunk = self._entries.get(key)
+            if chunk is not None:
+                self.hits += 1
+                return chunk
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = threading.Event()
+                self._pending[key] = pending
+                is_builder = True
+                self.misses += 1
+            else:
+                is_builder = False
+
+        if not is_builder:
+            # Thread khác đang encode frame này -> chờ dùng lại kết quả
+            pending.wait(1.0)
+            with self._lock:
+                chunk = self._entries.get(key)
+                # Chỉ tính hit khi thật sự dùng lại được kết quả (builder lỗi / chờ quá lâu => không tính)
+                if chunk is not None:
+                    self.hits += 1
+                else:
+                    self.wait_failures += 1
+                return chunk
+
+        chunk = None
+        try:
+            chunk = build_fn()
+        finally:
+            with self._lock:
+                if chunk is not None:
+                    self._entries[key] = chunk
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                self._pending.pop(key, None)
+            pending.set()
+        return chunk
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "encodes": self.misses,
+                    "wait_failures": self.wait_failures}
+
+
+class StageTimer:
+    """Đo thời gian xử lý của một stage (trung bình trượt)"""
+
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.count = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+
+    def record(self, seconds):
+        ms = seconds * 1000.0
+        self.count += 1
+        self.last_ms = ms
+        if self.count == 1:
+            self.avg_ms = ms
+        else:
+            self.avg_ms += self.smoothing * (ms - self.avg_ms)
+
+    def stats(self):
+        return {
+            "processed": self.count,
+            "last_ms": round(self.last_ms, 2),
+            "avg_ms": round(self.avg_ms, 2)
+        }
+
+
+class StreamTier:
+    """1 mức chất lượng stream: tỷ lệ kích thước, chất lượng JPEG, FPS tối đa"""
+
+    __slots__ = ("name", "scale", "quality", "fps")
+
+    def __init__(self, name, scale=1.0, quality=85, fps=30):
+        self.name = name
+        self.scale = scale
+        self.quality = quality
+        self.fps = fps
+
+    @property
+    def frame_interval(self):
+        return 1.0 / self.fps if self.fps > 0 else 0.0
+
+
+def load_stream_tiers(tiers=None):
+    """Đọc danh sách mức chất lượng từ config.STREAM_TIERS (mức đầu tiên là cao nhất)"""
+    if tiers is None:
+        tiers = cfg.STREAM_TIERS
+    return [StreamTier(**tier) for tier in tiers]
+
+
+class AdaptiveStreamController:
+    """
+    Điều chỉnh mức chất lượng cho 1 viewer theo tốc độ client nhận dữ liệu (drain rate).
+    Thời gian gửi 1 chunk (yield bị chặn khi socket đầy) được đo liên tục:
+    gửi không kịp nhịp FPS của mức hiện tại -> hạ mức, dư băng thông đủ lâu -> nâng mức.
+    """
+
+    def __init__(self, tiers=None, adapt_interval=None, slow_ratio=None, fast_ratio=None, upgrade_after=None):
+        self.tiers = tiers if tiers is not None else load_stream_tiers()
+        self.adapt_interval = adapt_interval if adapt_interval is not None else cfg.STREAM_ADAPT_INTERVAL
+        self.slow_ratio = slow_ratio if slow_ratio is not None else cfg.STREAM_SLOW_RATIO
+        self.fast_ratio = fast_ratio if fast_ratio is not None else cfg.STREAM_FAST_RATIO
+        self.upgrade_after = upgrade_after if upgrade_after is not None else cfg.STREAM_UPGRADE_AFTER
+
+        self.level = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.downgrades = 0
+        self.upgrades = 0
+        self._send_time = 0.0        # EMA thời gian gửi 1 chunk (giây)
+        self._drain_rate = 0.0       # EMA tốc độ nhận của client (bytes/giây)
+        self._last_change = time.time()
+        self._fast_since = None
+
+    @property
+    def tier(self):
+        return self.tiers[self.level]
+
+    def record_send(self, nbytes, seconds):
+        """Ghi nhận 1 lần gửi chunk và điều chỉnh mức nếu cần"""
+        self.frames_sent += 1
+        self.bytes_sent += nbytes
+        if self.frames_sent == 1:
+            self._send_time = seconds
+        else:
+            self._send_time += 0.3 * (seconds - self._send_time)
+        if seconds > 0:
+            rate = nbytes / seconds
+            self._drain_rate = rate if not self._drain_rate else self._drain_rate + 0.3 * (rate - self._drain_rate)
+
+        now = time.time()
+        if now - self._last_change < self.adapt_interval:
+            return
+
+        tier = self.tier
+        if self._send_time > tier.frame_interval * self.slow_ratio and self.level < len(self.tiers) - 1:
+            self._change_level(self.level + 1, now)
+            self.downgrades += 1
+            return
+
+        if self.level == 0:
+            return
+        higher = self.tiers[self.level - 1]
+        # Ước tính kích thước chunk ở mức cao hơn theo diện tích ảnh và chất lượng JPEG
+        growth = (higher.scale / tier.scale) ** 2 * max(1.0, higher.quality / max(tier.quality, 1))
+        if self._send_time * growth < higher.frame_interval * self.fast_ratio:
+            if self._fast_since is None:
+                self._fast_since = now
+            elif now - self._fast_since >= self.upgrade_after:
+                self._change_level(self.level - 1, now)
+                self.upgrades += 1
+        else:
+            self._fast_since = None
+
+    def _change_level(self, level, now):
+        logger.info(f"📶 Viewer: đổi mức stream {self.tier.name} -> {self.tiers[level].name} "
+                    f"(gửi {self._send_time * 1000:.0f}ms/frame)")
+        self.level = level
+        self._last_change = now
+        self._fast_since = None
+
+    def stats(self):
+        return {
+            "tier": self.tier.name,
+            "frames_sent": self.frames_sent,
+            "bytes_sent": self.bytes_sent,
+            "send_ms": round(self._send_time * 1000.0, 2),
+            "drain_kbps": round(self._drain_rate * 8 / 1000.0, 1),
+            "downgrades": self.downgrades,
+            "upgrades": self.upgrades
+        }
+
+
+class StreamPipeline:
+    """
+    Pipeline cho 1 camera: reader (CameraWorker) -> detection worker -> encoder.
+    Các stage nối với nhau bằng buffer size-1 drop-oldest nên viewer luôn thấy frame mới nhất.
+    Mỗi viewer tự lấy chunk theo mức chất lượng của mình trên thread riêng,
+    client chậm không làm chậm pipeline dùng chung.
+    """
+
+    def __init__(self, camera_hub, camera_id, process_fn, jpeg_quality=85):
+        """
+        Args:
+            camera_hub: CameraHub dùng chung
+            camera_id: ID camera
+            process_fn: Hàm xử lý frame (chạy trên detection worker),
+                nhận FramePacket và trả về frame đã vẽ (hoặc frame gốc)
+            jpeg_quality: Chất lượng JPEG khi stream
+        """
+        self.camera_hub = camera_hub
+        self.camera_id = camera_id
+        self.process_fn = process_fn
+        self.jpeg_quality = jpeg_quality
+
+        self._lock = threading.Lock()
+        self._subscribers = 0
+        self._worker = None
+        self._stop_event = None
+        self._threads = []
+
+        self._encode_buffer = LatestFrameBuffer("encode")
+        self.tiers = load_stream_tiers()
+        # Key (seq, tên mức): mỗi frame encode tối đa 1 lần cho mỗi mức chất lượng
+        self._encoded_cache = EncodedFrameCache(max_entries=4 * len(self.tiers))
+        self._viewers = set()
+
+        # Output: packet đã encode mới nhất, viewer chờ theo seq
+        self._output_cond = threading.Condition()
+        self._output = None
+        # Hàm listener(pipeline) gọi trên encode thread mỗi khi có output mới (vd: đánh thức event loop)
+        self._output_listeners = ()
+
+        self._reader_dropped = 0
+        self._detect_timer = StageTimer()
+        self._encode_timer = StageTimer()
+
+    # --- VÒNG ĐỜI ---
+
+    def acquire(self):
+        with self._lock:
+            self._subscribers += 1
+            if self._subscribers == 1:
+                self._start_locked()
+
+    def release(self):
+        with self._lock:
+            self._subscribers = max(0, self._subscribers - 1)
+            if self._subscribers == 0:
+                self._stop_locked()
+
+    def _start_locked(self):
+        self._worker = self.camera_hub.subscribe(self.camera_id)
+        self._stop_event = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._detect_loop, args=(self._worker, self._stop_event),
+                             name=f"detect-{self.camera_id}", daemon=True),
+            threading.Thread(target=self._encode_loop, args=(self._stop_event,),
+                             name=f"encode-{self.camera_id}", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"▶️ Pipeline camera '{self.camera_id}' đã khởi động")
+
+    def _stop_locked(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._worker is not None:
+            self._worker.release()
+        self._worker = None
+        self._stop_event = None
+        self._threads = []
+        self._encode_buffer.clear()
+        self._encoded_cache.clear()
+        with self._output_cond:
+            self._output = None
+        logger.info(f"⏹️ Pipeline camera '{self.camera_id}' đã dừng")
+
+    # --- CÁC STAGE ---
+
+    def _detect_loop(self, worker, stop_event):
+        last_seq = 0
+        while not stop_event.is_set():
+            seq, frame = worker.wait_for_frame(last_seq, timeout=0.5)
+            if frame is None:
+                continue
+            # Frame camera bị ghi đè trước khi detection kịp lấy => rơi frame ở reader
+            if last_seq and seq > last_seq + 1:
+                self._reader_dropped += seq - last_seq - 1
+            last_seq = seq
+
+            packet = FramePacket(self.camera_id, seq, time.time(), frame)
+            if is_offline_frame(frame):
+                # Camera mất kết nối: gửi thẳng placeholder cho viewer, không detection
+                packet.needs_mirror = False
+                self._encode_buffer.put(packet)
+                continue
+
+            started = time.perf_counter()
+            try:
+                packet.frame = self.process_fn(packet)
+            except Exception as e:
+                logger.error(f"Lỗi trong detection worker: {e}", exc_info=True)
+            self._detect_timer.record(time.perf_counter() - started)
+
+            if packet.frame is not None:
+                self._encode_buffer.put(packet)
+
+    def _encode_loop(self, stop_event):
+        while not stop_event.is_set():
+            packet = self._encode_buffer.get(timeout=0.5)
+            if packet is None:
+                continue
+
+            packet.chunk = self._encoded_cache.get_or_build((packet.seq, self.tiers[0].name),
+                                                            lambda: self._encode_chunk(packet))
+            if packet.chunk is None:
+                continue
+
+            with self._output_cond:
+                if stop_event.is_set():
+                    break
+                self._output = packet
+                self._output_cond.notify_all()
+            for listener in self._output_listeners:
+                listener(self)
+
+    def _encode_chunk(self, packet, tier=None):
+        """
+        Encode JPEG + ghép multipart chunk (1 lần cho mỗi frame và mỗi mức)
+        tier: None = mức đầy đủ (JPEG được giữ lại trong packet.jpeg)
+        """
+        started = time.perf_counter()
+        try:
+            frame = packet.frame
+            quality = self.jpeg_quality
+            if tier is not None:
+                quality = tier.quality
+                if tier.scale != 1.0:
+                    height, width = frame.shape[:2]
+                    frame = cv2.resize(frame, (int(width * tier.scale), int(height * tier.scale)),
+                                       interpolation=cv2.INTER_AREA)
+            if packet.needs_mirror:
+                frame = cv2.flip(frame, 1)
+            ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        except Exception as e:
+            logger.error(f"Lỗi khi encode frame: {e}")
+            return None
+        elapsed = time.perf_counter() - started
+        if not ret:
+            return None
+
+        jpeg = buffer.tobytes()
+        if tier is None:
+            self._encode_timer.record(elapsed)
+            packet.jpeg = jpeg
+        metrics.JPEG_ENCODE_SECONDS.labels(self.camera_id).observe(elapsed)
+        metrics.JPEG_BYTES.labels(self.camera_id).observe(len(jpeg))
+        return build_mjpeg_chunk(jpeg)
+
+    # --- VIEWER ---
+
+    def wait_for_output(self, last_seq, timeout=1.0):
+        """
+        Chờ packet đã encode mới hơn `last_seq`.
+
+        Returns:
+            FramePacket hoặc None nếu hết timeout
+        """
+        deadline = time.time() + timeout
+        with self._output_cond:
+            while self._output is None or self._output.seq <= last_seq:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._output_cond.wait(remaining)
+            return self._output
+
+    def peek_output(self, last_seq):
+        """Packet đã encode mới hơn `last_seq` nếu có (không chờ), dùng cho viewer chạy trên event loop"""
+        with self._output_cond:
+            output = self._output
+            if output is None or output.seq <= last_seq:
+                return None
+            return output
+
+    def add_output_listener(self, listener):
+        """Đăng ký listener(pipeline), gọi trên encode thread sau mỗi output mới (không được chặn)"""
+        with self._lock:
+            if listener not in self._output_listeners:
+                self._output_listeners = self._output_listeners + (listener,)
+
+    def get_chunk(self, packet, tier):
+        """
+        Chunk multipart của packet ở mức chất lượng `tier`.
+        Mức đầy đủ dùng luôn chunk của encoder, mức thấp hơn được encode 1 lần (trên thread của viewer
+        gọi đầu tiên) rồi dùng chung cho mọi viewer cùng mức.
+        """
+        if tier is self.tiers[0] or (tier.scale == 1.0 and tier.quality == self.jpeg_quality):
+            return packet.chunk
+        return self._encoded_cache.get_or_build((packet.seq, tier.name), lambda: self._encode_chunk(packet, tier))
+
+    def add_viewer(self, controller):
+        with self._lock:
+            self._viewers.add(controller)
+
+    def remove_viewer(self, controller):
+        with self._lock:
+            self._viewers.discard(controller)
+
+    def stats(self):
+        worker = self._worker
+        with self._lock:
+            subscribers = self._subscribers
+            viewers = list(self._viewers)
+        return {
+            "camera_id": self.camera_id,
+            "subscribers": subscribers,
+            "reader": dict(worker.stats() if worker is not None else {}, dropped=self._reader_dropped),
+            "detect": self._detect_timer.stats(),
+            "encode_queue": self._encode_buffer.stats(),
+            "encode": self._encode_timer.stats(),
+            "encoded_cache": self._encoded_cache.stats(),
+            "viewers": [viewer.stats() for viewer in viewers]
+        }
+
+
+class PipelineManager:
+    """Quản lý các StreamPipeline theo camera_id"""
+
+    def __init__(self, camera_hub, process_fn, jpeg_quality=85):
+        self.camera_hub = camera_hub
+        self.process_fn = process_fn
+        self.jpeg_quality = jpeg_quality
+        self._pipelines = {}
+        self._lock = threading.Lock()
+
+    def get(self, camera_id):
+        with self._lock:
+            pipeline = self._pipelines.get(camera_id)
+            if pipeline is None:
+                pipeline = StreamPipeline(self.camera_hub, camera_id, self.process_fn, self.jpeg_quality)
+                self._pipelines[camera_id] = pipeline
+            return pipeline
+
+    def subscribe(self, camera_id):
+        """Đăng ký viewer, trả về StreamPipeline (nhớ gọi release() khi xong)"""
+        pipeline = self.get(camera_id)
+        pipeline.acquire()
+        return pipeline
+
+    def stats(self):
+        with self._lock:
+            pipelines = list(self._pipelines.values())
+        return [pipeline.stats() for pipeline in pipelines]
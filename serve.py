@@ -0,0 +1,58 @@
+# serve.py
+"""
+Entry point production: gevent WSGI server (WebSocket cho Socket.IO + MJPEG streaming) trên 1 event loop.
+
+    python serve.py
+
+- Viewer /video_feed và Socket.IO là greenlet (rẻ, hàng trăm kết nối / process)
+- Pipeline camera / detection / encode vẫn chạy trên thread hệ điều hành thật
+  (threading không bị monkey patch) nên OpenCV và MediaPipe chạy song song trên nhiều core
+- Không có debug reloader (không nạp MediaPipe 2 lần)
+
+Chạy dev (Werkzeug, threading): python main.py
+"""
+from gevent import monkey
+
+# Chỉ patch I/O mạng. threading/queue/time giữ nguyên để pipeline vẫn là thread thật,
+# subprocess/os/signal giữ nguyên vì subprocess được gọi từ thread thật (vd: ctypes.find_library khi import MediaPipe
+# trong warm-up): subprocess của gevent chỉ chạy được trên loop của main thread, fork/waitpid của gevent làm subprocess thật bị treo
+monkey.patch_all(thread=False, queue=False, time=False, subprocess=False, os=False, signal=False)
+
+import logging  # noqa: E402
+
+import config as cfg  # noqa: E402
+
+cfg.SOCKETIO_ASYNC_MODE = "gevent"
+
+import main  # noqa: E402
+from gevent.pywsgi import WSGIServer  # noqa: E402
+from geventwebsocket.handler import WebSocketHandler  # noqa: E402
+
+logger = logging.getLogger("serve")
+
+
+def run():
+    logger.info(f"🚀 Starting production server (gevent) on http://{cfg.SERVER_HOST}:{cfg.SERVER_PORT}")
+
+    # MediaPipe + FaceProcessor + InferenceService được nạp trên thread nền, server bind port ngay
+    main.start_warmup()
+    main.loop_bridge.start()
+    if main.capture_store is not None:
+        main.capture_store.start()
+
+    server = WSGIServer((cfg.SERVER_HOST, cfg.SERVER_PORT), main.app,
+                        handler_class=WebSocketHandler, backlog=cfg.SERVER_BACKLOG, log=None)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("⏹️ Đang dừng server...")
+    finally:
+        main.camera_hub.shutdown()
+        if main.capture_store is not None:
+            main.capture_store.shutdown()
+        if main._inference_service is not None:
+            main._inference_service.shutdown()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,135 @@
+# status_publisher.py
+import threading
+import time
+import logging
+import config as cfg
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class _ClientStatus:
+    __slots__ = ("sent", "sent_at", "pending", "progress", "progress_at")
+
+    def __init__(self):
+        self.sent = None        # (status, message) đã gửi gần nhất
+        self.sent_at = 0.0
+        self.pending = None     # Payload mới nhất chưa gửi (bị gộp do giới hạn tần suất)
+        self.progress = None    # Tiến độ đã gửi gần nhất
+        self.progress_at = 0.0
+
+
+class StatusPublisher:
+    """
+    Gửi 'face_status' cho từng client chỉ khi trạng thái thay đổi:
+        - (status, message) đổi: gửi ngay, nhưng không quá `max_rate` lần/giây. Đổi quá nhanh thì giữ bản
+          mới nhất (pending) và gửi khi hết khoảng chờ (thread flush, kể cả khi không có publish() nào nữa)
+        - trạng thái quay về đúng bản đã gửi trước khi kịp gửi pending: bỏ pending
+        - chỉ tiến độ (progress) đổi: gửi với tần suất thấp cố định `progress_rate`
+    """
+
+    def __init__(self, emit_fn, max_rate=None, progress_rate=None):
+        """
+        Args:
+            emit_fn: Hàm emit(event, data, sid)
+            max_rate: Số lần gửi tối đa mỗi giây khi trạng thái thay đổi liên tục
+            progress_rate: Số lần gửi tiến độ mỗi giây khi trạng thái không đổi
+        """
+        self.emit_fn = emit_fn
+        max_rate = max_rate if max_rate is not None else cfg.STATUS_MAX_RATE
+        progress_rate = progress_rate if progress_rate is not None else cfg.STATUS_PROGRESS_RATE
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.progress_interval = 1.0 / progress_rate if progress_rate > 0 else float("inf")
+
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._flush_thread = None
+        self.sent = 0
+        self.suppressed = 0
+
+    def publish(self, sid, camera_id, status, message, progress=None, force=False):
+        """
+        Cập nhật trạng thái của client, chỉ emit khi cần
+        force: Gửi ngay không qua giới hạn tần suất (vd: idle sau khi chụp / huỷ)
+        """
+        now = time.time()
+        payload = {'status': status, 'message': message, 'camera_id': camera_id}
+        if progress is not None:
+            payload['progress'] = round(progress, 3)
+
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is None:
+                client = _ClientStatus()
+                self._clients[sid] = client
+
+            if client.sent != (status, message):
+                send = force or now - client.sent_at >= self.min_interval
+                if not send:
+                    # Đổi trạng thái quá nhanh: giữ bản mới nhất, thread flush gửi khi hết khoảng chờ
+                    client.pending = payload
+                    self._start_flush_locked()
+            else:
+                # Trạng thái quay về đúng bản đã gửi => bỏ bản đang chờ
+                client.pending = None
+                send = force or (progress is not None and progress != client.progress
+                                 and now - client.progress_at >= self.progress_interval)
+
+            if not send:
+                self.suppressed += 1
+                return False
+            self._mark_sent_locked(client, payload, now)
+
+        self.emit_fn('face_status', payload, sid)
+        return True
+
+    def _mark_sent_locked(self, client, payload, now):
+        client.sent = (payload['status'], payload['message'])
+        client.sent_at = now
+        client.pending = None
+        if 'progress' in payload:
+            client.progress = payload['progress']
+            client.progress_at = now
+        self.sent += 1
+
+    def flush(self, now=None):
+        """Gửi các trạng thái pending đã hết khoảng chờ. Returns: số bản đã gửi"""
+        now = now if now is not None else time.time()
+        due = []
+        with self._lock:
+            for sid, client in self._clients.items():
+                if client.pending is not None and now - client.sent_at >= self.min_interval:
+                    due.append((sid, client.pending))
+                    self._mark_sent_locked(client, client.pending, now)
+        for sid, payload in due:
+            self.emit_fn('face_status', payload, sid)
+        return len(due)
+
+    def _start_flush_locked(self):
+        self._flush_event.set()
+        if self._flush_thread is None:
+            self._flush_thread = threading.Thread(target=self._flush_loop, name="status-flush", daemon=True)
+            self._flush_thread.start()
+
+    def _flush_loop(self):
+        while True:
+            # Chỉ chạy khi có pending, không poll khi mọi client đã đồng bộ
+            self._flush_event.wait()
+            time.sleep(self.min_interval / 2 or 0.01)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Lỗi khi gửi trạng thái: {e}", exc_info=True)
+            with self._lock:
+                if not any(client.pending is not None for client in self._clients.values()):
+                    self._flush_event.clear()
+
+    def reset(self, sid):
+        """Quên trạng thái đã gửi (vd: bắt đầu phiên chụp mới)"""
+        with self._lock:
+            self._clients.pop(sid, None)
+
+    def stats(self):
+        with self._lock:
+            return {"clients": len(self._clients), "sent": self.sent, "suppressed": self.suppressed}
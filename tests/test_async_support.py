@@ -0,0 +1,86 @@
+# tests/test_async_support.py
+import threading
+import time
+
+import gevent
+
+from async_support import LoopBridge
+
+
+class FakeSocketIO:
+    """Chỉ phần SocketIO mà LoopBridge dùng, chạy trên hub gevent của main thread"""
+
+    def __init__(self):
+        self.emitted = []
+
+    def start_background_task(self, fn):
+        return gevent.spawn(fn)
+
+    def sleep(self, seconds):
+        gevent.sleep(seconds)
+
+    def emit(self, event, data, to=None):
+        self.emitted.append((event, data, to))
+
+
+class FakePipeline:
+    def __init__(self):
+        self.packet = None
+        self.listeners = ()
+
+    def add_output_listener(self, listener):
+        self.listeners += (listener,)
+
+    def peek_output(self, last_seq):
+        if self.packet is not None and self.packet["seq"] > last_seq:
+            return self.packet
+        return None
+
+    def publish(self, seq):
+        # Giống encode thread của StreamPipeline: ghi output rồi gọi listener
+        self.packet = {"seq": seq}
+        for listener in self.listeners:
+            listener(self)
+
+
+def gevent_bridge():
+    # poll_interval rất lớn: nếu bridge còn poll thì test sẽ hết thời gian chờ
+    bridge = LoopBridge(FakeSocketIO(), async_mode="gevent", poll_interval=30.0)
+    bridge.start()
+    return bridge
+
+
+def test_pipeline_thread_wakes_waiting_viewer():
+    bridge = gevent_bridge()
+    pipeline = FakePipeline()
+    publisher = threading.Timer(0.05, pipeline.publish, args=(1,))
+
+    started = time.time()
+    publisher.start()
+    packet = bridge.wait_for_output(pipeline, last_seq=0, timeout=5.0)
+    publisher.join()
+
+    assert packet == {"seq": 1}
+    assert time.time() - started < 1.0
+    # Listener chỉ đăng ký 1 lần dù viewer chờ nhiều lần
+    assert bridge.wait_for_output(pipeline, last_seq=0, timeout=0.1) == {"seq": 1}
+    assert len(pipeline.listeners) == 1
+
+
+def test_wait_times_out_without_new_output():
+    bridge = gevent_bridge()
+    started = time.time()
+    assert bridge.wait_for_output(FakePipeline(), last_seq=0, timeout=0.1) is None
+    assert time.time() - started < 1.0
+
+
+def test_emit_from_other_thread_is_sent_on_loop():
+    bridge = gevent_bridge()
+    sender = threading.Thread(target=bridge.emit, args=("face_status", {"status": "ok"}, "sid-1"))
+    sender.start()
+    sender.join()
+
+    with gevent.Timeout(1.0):
+        while not bridge.socketio.emitted:
+            gevent.sleep(0.01)
+    assert bridge.socketio.emitted == [("face_status", {"status": "ok"}, "sid-1")]
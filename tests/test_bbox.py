@@ -0,0 +1,27 @@
+# tests/test_bbox.py
+from types import SimpleNamespace
+
+import pytest
+
+from main import get_primary_bbox
+
+
+def detection(xmin, ymin, width, height):
+    bbox = SimpleNamespace(xmin=xmin, ymin=ymin, width=width, height=height)
+    return SimpleNamespace(location_data=SimpleNamespace(relative_bounding_box=bbox))
+
+
+def test_largest_face_is_returned():
+    detections = [detection(0.1, 0.1, 0.1, 0.1), detection(0.5, 0.2, 0.3, 0.4)]
+    assert get_primary_bbox(detections) == [0.5, 0.2, 0.3, 0.4]
+
+
+def test_no_detection():
+    assert get_primary_bbox([]) is None
+    assert get_primary_bbox(None) is None
+
+
+def test_bbox_is_mirrored_with_frame():
+    xmin, ymin, width, height = get_primary_bbox([detection(0.1, 0.2, 0.3, 0.4)], mirrored=True)
+    assert xmin == pytest.approx(0.6)
+    assert (ymin, width, height) == (0.2, 0.3, 0.4)
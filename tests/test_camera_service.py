@@ -0,0 +1,86 @@
+# tests/test_camera_service.py
+import numpy as np
+
+import config as cfg
+from camera_service import CameraStream, ReconnectBackoff
+from frame_sources import FramePacer
+
+
+class FakeRtspClient:
+    """Giống rtsp.Client: read() không chặn, luôn trả về ảnh mới nhất"""
+
+    def __init__(self):
+        self.image = np.zeros((720, 1280, 3), dtype=np.uint8)
+        self.closed = False
+
+    def isOpened(self):
+        return not self.closed
+
+    def read(self, raw=False):
+        return self.image
+
+    def push(self):
+        self.image = np.full((720, 1280, 3), 128, dtype=np.uint8)
+
+    def close(self):
+        self.closed = True
+
+
+def make_stream(fps=0):
+    stream = CameraStream(connect=False, backend="rtsp")
+    stream.client = FakeRtspClient()
+    stream._pacer = FramePacer(fps)
+    return stream
+
+
+class TestReconnectBackoff:
+    def test_delay_doubles_until_max(self):
+        backoff = ReconnectBackoff(base_delay=0.5, max_delay=4.0, jitter=0.0)
+        assert [backoff.next_delay() for _ in range(6)] == [0.5, 1.0, 2.0, 4.0, 4.0, 4.0]
+        assert backoff.attempts == 6
+
+    def test_jitter_stays_in_range(self):
+        backoff = ReconnectBackoff(base_delay=1.0, max_delay=1.0, jitter=0.3)
+        for _ in range(100):
+            assert 0.7 <= backoff.next_delay() <= 1.3
+
+    def test_reset(self):
+        backoff = ReconnectBackoff(base_delay=0.5, max_delay=30.0, jitter=0.0)
+        backoff.next_delay()
+        backoff.next_delay()
+        backoff.reset()
+        assert backoff.next_delay() == 0.5
+
+
+class TestCameraStreamRtsp:
+    def test_frame_is_converted_and_resized(self):
+        frame = make_stream().get_frame()
+        assert frame.shape == (cfg.FRAME_HEIGHT, cfg.FRAME_WIDTH, 3)
+
+    def test_same_image_is_not_published_twice(self):
+        stream = make_stream()
+        assert stream.get_frame() is not None
+        assert stream.get_frame() is None
+        assert stream.get_frame() is None
+        stream.client.push()
+        assert stream.get_frame() is not None
+
+    def test_stale_stream_is_closed(self):
+        stream = make_stream()
+        client = stream.client
+        assert stream.get_frame() is not None
+        stream.last_frame_time -= stream.frame_timeout + 1
+        assert stream.get_frame() is None
+        assert client.closed
+        assert stream.client is None
+
+    def test_reads_are_paced(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr("frame_sources.time.time", lambda: now[0])
+        stream = make_stream(fps=10)
+        assert stream.get_frame() is not None
+        stream.client.push()
+        assert stream.get_frame() is None  # Chưa tới lượt đọc tiếp theo
+        now[0] += 0.1
+        assert stream.get_frame() is not None
+
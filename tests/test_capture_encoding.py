@@ -0,0 +1,59 @@
+# tests/test_capture_encoding.py
+import cv2
+import numpy as np
+
+from capture_encoding import build_capture_payload, encode_to_budget, resolve_format
+
+
+def noisy_image():
+    """Ảnh nhiễu: kích thước JPEG thay đổi rõ theo quality"""
+    return (np.random.default_rng(0).random((240, 320, 3)) * 255).astype(np.uint8)
+
+
+def test_fits_on_first_pass_when_budget_is_large():
+    encoded = encode_to_budget(noisy_image(), 10 * 1024 * 1024, fmt="jpeg", quality=90)
+    assert encoded.passes == 1
+    assert encoded.quality == 90
+    assert encoded.mime == "image/jpeg"
+    assert cv2.imdecode(np.frombuffer(encoded.data, np.uint8), cv2.IMREAD_COLOR).shape == (240, 320, 3)
+
+
+def test_searches_highest_quality_within_budget():
+    image = noisy_image()
+    full = encode_to_budget(image, None, fmt="jpeg", quality=95)
+    budget = len(full) // 2
+
+    encoded = encode_to_budget(image, budget, fmt="jpeg", quality=95, min_quality=10, max_passes=8)
+    assert len(encoded) <= budget
+    assert 10 <= encoded.quality < 95
+    assert 1 < encoded.passes <= 8
+    # 1 mức quality cao hơn đã vượt ngân sách (hoặc đã hết lượt thử)
+    above = encode_to_budget(image, None, fmt="jpeg", quality=encoded.quality + 1)
+    assert len(above) > budget or encoded.passes == 8
+
+
+def test_unreachable_budget_returns_smallest_attempt():
+    encoded = encode_to_budget(noisy_image(), 100, fmt="jpeg", quality=90, min_quality=20, max_passes=4)
+    assert encoded.quality == 20
+    assert encoded.passes <= 4
+    assert len(encoded) > 100
+
+
+def test_pass_limit_is_respected():
+    image = noisy_image()
+    budget = len(encode_to_budget(image, None, fmt="jpeg", quality=95)) // 3
+    encoded = encode_to_budget(image, budget, fmt="jpeg", quality=95, min_quality=5, max_passes=2)
+    assert encoded.passes <= 2
+
+
+def test_unknown_format_falls_back_to_jpeg():
+    assert resolve_format("jpg") == "jpeg"
+    assert resolve_format("bmp") == "jpeg"
+
+
+def test_capture_payload_transports():
+    encoded = encode_to_budget(noisy_image(), None, fmt="jpeg", quality=50)
+    assert build_capture_payload(encoded, "url", "/captures/a.jpg")["url"] == "/captures/a.jpg"
+    assert build_capture_payload(encoded, "url")["url"].startswith("data:image/jpeg;base64,")
+    binary = build_capture_payload(encoded, "binary")
+    assert binary["image"] is encoded.data and binary["size"] == len(encoded)
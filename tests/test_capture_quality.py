@@ -0,0 +1,44 @@
+# tests/test_capture_quality.py
+import cv2
+import numpy as np
+
+from capture_quality import CaptureCandidateBuffer, score_candidate
+
+
+def test_keeps_best_candidates_and_copies_only_kept_crops():
+    buffer = CaptureCandidateBuffer(capacity=2)
+    copied = []
+
+    def crop(name):
+        def fn():
+            copied.append(name)
+            return name
+        return fn
+
+    assert buffer.offer(0.5, crop("a"))
+    assert buffer.offer(0.2, crop("b"))
+    assert not buffer.offer(0.1, crop("c"))   # Kém hơn cả 2 => không copy
+    assert buffer.offer(0.9, crop("d"))       # Thay ứng viên kém nhất (b)
+    assert not buffer.offer(0.5, crop("e"))   # Bằng ứng viên kém nhất => giữ cái cũ
+
+    assert copied == ["a", "b", "d"]
+    assert len(buffer) == 2
+    assert buffer.best()[:2] == (0.9, "d")
+
+
+def test_clear_and_empty_best():
+    buffer = CaptureCandidateBuffer(capacity=1)
+    assert buffer.best() is None
+    buffer.offer(1.0, lambda: "x", {"sharpness": 1.0})
+    assert buffer.best() == (1.0, "x", {"sharpness": 1.0})
+    buffer.clear()
+    assert len(buffer) == 0 and buffer.best() is None
+
+
+def test_sharp_crop_scores_higher_than_blurred():
+    sharp = (np.random.default_rng(0).random((200, 200, 3)) * 255).astype(np.uint8)
+    blurred = cv2.GaussianBlur(sharp, (21, 21), 0)
+    sharp_score, sharp_parts = score_candidate(sharp)
+    blurred_score, blurred_parts = score_candidate(blurred)
+    assert sharp_parts["sharpness"] > blurred_parts["sharpness"]
+    assert sharp_score > blurred_score
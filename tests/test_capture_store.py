@@ -0,0 +1,91 @@
+# tests/test_capture_store.py
+import os
+import threading
+import time
+
+import pytest
+
+import config as cfg
+from capture_encoding import EncodedImage
+from capture_store import CaptureStore
+
+
+def make_image(size=1000):
+    return EncodedImage(b"\xff" * size, "jpeg", "image/jpeg", 85, 1)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CaptureStore(folder=str(tmp_path), prefix="face_", batch_window=0.0, fsync=False,
+                         max_files=0, max_age_days=0)
+    yield store
+    store.shutdown()
+
+
+def save_and_wait(store, image):
+    done = threading.Event()
+    results = []
+
+    def on_done(name, ok):
+        results.append((name, ok, os.path.exists(os.path.join(store.folder, name))))
+        done.set()
+
+    name = store.save(image, on_done)
+    assert done.wait(5.0)
+    return name, results[0]
+
+
+def test_callback_runs_after_file_is_written(store):
+    image = make_image()
+    name, (done_name, ok, existed) = save_and_wait(store, image)
+    assert done_name == name and ok and existed
+    with open(os.path.join(store.folder, name), "rb") as handle:
+        assert handle.read() == image.data
+    assert store.get(name) is None
+    assert not [entry for entry in os.listdir(store.folder) if entry.endswith(".tmp")]
+
+
+def test_failed_write_reports_not_ok(store, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("capture_store.os.replace", fail)
+    _, (_, ok, existed) = save_and_wait(store, make_image())
+    assert not ok and not existed
+    assert store.stats()["failed"] == 1
+
+
+def test_full_queue_returns_none(tmp_path):
+    store = CaptureStore(folder=str(tmp_path), queue_size=1, fsync=False)
+    store._thread = threading.current_thread()  # Không chạy writer: queue không bao giờ được lấy ra
+    assert store.save(make_image()) is not None
+    assert store.save(make_image()) is None
+    assert store.stats()["dropped"] == 1
+
+
+def test_url_uses_client_host_unless_base_url_configured(store, monkeypatch):
+    monkeypatch.setattr(cfg, "SERVER_BASE_URL", None)
+    assert store.url_for("face_1_abcdef12.jpg", "http://10.0.0.5:5000/") == \
+        f"http://10.0.0.5:5000{cfg.CAPTURE_URL_PATH}/face_1_abcdef12.jpg"
+    assert store.url_for("face_1_abcdef12.jpg") == f"{cfg.CAPTURE_URL_PATH}/face_1_abcdef12.jpg"
+    monkeypatch.setattr(cfg, "SERVER_BASE_URL", "https://kiosk.example.com/")
+    assert store.url_for("face_1_abcdef12.jpg", "http://10.0.0.5:5000/") == \
+        f"https://kiosk.example.com{cfg.CAPTURE_URL_PATH}/face_1_abcdef12.jpg"
+
+
+def test_name_validation(store):
+    assert store.is_valid_name("face_1700000000000_0123abcd.jpg")
+    assert not store.is_valid_name("../config.py")
+    assert not store.is_valid_name("face_1_zzzz.jpg")
+
+
+def test_prune_by_age_and_count(tmp_path):
+    store = CaptureStore(folder=str(tmp_path), prefix="face_", max_files=2, max_age_days=1)
+    now = time.time()
+    names = [f"face_{int((now - age) * 1000)}_0000000{i}.jpg"
+             for i, age in enumerate([3 * 86400, 300, 200, 100])]
+    for name in names + ["other.txt"]:
+        (tmp_path / name).write_bytes(b"x")
+
+    assert store.prune(now) == 2
+    assert sorted(os.listdir(tmp_path)) == sorted(names[2:] + ["other.txt"])
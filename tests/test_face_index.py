@@ -0,0 +1,73 @@
+# tests/test_face_index.py
+import numpy as np
+import pytest
+
+from face_index import FaceEmbeddingIndex
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_top_k_is_sorted_by_cosine(tmp_path):
+    index = FaceEmbeddingIndex(path=str(tmp_path / "faces"), dim=3, initial_capacity=2, search_chunk=2)
+    index.add([[1, 0, 0], [0, 1, 0], [1, 1, 0]], ["x", "y", "xy"])
+    index.add([0, 0, 5], "z")  # 1 vector + nhãn str, vượt capacity => tự tăng dung lượng
+
+    results = index.search([[1, 0.1, 0], [0, 0, 1]], top_k=2)
+    assert [match["label"] for match in results[0]] == ["x", "xy"]
+    assert results[0][0]["score"] == pytest.approx(float(unit([1, 0.1, 0]) @ unit([1, 0, 0])), abs=1e-4)
+    assert results[1][0] == {"label": "z", "score": pytest.approx(1.0), "index": 3}
+    assert index.capacity >= 4 and len(index) == 4
+
+
+def test_top_k_larger_than_index(tmp_path):
+    index = FaceEmbeddingIndex(path=str(tmp_path / "faces"), dim=2)
+    assert index.search([1, 0]) == [[]]
+    index.add([[1, 0], [0, 1]], ["a", "b"])
+    assert [match["label"] for match in index.search([0, 1], top_k=5)[0]] == ["b", "a"]
+
+
+def test_chunked_search_matches_brute_force(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((257, 16)).astype(np.float32)
+    queries = rng.standard_normal((5, 16)).astype(np.float32)
+    index = FaceEmbeddingIndex(path=str(tmp_path / "faces"), dim=16, search_chunk=50)
+    index.add(vectors, [f"p{i}" for i in range(len(vectors))])
+
+    expected = np.argsort(-(np.array([unit(q) for q in queries]) @ np.array([unit(v) for v in vectors]).T),
+                          axis=1)[:, :3]
+    results = index.search(queries, top_k=3)
+    assert [[match["index"] for match in row] for row in results] == expected.tolist()
+
+
+def test_round_trip_reopens_index_and_drops_partial_label(tmp_path):
+    path = str(tmp_path / "faces")
+    index = FaceEmbeddingIndex(path=path, dim=3, initial_capacity=1)
+    index.add([[1, 0, 0], [0, 1, 0]], ["Nguyễn Văn A", {"id": 2}])
+    del index
+    # Process bị dừng giữa lúc ghi nhãn: dòng cuối không có "\n"
+    with open(path + ".labels", "a", encoding="utf-8") as handle:
+        handle.write('"dở dang')
+
+    reopened = FaceEmbeddingIndex(path=path)
+    assert reopened.dim == 3 and len(reopened) == 2
+    assert reopened.labels == ["Nguyễn Văn A", {"id": 2}]
+    assert reopened.search([0, 1, 0], top_k=1)[0][0]["label"] == {"id": 2}
+
+    # Bản ghi dở dang đã bị cắt => thêm tiếp rồi mở lại vẫn đọc được
+    reopened.add([0, 0, 1], "C")
+    del reopened
+    assert FaceEmbeddingIndex(path=path).labels == ["Nguyễn Văn A", {"id": 2}, "C"]
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    path = str(tmp_path / "faces")
+    index = FaceEmbeddingIndex(path=path, dim=3)
+    with pytest.raises(ValueError):
+        index.add([[1, 0]], ["bad"])
+    with pytest.raises(ValueError):
+        FaceEmbeddingIndex(path=path, dim=4)
+    with pytest.raises(ValueError):
+        FaceEmbeddingIndex(path=str(tmp_path / "new"))
@@ -0,0 +1,61 @@
+# tests/test_face_tracker.py
+import cv2
+import numpy as np
+
+import metrics
+from face_tracker import AdaptiveDetectionScheduler, TrackedDetection
+
+
+def textured_frame():
+    """Frame BGR nhiễu đã làm mờ: đủ góc để optical flow bám được điểm"""
+    noise = (np.random.default_rng(0).random((240, 320)) * 255).astype(np.uint8)
+    gray = cv2.GaussianBlur(noise, (5, 5), 0)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+def face_detection():
+    return TrackedDetection((100, 60, 120, 120), 320, 240, 0.9)
+
+
+def metric_value(metric, *labels):
+    return metric.labels(*labels).value
+
+
+def test_static_face_is_tracked_between_detections_and_exposed_as_metrics():
+    scheduler = AdaptiveDetectionScheduler(min_interval=2, max_interval=4, camera_id="cam-tracker")
+    frame = textured_frame()
+    calls = []
+
+    def detect(image):
+        calls.append(image)
+        return [face_detection()]
+
+    for _ in range(12):
+        scheduler.step(frame, detect)
+
+    assert scheduler.detections_run == len(calls)
+    assert 0 < scheduler.detections_run < 12
+    assert scheduler.frames_tracked == 12 - scheduler.detections_run
+    # Mặt đứng yên => chu kỳ detect giãn dần tới max_interval
+    assert scheduler.interval == 4
+
+    assert metric_value(metrics.DETECTION_FRAMES_TOTAL, "cam-tracker", "detect") == scheduler.detections_run
+    assert metric_value(metrics.DETECTION_FRAMES_TOTAL, "cam-tracker", "track") == scheduler.frames_tracked
+    assert metric_value(metrics.DETECTION_INTERVAL_FRAMES, "cam-tracker") == 4
+    rendered = metrics.registry.render()
+    assert 'detection_frames_total{camera="cam-tracker",mode="track"}' in rendered
+
+    scheduler.reset()
+    assert metric_value(metrics.DETECTION_INTERVAL_FRAMES, "cam-tracker") == 2
+
+
+def test_multiple_faces_are_detected_every_frame():
+    scheduler = AdaptiveDetectionScheduler(min_interval=1, max_interval=5, camera_id="cam-multi")
+    frame = textured_frame()
+
+    for _ in range(5):
+        scheduler.step(frame, lambda image: [face_detection(), face_detection()])
+
+    assert scheduler.detections_run == 5
+    assert scheduler.frames_tracked == 0
+    assert scheduler.stats()["interval"] == 1
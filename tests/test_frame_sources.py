@@ -0,0 +1,126 @@
+# tests/test_frame_sources.py
+import cv2
+import numpy as np
+import pytest
+
+import config as cfg
+from frame_sources import FramePacer, ImageDirectoryReader, PyAVReader, VideoFileReader, fit_frame
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("frame_sources.time.time", lambda: now[0])
+    return now
+
+
+class TestFramePacer:
+    def test_unlimited_when_fps_or_speed_is_zero(self, clock):
+        for pacer in (FramePacer(0), FramePacer(25, speed=0)):
+            assert all(pacer.ready() for _ in range(5))
+
+    def test_one_frame_per_interval(self, clock):
+        pacer = FramePacer(10)
+        assert pacer.ready()
+        assert not pacer.ready()
+        clock[0] += 0.04
+        assert not pacer.ready()
+        clock[0] += 0.07
+        assert pacer.ready()
+
+    def test_speed_shortens_interval(self, clock):
+        pacer = FramePacer(10, speed=2.0)
+        assert pacer.interval == pytest.approx(0.05)
+
+    def test_small_lag_is_caught_up_without_drift(self, clock):
+        pacer = FramePacer(10)
+        pacer.ready()
+        clock[0] += 0.25  # Trễ 2.5 lượt: phát bù 2 frame rồi quay về nhịp
+        assert pacer.ready()
+        assert pacer.ready()
+        assert not pacer.ready()
+
+    def test_long_stall_resyncs_instead_of_bursting(self, clock):
+        pacer = FramePacer(10)
+        pacer.ready()
+        clock[0] += 5.0
+        assert pacer.ready()
+        assert not pacer.ready()
+
+
+def half_white(height, width):
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[:, :width // 2] = 255  # Nửa trái trắng
+    return image
+
+
+@pytest.mark.parametrize("scale", [1, 2])
+@pytest.mark.parametrize("mirror", [False, True])
+def test_fit_frame_returns_new_array(scale, mirror):
+    image = half_white(cfg.FRAME_HEIGHT * scale, cfg.FRAME_WIDTH * scale)
+    original = image.copy()
+
+    out = fit_frame(image, mirror)
+    assert out.shape == (cfg.FRAME_HEIGHT, cfg.FRAME_WIDTH, 3)
+    assert not np.shares_memory(out, image)
+    assert np.array_equal(image, original)  # Buffer decode của reader không bị sửa
+    left, right = out[0, 0].max(), out[0, -1].min()
+    assert (left, right) == ((0, 255) if mirror else (255, 0))
+
+
+def test_fit_frame_reuses_owned_image_of_right_size():
+    image = half_white(cfg.FRAME_HEIGHT, cfg.FRAME_WIDTH)
+    out = fit_frame(image, mirror=True, owned=True)
+    assert out is image
+    assert out[0, 0].max() == 0 and out[0, -1].min() == 255
+
+
+def test_video_file_frames_are_independent(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (320, 240))
+    for value in (0, 120, 240):
+        writer.write(np.full((240, 320, 3), value, dtype=np.uint8))
+    writer.release()
+
+    reader = VideoFileReader(path, mirror=False, loop=False, speed=0)
+    try:
+        frames = [reader.read() for _ in range(3)]
+    finally:
+        reader.close()
+    # Reader dùng lại buffer decode, nhưng frame trả về vẫn giữ nguyên sau các lần đọc tiếp theo
+    assert [int(round(frame.mean() / 10)) * 10 for frame in frames] == [0, 120, 240]
+    assert not np.shares_memory(frames[0], frames[1])
+
+
+def test_image_directory_reader_loops(tmp_path):
+    for index, value in enumerate((10, 200)):
+        cv2.imwrite(str(tmp_path / f"{index}.png"), np.full((240, 320, 3), value, dtype=np.uint8))
+
+    reader = ImageDirectoryReader(str(tmp_path), mirror=False, speed=0)
+    frames = [reader.read() for _ in range(3)]
+    assert [int(frame[0, 0, 0]) for frame in frames] == [10, 200, 10]
+    assert frames[0].shape == (cfg.FRAME_HEIGHT, cfg.FRAME_WIDTH, 3)
+
+
+def test_pyav_reader_returns_fresh_mirrored_frames(tmp_path):
+    av = pytest.importorskip("av")
+    path = str(tmp_path / "clip.avi")
+    with av.open(path, "w") as container:
+        stream = container.add_stream("mjpeg", rate=10)
+        stream.width, stream.height, stream.pix_fmt = 320, 240, "yuvj420p"
+        for _ in range(3):
+            image = np.zeros((240, 320, 3), dtype=np.uint8)
+            image[:, :160] = 255  # Nửa trái trắng
+            for packet in stream.encode(av.VideoFrame.from_ndarray(image, format="bgr24")):
+                container.mux(packet)
+        for packet in stream.encode():
+            container.mux(packet)
+
+    reader = PyAVReader(path, mirror=True)
+    try:
+        first, second = reader.read(), reader.read()
+    finally:
+        reader.close()
+    assert first.shape == (cfg.FRAME_HEIGHT, cfg.FRAME_WIDTH, 3)
+    assert not np.shares_memory(first, second)
+    assert first[:, :10].mean() < 30 and first[:, -10:].mean() > 220
@@ -0,0 +1,122 @@
+# tests/test_inference_service.py
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from inference_service import InferenceService, InferenceTimeout
+from warmup import warmup_inference
+
+
+class FakeDetector:
+    """Detector giả: đếm số frame đã chạy, có thể chặn để request dồn lại trong queue"""
+
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.calls = 0
+
+    def process(self, rgb_frame):
+        if self.gate is not None:
+            self.gate.wait(5.0)
+        self.calls += 1
+        return SimpleNamespace(detections=None)
+
+    def close(self):
+        pass
+
+
+def frame():
+    return np.zeros((48, 64, 3), dtype=np.uint8)
+
+
+def test_detect_returns_result():
+    service = InferenceService(num_workers=1, detector_factory=FakeDetector)
+    try:
+        assert service.detect(frame(), timeout=2.0) == []
+        assert service.stats()["processed"] == 1
+    finally:
+        service.shutdown()
+
+
+def test_idle_worker_takes_next_request_while_another_is_busy():
+    gate = threading.Event()
+
+    class BlockingDetector(FakeDetector):
+        """Frame đánh dấu (toàn 255) bị chặn tới khi mở gate, trên worker nào cũng vậy"""
+
+        def process(self, rgb_frame):
+            if rgb_frame[0, 0, 0] == 255:
+                gate.wait(5.0)
+            return super().process(rgb_frame)
+
+    service = InferenceService(num_workers=2, detector_factory=BlockingDetector)
+    try:
+        blocked = service.submit(np.full((48, 64, 3), 255, dtype=np.uint8), timeout=5.0)
+        futures = [service.submit(frame(), timeout=5.0) for _ in range(4)]
+        # Worker còn lại xử lý hết, không chờ worker đang bận
+        for future in futures:
+            assert future.result(timeout=2.0) == []
+        assert not blocked.done()
+        gate.set()
+        assert blocked.result(timeout=5.0) == []
+        assert service.stats()["processed"] == 5
+    finally:
+        gate.set()
+        service.shutdown()
+
+
+def test_expired_request_is_skipped():
+    gate = threading.Event()
+    detector = FakeDetector(gate)
+    service = InferenceService(num_workers=1, detector_factory=lambda: detector)
+    try:
+        blocker = service.submit(frame(), timeout=5.0)
+        expired = service.submit(frame(), timeout=0.01)
+        threading.Timer(0.1, gate.set).start()
+        blocker.result(timeout=5.0)
+        with pytest.raises(InferenceTimeout):
+            expired.result(timeout=5.0)
+        assert detector.calls == 2  # Detect giả lúc khởi tạo + blocker
+        assert service.stats()["expired"] == 1
+    finally:
+        service.shutdown()
+
+
+def test_every_worker_warms_its_own_detector():
+    detectors = []
+
+    def factory():
+        detector = FakeDetector()
+        detectors.append(detector)
+        return detector
+
+    service = InferenceService(num_workers=3, detector_factory=factory)
+    try:
+        warmup_inference(service)
+        assert [detector.calls for detector in detectors] == [1, 1, 1]
+        assert service.stats()["ready_workers"] == 3
+    finally:
+        service.shutdown()
+
+
+def test_warmup_fails_when_no_worker_starts():
+    def factory():
+        raise RuntimeError("không có model")
+
+    service = InferenceService(num_workers=2, detector_factory=factory)
+    with pytest.raises(RuntimeError):
+        warmup_inference(service)
+    assert service.wait_ready(0) == (0, 2)
+
+
+def test_warmup_times_out_on_slow_worker(monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr("warmup.cfg.WARMUP_INFERENCE_TIMEOUT", 0.05)
+    service = InferenceService(num_workers=1, detector_factory=lambda: FakeDetector(gate))
+    try:
+        with pytest.raises(TimeoutError):
+            warmup_inference(service)
+    finally:
+        gate.set()
+        service.shutdown()
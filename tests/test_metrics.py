@@ -0,0 +1,41 @@
+# tests/test_metrics.py
+import pytest
+
+from metrics import Counter, Gauge, Histogram, MetricsRegistry, _Metric
+
+
+def test_metric_base_cannot_be_instantiated():
+    with pytest.raises(TypeError):
+        _Metric("base", "không có child factory")
+
+
+def test_counter_and_gauge_render_per_label():
+    registry = MetricsRegistry()
+    counter = registry.counter("frames_total", "Số frame", ("camera",))
+    gauge = registry.gauge("clients", "Số client")
+    counter.labels("cam1").inc()
+    counter.labels("cam1").inc(2)
+    counter.labels('c"2').inc()
+    gauge.inc(3)
+    gauge.dec()
+
+    lines = registry.render().splitlines()
+    assert "# TYPE frames_total counter" in lines
+    assert 'frames_total{camera="cam1"} 3' in lines
+    assert 'frames_total{camera="c\\"2"} 1' in lines
+    assert "clients 2" in lines
+    assert isinstance(counter, Counter) and isinstance(gauge, Gauge)
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Độ trễ", buckets=(0.1, 0.01))
+    for value in (0.005, 0.05, 0.05, 2.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.01"} 1' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_count 4" in lines
+    assert isinstance(histogram, Histogram)
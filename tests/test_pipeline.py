@@ -0,0 +1,78 @@
+# tests/test_pipeline.py
+import threading
+
+from pipeline import EncodedFrameCache, build_mjpeg_chunk
+
+
+def test_chunk_is_built_once_and_shared():
+    cache = EncodedFrameCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return build_mjpeg_chunk(b"jpeg")
+
+    first = cache.get_or_build(1, build)
+    second = cache.get_or_build(1, build)
+    assert first is second
+    assert first.startswith(b"--frame\r\n") and first.endswith(b"jpeg\r\n")
+    assert len(builds) == 1
+    assert cache.stats() == {"entries": 1, "hits": 1, "encodes": 1, "wait_failures": 0}
+
+
+def test_oldest_entries_are_evicted():
+    cache = EncodedFrameCache(max_entries=2)
+    for key in range(3):
+        cache.get_or_build(key, lambda key=key: bytes([key]))
+
+    rebuilt = []
+    cache.get_or_build(0, lambda: rebuilt.append(0) or b"again")
+    assert rebuilt == [0]
+    assert cache.get_or_build(2, lambda: b"never") == bytes([2])
+
+
+def test_failed_build_is_not_cached():
+    cache = EncodedFrameCache()
+    assert cache.get_or_build(1, lambda: None) is None
+    assert cache.get_or_build(1, lambda: b"ok") == b"ok"
+
+
+def test_concurrent_viewers_wait_for_a_single_build():
+    cache = EncodedFrameCache()
+    started = threading.Event()
+    release = threading.Event()
+    builds = []
+
+    def slow_build():
+        builds.append(1)
+        started.set()
+        release.wait(5.0)
+        return b"chunk"
+
+    results = []
+    builder = threading.Thread(target=lambda: results.append(cache.get_or_build(7, slow_build)))
+    builder.start()
+    assert started.wait(5.0)
+    waiters = [threading.Thread(target=lambda: results.append(cache.get_or_build(7, slow_build)))
+               for _ in range(3)]
+    for thread in waiters:
+        thread.start()
+    release.set()
+    for thread in [builder] + waiters:
+        thread.join(5.0)
+
+    assert len(builds) == 1
+    assert results == [b"chunk"] * 4
+    assert len({id(chunk) for chunk in results}) == 1
+
+
+def test_waiter_of_failed_build_is_not_counted_as_hit():
+    cache = EncodedFrameCache()
+    # Thread khác đang build key 3 rồi kết thúc mà không có kết quả (lỗi hoặc quá hạn)
+    finished = threading.Event()
+    finished.set()
+    cache._pending[3] = finished
+
+    assert cache.get_or_build(3, lambda: b"unused") is None
+    stats = cache.stats()
+    assert stats["hits"] == 0 and stats["wait_failures"] == 1
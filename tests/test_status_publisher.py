@@ -0,0 +1,114 @@
+# tests/test_status_publisher.py
+import threading
+
+import pytest
+
+from status_publisher import StatusPublisher
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("status_publisher.time.time", clock)
+    return clock
+
+
+@pytest.fixture
+def publisher(monkeypatch):
+    sent = []
+    publisher = StatusPublisher(lambda event, data, sid: sent.append((sid, data)), max_rate=10, progress_rate=2)
+    # Gọi flush() thủ công trong test thay cho thread nền
+    monkeypatch.setattr(publisher, "_start_flush_locked", lambda: None)
+    publisher.emitted = sent
+    return publisher
+
+
+def statuses(publisher):
+    return [data["status"] for _, data in publisher.emitted]
+
+
+def test_unchanged_status_is_sent_once(publisher, clock):
+    for _ in range(10):
+        publisher.publish("a", "cam", "scanning", "Giữ yên")
+        clock.now += 0.2
+    assert statuses(publisher) == ["scanning"]
+
+
+def test_fast_changes_are_coalesced_and_flushed(publisher, clock):
+    publisher.publish("a", "cam", "scanning", "1")
+    clock.now += 0.01
+    publisher.publish("a", "cam", "too_far", "2")
+    clock.now += 0.01
+    publisher.publish("a", "cam", "too_close", "3")
+    assert statuses(publisher) == ["scanning"]
+
+    # Không có publish nào nữa: bản pending mới nhất vẫn được gửi khi hết khoảng chờ
+    assert publisher.flush() == 0
+    clock.now += 0.1
+    assert publisher.flush() == 1
+    assert statuses(publisher) == ["scanning", "too_close"]
+    assert publisher.flush() == 0
+
+
+def test_pending_is_sent_by_next_publish_after_interval(publisher, clock):
+    publisher.publish("a", "cam", "scanning", "1")
+    clock.now += 0.01
+    publisher.publish("a", "cam", "too_far", "2")
+    clock.now += 0.1
+    publisher.publish("a", "cam", "too_far", "2")
+    assert statuses(publisher) == ["scanning", "too_far"]
+
+
+def test_revert_drops_pending(publisher, clock):
+    publisher.publish("a", "cam", "scanning", "1")
+    clock.now += 0.01
+    publisher.publish("a", "cam", "too_far", "2")
+    clock.now += 0.01
+    publisher.publish("a", "cam", "scanning", "1")
+    clock.now += 0.5
+    assert publisher.flush() == 0
+    assert statuses(publisher) == ["scanning"]
+
+
+def test_progress_is_rate_limited(publisher, clock):
+    for step in range(20):
+        publisher.publish("a", "cam", "scanning", "Giữ yên", progress=step / 20)
+        clock.now += 0.05
+    # 20 lần trong 1 giây, progress_rate = 2 => bản đầu + 1 bản tiến độ (sau 0.5 giây)
+    assert len(publisher.emitted) == 2
+
+
+def test_force_bypasses_rate_limit(publisher, clock):
+    publisher.publish("a", "cam", "scanning", "1")
+    assert publisher.publish("a", "cam", "idle", "Đã hủy", force=True)
+    assert statuses(publisher) == ["scanning", "idle"]
+
+
+def test_clients_are_independent(publisher, clock):
+    publisher.publish("a", "cam", "scanning", "1")
+    publisher.publish("b", "cam", "scanning", "1")
+    assert [sid for sid, _ in publisher.emitted] == ["a", "b"]
+
+
+def test_flush_thread_delivers_trailing_status():
+    delivered = threading.Event()
+    sent = []
+
+    def emit(event, data, sid):
+        sent.append(data["status"])
+        if data["status"] == "too_close":
+            delivered.set()
+
+    publisher = StatusPublisher(emit, max_rate=20, progress_rate=1)
+    publisher.publish("a", "cam", "scanning", "1")
+    publisher.publish("a", "cam", "too_close", "2")
+    assert delivered.wait(2.0)
+    assert sent == ["scanning", "too_close"]
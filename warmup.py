@@ -0,0 +1,115 @@
+# warmup.py
+import threading
+import time
+import logging
+import config as cfg
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class WarmupManager:
+    """
+    Khởi động nền các phần nặng (import MediaPipe, icon, detector, 1 lần inference giả)
+    để server bind port và stream video (chưa vẽ UI) ngay lập tức.
+    Tiến độ được báo qua /ready, thời gian từng bước được ghi lại để đo cold start.
+    """
+
+    def __init__(self, steps):
+        """
+        Args:
+            steps: Danh sách (tên bước, hàm không tham số), chạy tuần tự trên 1 thread nền
+        """
+        self.steps = list(steps)
+        self.created_at = time.time()
+        self.state = "pending"   # pending -> running -> ready | failed
+        self.current_step = None
+        self.completed = 0
+        self.error = None
+        self.durations = {}      # tên bước -> giây
+        self.timings = {}        # mốc khởi động khác (import, frame đầu tiên, ...) -> giây
+        self._lock = threading.Lock()
+        self._done_event = threading.Event()
+        self._thread = None
+
+    @property
+    def is_ready(self):
+        return self.state == "ready"
+
+    @property
+    def failed(self):
+        return self.state == "failed"
+
+    def wait(self, timeout=None):
+        """Chờ warm-up kết thúc. Returns: True nếu đã sẵn sàng"""
+        self._done_event.wait(timeout)
+        return self.is_ready
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.state = "running"
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def record(self, name, seconds):
+        """Ghi lại 1 mốc thời gian khởi động (vd: import_main, time_to_first_frame)"""
+        with self._lock:
+            if name not in self.timings:
+                self.timings[name] = round(seconds, 3)
+                logger.info(f"⏱️ {name}: {seconds:.3f}s")
+
+    def _run(self):
+        started = time.perf_counter()
+        for name, fn in self.steps:
+            with self._lock:
+                self.current_step = name
+            step_started = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                logger.error(f"❌ Warm-up thất bại ở bước '{name}': {e}", exc_info=True)
+                with self._lock:
+                    self.state = "failed"
+                    self.error = f"{name}: {e}"
+                self._done_event.set()
+                return
+            with self._lock:
+                self.durations[name] = round(time.perf_counter() - step_started, 3)
+                self.completed += 1
+
+        with self._lock:
+            self.state = "ready"
+            self.current_step = None
+        self.record("warmup_total", time.perf_counter() - started)
+        self._done_event.set()
+        logger.info("✅ Warm-up hoàn tất, bắt đầu phân tích khuôn mặt")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "step": self.current_step,
+                "progress": round(self.completed / len(self.steps), 2) if self.steps else 1.0,
+                "error": self.error,
+                "steps": dict(self.durations),
+                "timings": dict(self.timings)
+            }
+
+
+def warmup_inference(service):
+    """
+    Chờ mọi inference worker tạo detector và chạy xong 1 lần detect giả (mỗi worker tự làm trên thread của nó)
+
+    Raises:
+        RuntimeError nếu không worker nào khởi tạo được, TimeoutError nếu quá WARMUP_INFERENCE_TIMEOUT
+    """
+    timeout = cfg.WARMUP_INFERENCE_TIMEOUT
+    ready, failed = service.wait_ready(timeout)
+    if ready == 0 and failed:
+        raise RuntimeError("Không có inference worker nào còn chạy")
+    if ready + failed < service.num_workers:
+        raise TimeoutError(f"Inference worker chưa sẵn sàng sau {timeout}s ({ready}/{service.num_workers})")
+    if failed:
+        logger.warning(f"⚠️ {failed}/{service.num_workers} inference worker khởi tạo lỗi")